@@ -0,0 +1,185 @@
+# animation.py - One frame clock driving every tween in a Tk window
+from collections import deque
+import math
+import time
+import tkinter as tk
+
+
+def linear(t):
+    return t
+
+
+def ease_out(t):
+    """Quadratic ease-out"""
+    return 1 - (1 - t) * (1 - t)
+
+
+class Tween:
+    """A value animated from ``start`` to ``end`` over ``duration`` seconds.
+
+    ``apply`` is called with the current value once per frame. Values are
+    computed from the frame time rather than a step count, so dropped
+    frames make the animation skip ahead instead of running late.
+    """
+
+    __slots__ = ("start", "end", "duration", "apply", "on_done", "easing", "begins", "done")
+
+    def __init__(self, start, end, duration, apply, on_done=None, easing=linear, begins=0.0):
+        self.start = start
+        self.end = end
+        self.duration = duration
+        self.apply = apply
+        self.on_done = on_done
+        self.easing = easing
+        self.begins = begins
+        self.done = False
+
+    def advance(self, now):
+        """Apply the value for time ``now``; return False once finished"""
+        if now < self.begins:
+            return True
+        progress = 1.0 if self.duration <= 0 else min((now - self.begins) / self.duration, 1.0)
+        self.apply(self.start + (self.end - self.start) * self.easing(progress))
+        if progress >= 1.0:
+            self.done = True
+            if self.on_done is not None:
+                self.on_done()
+            return False
+        return True
+
+
+class FrameStats:
+    """Per-frame timing for an Animator.
+
+    ``frames`` keeps the last ``history`` frames as
+    ``(work_ms, interval_ms, dropped, tweens)``: time spent advancing
+    tweens, time since the previous frame, frames skipped before this one
+    and the number of active tweens.
+    """
+
+    def __init__(self, history=600):
+        self.frames = deque(maxlen=history)
+        self.total_frames = 0
+        self.total_dropped = 0
+
+    def record(self, work_ms, interval_ms, dropped, tweens):
+        self.frames.append((work_ms, interval_ms, dropped, tweens))
+        self.total_frames += 1
+        self.total_dropped += dropped
+
+    def summary(self):
+        """Aggregate the recorded frames into a dict of timings"""
+        if not self.frames:
+            return {"frames": 0, "dropped": 0}
+        work = sorted(frame[0] for frame in self.frames)
+        intervals = [frame[1] for frame in self.frames if frame[1] is not None]
+        mean_interval = sum(intervals) / len(intervals) if intervals else None
+        return {
+            "frames": self.total_frames,
+            "dropped": self.total_dropped,
+            "work_mean_ms": sum(work) / len(work),
+            "work_p95_ms": work[min(len(work) - 1, int(len(work) * 0.95))],
+            "work_max_ms": work[-1],
+            "interval_mean_ms": mean_interval,
+            "fps": 1000 / mean_interval if mean_interval else None
+        }
+
+
+class Animator:
+    """Advances all active tweens from a single after() callback per frame.
+
+    Every widget change of a frame happens in the same callback, so Tk
+    does one layout pass per frame however many cards are animating.
+    Frames are aligned to a fixed period; when a frame overruns its
+    budget the following slots are skipped and counted as dropped.
+    Nothing is scheduled while no tween is active.
+    """
+
+    def __init__(self, widget, fps=50, clock=time.perf_counter):
+        self.widget = widget
+        self.period = 1.0 / fps
+        self.clock = clock
+        self.tweens = []
+        self.pending = None
+        self.pending_due = None
+        self.ticking = False
+        self.last_frame = None
+        self.stats = FrameStats()
+
+    def animate(self, start, end, duration, apply, delay=0.0, on_done=None, easing=linear):
+        """Start a tween after ``delay`` seconds and return it"""
+        tween = Tween(start, end, duration, apply, on_done, easing, self.clock() + delay)
+        self.tweens.append(tween)
+        if not self.ticking:
+            self.schedule(delay)
+        return tween
+
+    def cancel(self, tween):
+        """Stop a tween without applying its final value"""
+        tween.done = True
+
+    def stop(self):
+        """Drop every tween and the pending frame, e.g. when the window closes"""
+        self.tweens = []
+        self.cancel_pending()
+
+    def cancel_pending(self):
+        if self.pending is not None:
+            try:
+                self.widget.after_cancel(self.pending)
+            except tk.TclError:
+                pass
+            self.pending = None
+
+    def schedule(self, seconds):
+        """Run the next frame in ``seconds`` unless one is already due sooner"""
+        due = self.clock() + seconds
+        if self.pending is not None:
+            if self.pending_due <= due:
+                return
+            self.cancel_pending()
+        self.pending_due = due
+        self.pending = self.widget.after(max(1, math.ceil(seconds * 1000)), self.tick)
+
+    def tick(self):
+        """Advance every tween for this frame"""
+        self.pending = None
+        now = self.clock()
+        interval = None
+        dropped = 0
+        if self.last_frame is not None:
+            interval = now - self.last_frame
+            dropped = max(0, round(interval / self.period) - 1)
+
+        # Tweens started from on_done callbacks land in the fresh list
+        current, self.tweens = self.tweens, []
+        self.ticking = True
+        active = []
+        try:
+            for tween in current:
+                if tween.done:
+                    continue
+                try:
+                    if tween.advance(now):
+                        active.append(tween)
+                except tk.TclError:
+                    pass  # the widget was destroyed mid-animation
+        finally:
+            self.ticking = False
+        self.tweens = active + self.tweens
+
+        finished = self.clock()
+        running = sum(1 for tween in self.tweens if tween.begins <= now)
+        if running:
+            self.stats.record((finished - now) * 1000,
+                              None if interval is None else interval * 1000,
+                              dropped, running)
+            self.last_frame = now
+        else:
+            self.last_frame = None  # idle until a delayed tween begins
+
+        if running:
+            # Wait for the next frame slot; slots already missed are skipped
+            self.schedule(self.period - (finished - now) % self.period)
+        elif self.tweens:
+            self.schedule(min(tween.begins for tween in self.tweens) - finished)
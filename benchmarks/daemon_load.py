@@ -0,0 +1,175 @@
+# daemon_load.py - Load test for daemon.py against a local instance
+#
+# Usage: python benchmarks/daemon_load.py [--clients 2000] [--sessions 20] [--tcp]
+#
+# Starts daemon.py in a subprocess on a temporary data file, connects
+# --clients concurrent clients that each record --sessions sessions and a
+# comfort click, waiting for every acknowledgement like RemoteStore does,
+# while a few readers keep querying totals. Prints throughput, latency
+# percentiles and the daemon's batching, then checks that every session
+# arrived.
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from daemon import DaemonClient, parse_address
+
+
+def raise_file_limit(wanted):
+    """Allow one descriptor per client on both ends of the socket"""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+    if soft < target:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+
+async def connect(address):
+    kind, *where = parse_address(address)
+    if kind == "tcp":
+        return await asyncio.open_connection(where[0], where[1])
+    return await asyncio.open_unix_connection(where[0])
+
+
+async def call(reader, writer, request):
+    writer.write((json.dumps(request) + "\n").encode("utf-8"))
+    await writer.drain()
+    response = json.loads(await reader.readline())
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    return response
+
+
+async def recorder(address, client, sessions, start, latencies):
+    reader, writer = await connect(address)
+    await start.wait()
+    moment = datetime(2024, 1, 1) + timedelta(minutes=client)
+    for i in range(sessions):
+        session = {
+            "activity": f"Load {client % 10}",
+            "duration": 60,
+            "start_time": moment.isoformat(),
+            "end_time": (moment + timedelta(seconds=60)).isoformat(),
+            "type": "manual"
+        }
+        began = time.perf_counter()
+        await call(reader, writer, {"id": i, "op": "append", "session": session})
+        latencies.append(time.perf_counter() - began)
+        moment += timedelta(hours=1)
+    await call(reader, writer, {"id": sessions, "op": "increment", "key": "comfort_choices"})
+    writer.close()
+
+
+async def querier(address, done, latencies):
+    reader, writer = await connect(address)
+    request_id = 0
+    while not done.is_set():
+        request_id += 1
+        began = time.perf_counter()
+        await call(reader, writer, {"id": request_id, "op": "totals"})
+        latencies.append(time.perf_counter() - began)
+        await asyncio.sleep(0.01)
+    writer.close()
+
+
+def percentiles(values):
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(len(values) * q))] * 1000
+    return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": values[-1] * 1000}
+
+
+async def run_load(address, clients, sessions, readers):
+    start = asyncio.Event()
+    done = asyncio.Event()
+    append_latencies = []
+    query_latencies = []
+
+    # Connect everyone first, then release them at once
+    recorders = [asyncio.ensure_future(recorder(address, c, sessions, start, append_latencies))
+                 for c in range(clients)]
+    queriers = [asyncio.ensure_future(querier(address, done, query_latencies))
+                for _ in range(readers)]
+    await asyncio.sleep(0.5)
+    began = time.perf_counter()
+    start.set()
+    await asyncio.gather(*recorders)
+    elapsed = time.perf_counter() - began
+    done.set()
+    await asyncio.gather(*queriers)
+    return elapsed, append_latencies, query_latencies
+
+
+def wait_for_daemon(address, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"daemon exited with {process.returncode}")
+        try:
+            return DaemonClient(address)
+        except OSError:
+            time.sleep(0.05)
+    raise SystemExit("daemon did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the ingestion daemon locally")
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=20, help="sessions per client")
+    parser.add_argument("--readers", type=int, default=4, help="clients querying totals meanwhile")
+    parser.add_argument("--tcp", action="store_true", help="use 127.0.0.1 instead of a Unix socket")
+    parser.add_argument("--port", type=int, default=18765)
+    args = parser.parse_args()
+
+    raise_file_limit(2 * (args.clients + args.readers) + 256)
+    with tempfile.TemporaryDirectory() as workdir:
+        data_file = os.path.join(workdir, "productivity_data.json")
+        address = f"127.0.0.1:{args.port}" if args.tcp else os.path.join(workdir, "daemon.sock")
+        where = ["--tcp", address] if args.tcp else ["--socket", address]
+        process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "daemon.py"),
+                                    data_file, *where], stderr=subprocess.PIPE, text=True)
+        try:
+            client = wait_for_daemon(address, process)
+            elapsed, appends, queries = asyncio.run(
+                run_load(address, args.clients, args.sessions, args.readers))
+            client.request("flush")
+            count = client.request("session_count")["result"]
+            comfort = client.request("status")["result"]["counters"]["comfort_choices"]
+            client.close()
+        finally:
+            process.terminate()
+            _, log = process.communicate(timeout=60)
+
+        expected = args.clients * args.sessions
+        report = {
+            "clients": args.clients,
+            "sessions": expected,
+            "elapsed_s": elapsed,
+            "sessions_per_s": expected / elapsed,
+            "append_latency": percentiles(appends),
+            "query_latency": percentiles(queries) if queries else None,
+            "query_mean_ms": statistics.mean(queries) * 1000 if queries else None,
+            "stored_sessions": count,
+            "comfort_choices": comfort,
+            "daemon": log.strip().splitlines()[-1] if log.strip() else None
+        }
+        print(json.dumps(report, indent=2))
+        if count != expected or comfort != args.clients:
+            raise SystemExit(f"lost updates: {count} of {expected} sessions, "
+                             f"{comfort} of {args.clients} clicks")
+
+
+if __name__ == "__main__":
+    main()
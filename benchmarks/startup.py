@@ -0,0 +1,65 @@
+# startup.py - Measure time-to-first-frame of the timer window
+#
+# Usage: python benchmarks/startup.py [--runs N]
+#
+# Each run launches a fresh interpreter, builds ProductivityTimer and waits
+# for the first Tk frame. The "eager" mode imports productivity_stats up
+# front, as the application did before the analytics stack was made lazy.
+# Requires a display.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import sys, time, json
+started = time.perf_counter()
+sys.path.insert(0, {repo!r})
+if {eager!r}:
+    import productivity_stats
+import main
+app = main.ProductivityTimer(preload_analytics=False)
+app.root.update()
+first_frame = time.perf_counter() - started
+app.root.destroy()
+print(json.dumps({{"first_frame": first_frame, "wall_end": time.time()}}))
+"""
+
+
+def measure(eager, workdir):
+    """Launch one interpreter and return its startup timings in seconds"""
+    code = CHILD.format(repo=REPO_DIR, eager=eager)
+    launched = time.time()
+    output = subprocess.run([sys.executable, "-c", code], cwd=workdir, check=True,
+                            capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return {
+        "in_process": result["first_frame"],
+        "including_interpreter": result["wall_end"] - launched
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark time-to-first-frame")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode, eager in (("eager", True), ("lazy", False)):
+            runs = [measure(eager, workdir) for _ in range(args.runs)]
+            report[mode] = {
+                key: statistics.median(run[key] for run in runs)
+                for key in runs[0]
+            }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# suite.py - Headless scaling benchmarks for storage, statistics, export and charts
+#
+# Usage: python benchmarks/suite.py [--sizes 10000 100000 1000000] [--output results.json]
+#
+# For each history size a synthetic productivity_data.json is generated and
+# every operation is timed. Wall times come from untraced runs; peak
+# allocation comes from one extra run under tracemalloc. Results are written
+# as JSON so they can be compared across releases.
+import argparse
+import json
+import os
+import platform
+import queue
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import charts
+from export import SessionExporter
+from importer import SessionImporter
+from main import ProductivityTimer
+from productivity_stats import ProductivityStatsWindow
+from stats_manager import ProductivityStatsManager
+from storage import SessionStore, migrate_data
+from synthetic import write_data_file
+from timeseries import VIEWS, view_window
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+
+def headless_timer(data_file):
+    """A ProductivityTimer with storage but without its Tk window"""
+    timer = ProductivityTimer.__new__(ProductivityTimer)
+    timer.data_file = data_file
+    timer.daemon_address = None
+    return timer
+
+
+def headless_window(stats_manager):
+    """A ProductivityStatsWindow that can run its worker without a display"""
+    window = ProductivityStatsWindow.__new__(ProductivityStatsWindow)
+    window.stats_manager = stats_manager
+    window.chart_cache = charts.DashboardCache(VIEWS["7d"])
+    window.results = queue.Queue()
+    return window
+
+
+def measure(operation, repeat, counter=None):
+    """Time an operation and record its peak traced allocation.
+
+    ``counter`` returns a running count, e.g. aggregation passes; its
+    increase during the traced run is recorded as ``passes``.
+    """
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        operation()
+        times.append(time.perf_counter() - started)
+
+    count = counter() if counter else 0
+    tracemalloc.start()
+    try:
+        operation()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        "wall_median_s": statistics.median(times),
+        "wall_min_s": min(times),
+        "runs": repeat,
+        "peak_alloc_bytes": peak
+    }
+    if counter:
+        result["passes"] = counter() - count
+    return result
+
+
+def operations(workdir, data_file):
+    """Return (name, callable[, counter]) tuples in the order they are run"""
+    timer = headless_timer(data_file)
+    timer.load_data()
+    manager = ProductivityStatsManager(data_file)
+    manager.ensure_rollups()
+    window = headless_window(manager)
+    export_path = os.path.join(workdir, "export.csv")
+    bin_file = os.path.join(workdir, "productivity_data.bin")
+    migrate_data(data_file, bin_file)
+
+    def load_data():
+        headless_timer(data_file).load_data()
+
+    def stats_build():
+        fresh = ProductivityStatsManager(data_file)
+        fresh.ensure_rollups()
+
+    def bin_load():
+        SessionStore(bin_file).close()
+
+    def bin_stats_build():
+        fresh = ProductivityStatsManager(bin_file)
+        fresh.ensure_rollups()
+        fresh.store.close()
+
+    def export_data():
+        SessionExporter().export(export_path, timer.store.query_sessions(), "csv")
+
+    def import_csv():
+        # The export read back into an empty SQLite store
+        import_path = os.path.join(workdir, "import.db")
+        if os.path.exists(import_path):
+            os.remove(import_path)
+        store = SessionStore(import_path)
+        try:
+            SessionImporter().import_files(store, [export_path])
+        finally:
+            store.close()
+
+    def charts_render():
+        FigureCanvasAgg(charts.build_dashboard_figure(manager)).draw()
+
+    chart_cache = charts.DashboardCache()
+    chart_cache.update(manager)
+
+    def dashboard_open():
+        # The statistics window's worker, run inline; only the Tk widgets are skipped
+        window.compute_stats()
+        while not window.results.empty():
+            key, payload = window.results.get_nowait()
+            if key == "error":
+                raise payload
+
+    def charts_reopen():
+        # A new statistics window with unchanged data: cached figure, one draw
+        chart_cache.update(manager)
+        FigureCanvasAgg(chart_cache.fig).draw()
+
+    return [
+        ("load_data", load_data),
+        ("save_data", timer.save_data),
+        ("save_data_durable", lambda: (timer.save_data(), timer.store.flush())),
+        ("stats_build", stats_build),
+        ("bin_load", bin_load),
+        ("bin_stats_build", bin_stats_build),
+        ("get_daily_stats", lambda: manager.get_daily_stats(7)),
+        ("get_activity_breakdown", manager.get_activity_breakdown),
+        ("get_productivity_score", manager.get_productivity_score),
+        ("view_365d", lambda: manager.compute_metrics(charts.DashboardCache.METRICS, VIEWS["365d"])),
+        ("view_all", lambda: manager.compute_metrics(charts.DashboardCache.METRICS, VIEWS["all"])),
+        ("focus_heatmap", lambda: (manager.ensure_rollups(), manager.columns.focus_heatmap())),
+        ("hourly_series_30d", lambda: manager.get_series("hour", *view_window(VIEWS["30d"]))),
+        ("dashboard_open", dashboard_open, lambda: manager.passes),
+        ("export_data", export_data),
+        ("import_csv", import_csv),
+        ("create_charts_figure", lambda: charts.build_dashboard_figure(manager)),
+        ("charts_render", charts_render),
+        ("charts_reopen", charts_reopen)
+    ]
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the scaling benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="history sizes in sessions (up to 5000000)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per operation")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed
+        },
+        "results": []
+    }
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            data_file = os.path.join(workdir, "productivity_data.json")
+            write_data_file(data_file, size, seed=args.seed)
+            file_size = os.path.getsize(data_file)
+
+            for name, operation, *counter in operations(workdir, data_file):
+                result = measure(operation, args.repeat, *counter)
+                result.update(size=size, operation=name, data_file_bytes=file_size)
+                report["results"].append(result)
+                print(f"{size:>9} {name:<24} {result['wall_median_s']:.4f}s "
+                      f"{result['peak_alloc_bytes'] / 2**20:.1f} MiB", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# synthetic.py - Deterministic synthetic session histories for benchmarks
+#
+# Usage: python benchmarks/synthetic.py 1000000 productivity_data.json [--seed 42]
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+
+# (activity, weight) for focus sessions; breaks are generated separately
+ACTIVITY_MIX = [
+    ("Work", 35),
+    ("Study", 20),
+    ("Project", 12),
+    ("Reading", 10),
+    ("Learning", 9),
+    ("Exercise", 8),
+    ("Other", 6)
+]
+
+# (type, weight)
+TYPE_MIX = [
+    ("pomodoro", 45),
+    ("break", 30),
+    ("manual", 25)
+]
+
+POMODORO_DURATION = 25 * 60
+BREAK_DURATION = 5 * 60
+LONG_BREAK_DURATION = 15 * 60
+
+
+def generate_sessions(count, seed=42, end=None, years=3):
+    """Return ``count`` sessions spread over the ``years`` before ``end``.
+
+    The output only depends on the arguments; ``end`` defaults to today's
+    midnight so that "last N days" queries see data.
+    """
+    rng = random.Random(seed)
+    if end is None:
+        end = datetime.combine(datetime.now().date(), datetime.min.time())
+    span = int(timedelta(days=365 * years).total_seconds())
+    origin = end - timedelta(seconds=span)
+
+    activities, activity_weights = zip(*ACTIVITY_MIX)
+    types, type_weights = zip(*TYPE_MIX)
+    offsets = sorted(rng.randrange(span) for _ in range(count))
+    session_types = rng.choices(types, weights=type_weights, k=count)
+    session_activities = rng.choices(activities, weights=activity_weights, k=count)
+
+    sessions = []
+    for offset, session_type, activity in zip(offsets, session_types, session_activities):
+        if session_type == "pomodoro":
+            duration = POMODORO_DURATION
+        elif session_type == "break":
+            activity = "Break"
+            duration = LONG_BREAK_DURATION if rng.random() < 0.25 else BREAK_DURATION
+        else:
+            # Manual sessions: mostly 10-90 minutes with a long tail
+            duration = round(min(rng.lognormvariate(7.6, 0.6), 4 * 3600), 2)
+
+        start = origin + timedelta(seconds=offset, microseconds=rng.randrange(1000000))
+        sessions.append({
+            "activity": activity,
+            "duration": duration,
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(seconds=duration)).isoformat(),
+            "type": session_type
+        })
+    return sessions
+
+
+def generate_data(count, seed=42, end=None, years=3):
+    """Return a full data document in the productivity_data.json layout"""
+    sessions = generate_sessions(count, seed, end, years)
+    rng = random.Random(seed + 1)
+    return {
+        "sessions": sessions,
+        "comfort_choices": rng.randrange(max(count // 50, 1)),
+        "total_pomodoros": sum(1 for s in sessions if s["type"] == "pomodoro")
+    }
+
+
+def write_data_file(path, count, seed=42, end=None, years=3):
+    """Write a synthetic history to path the way save_data does"""
+    with open(path, 'w') as f:
+        json.dump(generate_data(count, seed, end, years), f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic productivity_data.json")
+    parser.add_argument("count", type=int, help="number of sessions")
+    parser.add_argument("path", help="output file")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--years", type=float, default=3, help="length of the history")
+    parser.add_argument("--end", help="last day of the history (YYYY-MM-DD, default today)")
+    args = parser.parse_args()
+
+    end = datetime.strptime(args.end, "%Y-%m-%d") if args.end else None
+    write_data_file(args.path, args.count, args.seed, end, args.years)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+# binstore.py - Memory-mapped binary session file
+#
+# A .bin data file is a 16-byte header followed by one 32-byte record per
+# session, in append order:
+#
+#   start     int64    wall-clock microseconds since 1970-01-01
+#   end       int64
+#   duration  float64  seconds
+#   activity  uint32   index into the string table
+#   type      uint16   index into the string table
+#   flags     uint16   INTEGRAL: the duration was a JSON integer
+#
+# The string table and the counters live next to it in ``<data file>.meta``
+# as JSON. Fields a record cannot hold (non-canonical timestamp spellings,
+# unknown keys) are appended to ``<data file>.extras``, one JSON
+# ``[row, fields]`` line per session. Convert to and from the other formats with
+#   python storage.py productivity_data.json productivity_data.bin
+#   python storage.py productivity_data.bin productivity_data.json
+from array import array
+from collections import namedtuple
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from profiling import profiled
+from records import (MICROSECONDS_PER_DAY, CategoryTable, SessionRecord, SessionTable, day_label,
+                     day_number)
+from storage import SessionStorage, default_data
+import writebehind
+
+MAGIC = b"PTSESS\x00\x01"
+RECORD = np.dtype([("start", "<i8"), ("end", "<i8"), ("duration", "<f8"),
+                   ("activity", "<u4"), ("type", "<u2"), ("flags", "<u2")])
+HEADER = struct.pack("<8sII", MAGIC, RECORD.itemsize, 0)
+INTEGRAL = 1
+
+# The record array and string tables a SessionColumns can be built on without copying
+PackedSessions = namedtuple("PackedSessions", "records activities types")
+
+
+class BinaryStorage(SessionStorage):
+    """Sessions as fixed-size packed records, read through ``mmap``.
+
+    Queries run as NumPy reductions over the mapped file, with no parsing;
+    ``packed()`` hands the mapped records to the stats manager, which
+    aggregates them in place. Appending a session queues one 32-byte write
+    on the ``WriteBehind`` thread, plus a line in the extras log if it has
+    extra fields; the small string table file is only rewritten when a new
+    activity or type or a counter change appears. Appended records are
+    also kept in an in-memory buffer, so reads never wait for the writer;
+    the file is mapped again after a flush.
+    """
+
+    def __init__(self, data_file="productivity_data.bin", persister=None):
+        self.data_file = data_file
+        self.meta_file = data_file + ".meta"
+        self.extras_file = data_file + ".extras"
+        self.persister = persister or writebehind.shared()
+        self.data = None
+        self.count = 0
+        self.activities = CategoryTable()
+        self.types = CategoryTable()
+        self.extras = {}
+        self._view = None
+        self._order = None
+        self._buffer = None  # every record since the first append after a mapping, with spare room
+        self._ready = False  # torn tail dropped, or the file freshly written
+        self._extras_size = None  # where a torn last line of the extras log starts
+
+    @profiled
+    def load(self):
+        """Read the string table and counters and check the record file"""
+        self.persister.flush()
+        meta = {}
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file, 'r') as f:
+                meta = json.load(f)
+        self.activities = CategoryTable(meta.get("activities", []))
+        self.types = CategoryTable(meta.get("types", []))
+        self.data = {key: value for key, value in default_data().items() if key != "sessions"}
+        self.data.update(meta.get("data", {}))
+        self.load_extras()
+
+        self._view = None
+        self._order = None
+        self._buffer = None
+        if not os.path.exists(self.data_file):
+            self.count = 0
+            self.persister.append(self.data_file, HEADER)
+            self._ready = True
+            return self.data
+
+        with open(self.data_file, 'rb') as f:
+            header = f.read(len(HEADER))
+        if header[:len(MAGIC)] != MAGIC or struct.unpack("<8sII", header)[1] != RECORD.itemsize:
+            raise ValueError(f"{self.data_file} is not a binary session file")
+        body = os.path.getsize(self.data_file) - len(HEADER)
+        self.count = body // RECORD.itemsize
+        # A torn last record from a crash is cut off before the next append
+        self._ready = body % RECORD.itemsize == 0
+        # Extra fields are queued before their records, so a crash can leave some for rows that never made it
+        self.extras = {row: extra for row, extra in self.extras.items() if row < self.count}
+
+        records = self.records()
+        if self.count and (int(records["activity"].max()) >= len(self.activities)
+                           or int(records["type"].max()) >= len(self.types)):
+            raise ValueError(f"{self.meta_file} does not name every activity and type")
+        return self.data
+
+    def load_extras(self):
+        """Read the extras log, noting a torn last line to cut off before the next append"""
+        self.extras = {}
+        self._extras_size = None
+        if not os.path.exists(self.extras_file):
+            return
+        size = 0
+        with open(self.extras_file, 'rb') as f:
+            for line in f:
+                try:
+                    row, extra = json.loads(line)
+                except ValueError:
+                    line = b""
+                if not line.endswith(b"\n"):
+                    self._extras_size = size
+                    break
+                self.extras[row] = extra
+                size += len(line)
+
+    def records(self):
+        """The sessions as a read-only structured array.
+
+        Until the first append they come straight from the mapped file,
+        afterwards from the append buffer, which may still hold records the
+        persister has not written. Either way the array is a view, made
+        once per change of the count.
+        """
+        if self._view is None or len(self._view) != self.count:
+            if self._buffer is None:
+                self._view = self.map_records()
+            else:
+                self._view = self._buffer[:self.count]
+                self._view.flags.writeable = False
+        return self._view
+
+    def map_records(self):
+        if self.count == 0:
+            return np.zeros(0, dtype=RECORD)
+        with open(self.data_file, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # The array keeps the mapping alive; an old one lingers only
+        # while arrays handed out earlier still use it
+        return np.frombuffer(mapping, dtype=RECORD, count=self.count, offset=len(HEADER))
+
+    def packed(self):
+        return PackedSessions(self.records(), list(self.activities.names), list(self.types.names))
+
+    def write_meta(self):
+        meta = {
+            "activities": self.activities.names,
+            "types": self.types.names,
+            "data": self.data
+        }
+        # Serialized now: the tables keep changing after this returns
+        self.persister.replace(self.meta_file, json.dumps(meta))
+
+    def pack(self, sessions):
+        """Pack sessions into records, interning their names.
+
+        Returns the records and the extra fields of the sessions that have
+        any, by row number.
+        """
+        first_row = self.count
+        extras = {}
+        if isinstance(sessions, SessionTable):
+            packed = np.zeros(len(sessions), dtype=RECORD)
+            packed["start"] = np.frombuffer(sessions.start, dtype=np.int64)
+            packed["end"] = np.frombuffer(sessions.end, dtype=np.int64)
+            packed["duration"] = np.frombuffer(sessions.duration, dtype=np.float64)
+            packed["flags"] = np.frombuffer(sessions.integral, dtype=np.int8) * INTEGRAL
+            for field, names, codes, table in (("activity", sessions.activities.names,
+                                                sessions.activity, self.activities),
+                                               ("type", sessions.types.names,
+                                                sessions.type, self.types)):
+                if names:
+                    mapping = np.array([table.code(name) for name in names], dtype=np.uint32)
+                    packed[field] = mapping[np.frombuffer(codes, dtype=np.uint32)]
+            for row, extra in sessions.extras.items():
+                extras[first_row + row] = dict(extra)
+            return packed, extras
+
+        rows = []
+        for i, session in enumerate(sessions):
+            record = SessionRecord.from_dict(session)
+            if record.extra:
+                extras[first_row + i] = dict(record.extra)
+            rows.append((record.start_us, record.end_us, record.duration,
+                         self.activities.code(record.activity), self.types.code(record.type),
+                         INTEGRAL if isinstance(record.duration, int) else 0))
+        return np.array(rows, dtype=RECORD), extras
+
+    @staticmethod
+    def extras_log(extras):
+        return "".join(json.dumps([row, extra]) + "\n" for row, extra in extras.items()).encode()
+
+    def append_sessions(self, sessions):
+        """Append sessions with one write, after any new names they need"""
+        known = (len(self.activities), len(self.types))
+        packed, extras = self.pack(sessions)
+        if not len(packed):
+            return
+        # Queued first, so the records never reach the disk before their names
+        if (len(self.activities), len(self.types)) != known:
+            self.write_meta()
+        if extras:
+            if self._extras_size is not None:
+                self.persister.truncate(self.extras_file, self._extras_size)
+                self._extras_size = None
+            self.persister.append(self.extras_file, self.extras_log(extras))
+            self.extras.update(extras)
+        if not self._ready:
+            self.persister.truncate(self.data_file, len(HEADER) + self.count * RECORD.itemsize)
+            self._ready = True
+        self.persister.append(self.data_file, packed.tobytes())
+        size = self.count + len(packed)
+        if self._buffer is None or len(self._buffer) < size:
+            # Doubling keeps the copies of older records to O(1) per append
+            buffer = np.zeros(max(16, 2 * size), dtype=RECORD)
+            buffer[:self.count] = self.records()
+            self._buffer = buffer
+        self._buffer[self.count:size] = packed
+        self.count = size
+        self._order = None
+
+    def append_session(self, session):
+        """Append a finished session"""
+        self.append_sessions([session])
+
+    def increment(self, key, amount=1):
+        """Bump a counter such as comfort_choices or total_pomodoros"""
+        self.data[key] = self.data.get(key, 0) + amount
+        self.write_meta()
+
+    def import_data(self, data):
+        """Replace the stored data with a full data document"""
+        self.activities = CategoryTable()
+        self.types = CategoryTable()
+        self.count = 0
+        packed, self.extras = self.pack(data.get("sessions", []))
+        self.data = {key: value for key, value in data.items() if key != "sessions"}
+        self.write_meta()
+        if self.extras:
+            self.persister.replace(self.extras_file, self.extras_log(self.extras))
+        else:
+            self.persister.remove(self.extras_file)
+        self._extras_size = None
+        self.persister.replace(self.data_file, HEADER + packed.tobytes())
+        self.count = len(packed)
+        self._ready = True
+        self._buffer = packed
+        self._view = None
+        self._order = None
+
+    # -- queries ------------------------------------------------------------
+
+    def record(self, row, values):
+        """Build a SessionRecord from a row number and its ``tolist()`` values"""
+        start, end, duration, activity, session_type, flags = values
+        return SessionRecord(self.activities.names[activity],
+                             int(duration) if flags & INTEGRAL else duration,
+                             start, end, self.types.names[session_type], self.extras.get(row))
+
+    def records_at(self, rows):
+        records = self.records()
+        return [self.record(row, values) for row, values in zip(rows.tolist(), records[rows].tolist())]
+
+    def sessions(self):
+        """Return every session as a list of records"""
+        return list(self.iter_sessions())
+
+    def iter_sessions(self):
+        """Yield every session in insertion order"""
+        block = 10000
+        for first in range(0, self.count, block):
+            yield from self.records_at(np.arange(first, min(first + block, self.count)))
+
+    def snapshot(self):
+        """Return a SessionTable of every session, copied straight from the columns"""
+        records = self.records()
+        table = SessionTable()
+        table.start = array("q", np.ascontiguousarray(records["start"]).tobytes())
+        table.end = array("q", np.ascontiguousarray(records["end"]).tobytes())
+        table.duration = array("d", np.ascontiguousarray(records["duration"]).tobytes())
+        table.integral = array("b", (records["flags"] & INTEGRAL).astype(np.int8).tobytes())
+        table.activity = array("I", records["activity"].astype(np.uint32).tobytes())
+        table.type = array("I", records["type"].astype(np.uint32).tobytes())
+        table.activities = CategoryTable(self.activities.names)
+        table.types = CategoryTable(self.types.names)
+        table.extras = {row: dict(extra) for row, extra in self.extras.items()}
+        return table
+
+    def session_count(self):
+        """Return the number of stored sessions"""
+        return self.count
+
+    def order(self):
+        """Row numbers sorted by start time, ties in insertion order"""
+        if self._order is None or len(self._order) != self.count:
+            self._order = np.argsort(self.records()["start"], kind="stable")
+        return self._order
+
+    def day_rows(self, first_day=None, last_day=None):
+        """Rows starting between two YYYY-MM-DD dates, oldest first"""
+        order = self.order()
+        starts = self.records()["start"][order]
+        first, last = 0, len(order)
+        if first_day is not None:
+            first = np.searchsorted(starts, day_number(first_day) * MICROSECONDS_PER_DAY)
+        if last_day is not None:
+            last = np.searchsorted(starts, (day_number(last_day) + 1) * MICROSECONDS_PER_DAY)
+        return order[first:max(first, last)]
+
+    def query_sessions(self, first_day=None, last_day=None, activities=None):
+        """Yield sessions starting between two YYYY-MM-DD dates and in the given activities, oldest first"""
+        rows = self.day_rows(first_day, last_day)
+        if activities is not None:
+            codes = [self.activities.codes[a] for a in activities if a in self.activities.codes]
+            rows = rows[np.isin(self.records()["activity"][rows], codes)]
+        return iter(self.records_at(rows))
+
+    def totals(self):
+        """Return total tracked time and number of sessions"""
+        return {"total_time": float(self.records()["duration"].sum()), "sessions": self.count}
+
+    def daily_totals(self, first_day, last_day):
+        """Aggregate sessions per day between two YYYY-MM-DD dates, inclusive"""
+        records = self.records()[np.sort(self.day_rows(first_day, last_day))]
+        if not len(records):
+            return {}
+        days, day_index = np.unique(records["start"] // MICROSECONDS_PER_DAY, return_inverse=True)
+        duration = records["duration"]
+        n_days = len(days)
+        n_activities = len(self.activities)
+        total_time = np.bincount(day_index, weights=duration, minlength=n_days)
+        sessions = np.bincount(day_index, minlength=n_days)
+        pomodoros = np.bincount(day_index, weights=records["type"] == self.types.codes.get("pomodoro", -1),
+                                minlength=n_days)
+        pairs = day_index * n_activities + records["activity"]
+        pair_time = np.bincount(pairs, weights=duration, minlength=n_days * n_activities)
+        pair_count = np.bincount(pairs, minlength=n_days * n_activities)
+
+        daily = {}
+        for i, day in enumerate(days.tolist()):
+            row = slice(i * n_activities, (i + 1) * n_activities)
+            daily[day_label(day)] = {
+                "total_time": float(total_time[i]),
+                "sessions": int(sessions[i]),
+                "pomodoros": int(pomodoros[i]),
+                "activities": {self.activities.names[a]: float(pair_time[row][a])
+                               for a in np.flatnonzero(pair_count[row])}
+            }
+        return daily
+
+    def _totals_by(self, field, names):
+        records = self.records()
+        time = np.bincount(records[field], weights=records["duration"], minlength=len(names))
+        count = np.bincount(records[field], minlength=len(names))
+        return {name: {"time": float(time[i]), "sessions": int(count[i])}
+                for i, name in enumerate(names) if count[i]}
+
+    def activity_totals(self):
+        """Aggregate time and session count per activity"""
+        return self._totals_by("activity", self.activities.names)
+
+    def type_totals(self):
+        """Aggregate time and session count per session type"""
+        return self._totals_by("type", self.types.names)
+
+    def session_page(self, offset=0, limit=50):
+        """Return ``limit`` sessions newest first, skipping the ``offset`` newest"""
+        order = self.order()
+        last = max(len(order) - offset, 0)
+        return self.records_at(order[max(last - limit, 0):last][::-1])
+
+    def flush(self):
+        """Wait for queued writes; later reads map the file again"""
+        self.persister.flush()
+        self._buffer = None
+        self._view = None
+
+    def close(self):
+        """Wait for queued writes and drop the mapping"""
+        self.flush()
+        self._order = None
@@ -0,0 +1,393 @@
+# charts.py - Dashboard chart builders shared by the stats window and reports
+from datetime import date
+import threading
+
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator
+from matplotlib.transforms import Bbox
+import numpy as np
+
+from columnar import WEEKDAYS
+from profiling import count, profiled
+from timeseries import View
+
+PERIOD_NAMES = {"hour": "Hourly", "day": "Daily", "week": "Weekly", "month": "Monthly"}
+MAX_TICKS = 15  # more buckets than this get thinned tick labels
+MAX_BAR_LABELS = 31
+
+
+def period_name(days):
+    """Title prefix of the trend panels for a number of days or a View"""
+    return PERIOD_NAMES[days.granularity] if isinstance(days, View) else "Daily"
+
+
+def create_dashboard_figure():
+    """Create the 2x2 dashboard figure and return it with its four axes"""
+    # A bare Figure avoids pyplot's global state, which is not thread-safe
+    # and would pull in a GUI backend
+    fig = Figure(figsize=(12, 8))
+    ((ax1, ax2), (ax3, ax4)) = fig.subplots(2, 2)
+    fig.patch.set_facecolor('#f0f0f0')
+    return fig, (ax1, ax2, ax3, ax4)
+
+
+@profiled
+def draw_activity_pie(ax, activities):
+    """Draw the activity breakdown pie chart"""
+    if activities:
+        labels = list(activities.keys())
+        sizes = [activities[activity]["time"]/3600 for activity in labels]
+        colors = matplotlib.colormaps["Set3"](np.linspace(0, 1, len(labels)))
+
+        wedges, texts, autotexts = ax.pie(sizes, labels=labels, autopct='%1.1f%%',
+                                          colors=colors, startangle=90)
+        ax.set_title("📊 Time by Activity", fontsize=14, fontweight='bold')
+
+        # Animate pie chart
+        for wedge in wedges:
+            wedge.set_linewidth(2)
+            wedge.set_edgecolor('white')
+    else:
+        ax.text(0.5, 0.5, "No data available", ha='center', va='center', transform=ax.transAxes)
+        ax.set_title("📊 Time by Activity", fontsize=14, fontweight='bold')
+
+
+def thin_ticks(ax, labels):
+    if len(labels) > MAX_TICKS:
+        ax.xaxis.set_major_locator(MaxNLocator(8))
+
+
+@profiled
+def draw_daily_trend(ax, daily_stats, period="Daily"):
+    """Draw the productivity trend and return its (line, fill) artists"""
+    dates = list(daily_stats.keys())
+    times = [daily_stats[date]["total_time"]/3600 for date in dates]
+
+    markersize = 8 if len(dates) <= MAX_TICKS else 3
+    line, = ax.plot(dates, times, marker='o', linewidth=3, markersize=markersize, color='#3498db')
+    fill = ax.fill_between(dates, times, alpha=0.3, color='#3498db')
+    ax.set_title(f"📈 {period} Productivity (Hours)", fontsize=14, fontweight='bold')
+    ax.set_ylabel("Hours")
+    ax.tick_params(axis='x', rotation=45)
+    thin_ticks(ax, dates)
+    ax.grid(True, alpha=0.3)
+    return line, fill
+
+
+def update_daily_trend(ax, artists, daily_stats):
+    """Move an existing trend line to new values for the same dates"""
+    line, fill = artists
+    dates = list(daily_stats.keys())
+    times = [daily_stats[date]["total_time"]/3600 for date in dates]
+
+    line.set_ydata(times)
+    fill.remove()
+    fill = ax.fill_between(dates, times, alpha=0.3, color='#3498db')
+    ax.relim()
+    ax.autoscale_view()
+    return line, fill
+
+
+def score_color(score):
+    """Return the gauge color for a productivity score"""
+    if score >= 80:
+        return '#2ecc71'
+    elif score >= 60:
+        return '#f39c12'
+    return '#e74c3c'
+
+
+@profiled
+def draw_productivity_score(ax, score):
+    """Draw the productivity score gauge"""
+    # Create gauge chart
+    theta = np.linspace(0, np.pi, 100)
+    r = np.ones_like(theta)
+
+    # Background arc
+    ax.plot(theta, r, color='lightgray', linewidth=20)
+
+    # Score arc
+    score_theta = np.linspace(0, np.pi * (score/100), int(score))
+    score_r = np.ones_like(score_theta)
+    color = score_color(score)
+
+    ax.plot(score_theta, score_r, color=color, linewidth=20)
+
+    # Add score text
+    ax.text(0, 0, f"{score:.0f}%", ha='center', va='center',
+            fontsize=24, fontweight='bold', color=color)
+    ax.set_title("🎯 Productivity Score", fontsize=14, fontweight='bold')
+    ax.set_ylim(0, 1.2)
+    ax.axis('off')
+
+
+@profiled
+def draw_pomodoros(ax, daily_stats, period="Daily"):
+    """Draw the Pomodoro bar chart and return its (bars, labels) artists"""
+    dates = list(daily_stats.keys())
+    pomodoros = [daily_stats[date]["pomodoros"] for date in dates]
+
+    bars = ax.bar(dates, pomodoros, color='#e74c3c', alpha=0.8)
+    ax.set_title(f"🍅 {period} Pomodoros", fontsize=14, fontweight='bold')
+    ax.set_ylabel("Pomodoros")
+    ax.tick_params(axis='x', rotation=45)
+    thin_ticks(ax, dates)
+    return bars, label_bars(ax, bars, pomodoros)
+
+
+def label_bars(ax, bars, values):
+    """Add value labels on bars, unless there are too many bars to read them"""
+    labels = []
+    if len(bars) > MAX_BAR_LABELS:
+        return labels
+    for bar, value in zip(bars, values):
+        if value > 0:
+            labels.append(ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1,
+                                  str(int(value)), ha='center', va='bottom', fontweight='bold'))
+    return labels
+
+
+def update_pomodoros(ax, artists, daily_stats):
+    """Resize existing bars to new values for the same dates"""
+    bars, labels = artists
+    pomodoros = [daily_stats[date]["pomodoros"] for date in daily_stats]
+
+    for bar, value in zip(bars, pomodoros):
+        bar.set_height(value)
+    for label in labels:
+        label.remove()
+    ax.relim()
+    ax.autoscale_view()
+    return bars, label_bars(ax, bars, pomodoros)
+
+
+def draw_heatmap(ax, values, title, cmap, label):
+    """Draw a 7x24 weekday by hour-of-day grid and return its image"""
+    image = ax.imshow(values, aspect='auto', cmap=cmap, interpolation='nearest')
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.set_yticks(range(7), WEEKDAYS)
+    ax.set_xticks(range(0, 24, 2), [f"{hour:02d}" for hour in range(0, 24, 2)])
+    ax.set_xlabel("Hour of day")
+    ax.figure.colorbar(image, ax=ax, label=label)
+    return image
+
+
+@profiled
+def build_focus_figure(heatmap):
+    """Build the focus-hours figure from ProductivityStatsManager.get_focus_heatmap"""
+    fig = Figure(figsize=(12, 8))
+    ax1, ax2 = fig.subplots(2, 1)
+    fig.patch.set_facecolor('#f0f0f0')
+    draw_heatmap(ax1, heatmap["minutes"] / 60, "🕒 Focus Hours by Weekday and Hour", "Blues",
+                 "Hours")
+    draw_heatmap(ax2, heatmap["pomodoros"], "🍅 Pomodoros Started", "Reds", "Pomodoros")
+    fig.tight_layout()
+    return fig
+
+
+@profiled
+def build_dashboard_figure(stats_manager, days=7):
+    """Build the full dashboard figure from a ProductivityStatsManager or MetricSet"""
+    fig, (ax1, ax2, ax3, ax4) = create_dashboard_figure()
+    metrics = stats_manager.compute_metrics(DashboardCache.METRICS, days)
+    daily_stats = metrics.get_daily_stats(days)
+    period = period_name(days)
+
+    draw_activity_pie(ax1, metrics.get_activity_breakdown())
+    draw_daily_trend(ax2, daily_stats, period)
+    draw_productivity_score(ax3, metrics.get_productivity_score())
+    draw_pomodoros(ax4, daily_stats, period)
+    return fig
+
+
+class DashboardCache:
+    """Keeps the dashboard figure alive between statistics windows.
+
+    ``update`` recomputes the inputs of each panel only when the data
+    version (store revision, counters and today's date) has changed, and
+    then redraws only the panels whose inputs differ from the cached
+    ones. The trend line and Pomodoro bars are updated in place when the
+    dates are unchanged; the pie and gauge are redrawn. ``blit_panels``
+    then repaints just those panels' cells of an Agg-based canvas.
+    ``days`` is a number of days or a View of timeseries.VIEWS.
+    """
+
+    PANELS = ("activities", "trend", "score", "pomodoros")
+    METRICS = ("daily", "activities", "score")
+
+    def __init__(self, days=7):
+        self.days = days
+        self.fig = None
+        self.axes = {}
+        self.inputs = {}
+        self.artists = {}
+        self.version = None
+        self.background = None
+        self.background_size = None
+        self.extents = {}
+        self.owner = None  # the window currently showing the figure
+        self.lock = threading.RLock()
+
+    def set_days(self, days):
+        """Switch to another number of days or View; the next update redraws"""
+        with self.lock:
+            if days != self.days:
+                self.days = days
+                self.version = None
+
+    @staticmethod
+    def data_version(stats_manager):
+        """Everything the dashboard inputs depend on, cheap to compute"""
+        data = stats_manager.data
+        return (stats_manager.store_revision(), data.get("comfort_choices", 0),
+                data.get("total_pomodoros", 0), date.today())
+
+    def compute_inputs(self, metrics):
+        daily_stats = metrics.get_daily_stats(self.days)
+        return {
+            "activities": metrics.get_activity_breakdown(),
+            "trend": {day: {"total_time": stats["total_time"]} for day, stats in daily_stats.items()},
+            "score": metrics.get_productivity_score(),
+            "pomodoros": {day: {"pomodoros": stats["pomodoros"]} for day, stats in daily_stats.items()}
+        }
+
+    @profiled
+    def update(self, stats_manager):
+        """Bring the figure up to date and return the names of the panels redrawn.
+
+        ``stats_manager`` may also be a MetricSet that includes ``METRICS``.
+        """
+        with self.lock:
+            if self.fig is not None and self.data_version(stats_manager) == self.version:
+                return []
+
+            metrics = stats_manager.compute_metrics(self.METRICS, self.days)
+            # The version of the data actually drawn, which may be newer than the check above
+            version = self.data_version(metrics)
+            inputs = self.compute_inputs(metrics)
+            if self.fig is None:
+                self.fig, axes = create_dashboard_figure()
+                self.axes = dict(zip(self.PANELS, axes))
+                changed = list(self.PANELS)
+            else:
+                changed = [name for name in self.PANELS if inputs[name] != self.inputs[name]]
+
+            for name in changed:
+                self.draw_panel(name, inputs[name])
+            self.inputs = inputs
+            self.version = version
+            return changed
+
+    def draw_panel(self, name, value):
+        ax = self.axes[name]
+        old = self.inputs.get(name)
+        # The trend and Pomodoro inputs are keyed by date; the others are redrawn
+        same_dates = name in ("trend", "pomodoros") and old is not None and list(old) == list(value)
+        if name == "trend" and same_dates:
+            self.artists[name] = update_daily_trend(ax, self.artists[name], value)
+        elif name == "pomodoros" and same_dates:
+            self.artists[name] = update_pomodoros(ax, self.artists[name], value)
+        else:
+            ax.clear()
+            drawer = {
+                "activities": draw_activity_pie,
+                "trend": draw_daily_trend,
+                "score": draw_productivity_score,
+                "pomodoros": draw_pomodoros
+            }[name]
+            if name in ("trend", "pomodoros"):
+                self.artists[name] = drawer(ax, value, period_name(self.days))
+            else:
+                self.artists[name] = drawer(ax, value)
+
+    def panel_region(self, name):
+        """Display-space cell of the figure grid that holds a panel"""
+        spec = self.axes[name].get_subplotspec()
+        rows, cols = spec.get_gridspec().get_geometry()
+        width, height = self.fig.canvas.get_width_height(physical=True)
+        row, col = spec.rowspan.start, spec.colspan.start
+        return Bbox.from_extents(width * col / cols, height * (rows - row - 1) / rows,
+                                 width * (col + 1) / cols, height * (rows - row) / rows)
+
+    def attach(self, canvas, owner=None):
+        """Show the figure on a new canvas; the blitting background is captured on first use"""
+        with self.lock:
+            self.owner = owner
+            self.background = None
+            self.background_size = None
+
+    @profiled
+    def full_draw(self, canvas):
+        """Draw the whole figure, keeping a copy of the empty background for blitting"""
+        with self.lock:
+            for ax in self.axes.values():
+                ax.set_visible(False)
+            canvas.draw()
+            self.background = canvas.copy_from_bbox(self.fig.bbox)
+            self.background_size = canvas.get_width_height(physical=True)
+            for ax in self.axes.values():
+                ax.set_visible(True)
+            canvas.draw()
+            self.extents = self.panel_extents(canvas.get_renderer())
+
+    def panel_extents(self, renderer):
+        return {name: ax.get_tightbbox(renderer) for name, ax in self.axes.items()}
+
+    @profiled
+    def blit_panels(self, canvas, names):
+        """Redraw only the given panels on an Agg-based canvas"""
+        if not names:
+            return
+        count("chart_panels_blitted", len(names))
+        if self.background_size != canvas.get_width_height(physical=True):
+            self.full_draw(canvas)
+            return
+        with self.lock:
+            renderer = canvas.get_renderer()
+            regions = {name: self.panel_region(name) for name in self.axes}
+            # Only the updated panels can have moved
+            extents = dict(self.extents)
+            extents.update((name, self.axes[name].get_tightbbox(renderer)) for name in names)
+
+            # Rotated tick labels can spill into a neighbouring cell; any
+            # panel that overlaps a cleared cell, before or after the
+            # update, has to be redrawn as well
+            redraw = set(names)
+            grown = True
+            while grown:
+                grown = False
+                for name in self.axes:
+                    if name in redraw:
+                        continue
+                    spans = (extents[name], self.extents[name])
+                    spilled = any(extents[other].fully_overlaps(regions[name]) or
+                                  self.extents[other].fully_overlaps(regions[name])
+                                  for other in redraw)
+                    if spilled or any(span.fully_overlaps(regions[other])
+                                      for span in spans for other in redraw):
+                        redraw.add(name)
+                        grown = True
+
+            # Saved regions are addressed in pixel rows from the top
+            height = self.background_size[1]
+            for name in redraw:
+                x0, y0, x1, y1 = regions[name].extents
+                canvas.restore_region(self.background, bbox=(x0, height - y1, x1, height - y0),
+                                      xy=(0, 0))
+            for name in self.PANELS:
+                if name in redraw:
+                    self.axes[name].draw(renderer)
+            for name in redraw:
+                canvas.blit(regions[name])
+            self.extents = extents
+
+
+def save_dashboard_png(stats_manager, path, days=7, dpi=100):
+    """Render the dashboard to a PNG file with the Agg backend"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = build_dashboard_figure(stats_manager, days)
+    FigureCanvasAgg(fig)
+    fig.savefig(path, dpi=dpi, facecolor=fig.get_facecolor())
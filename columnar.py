@@ -0,0 +1,298 @@
+# columnar.py - Column-oriented session arrays for vectorized analytics
+import numpy as np
+import pandas as pd
+
+from records import SessionRecord, SessionTable
+
+SECONDS_PER_DAY = 86400
+SECONDS_PER_HOUR = 3600
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+OFFSET = r"(?:Z|[+-]\d\d:?\d\d)$"
+
+
+def parse_timestamps(values):
+    """Parse ISO-8601 strings into int64 wall-clock seconds since 1970-01-01"""
+    # Offsets are dropped, not applied; pandas refuses a mix of offsets anyway
+    values = pd.Series(values, dtype=object).str.replace(OFFSET, "", regex=True)
+    parsed = pd.to_datetime(values, format="ISO8601")
+    return parsed.to_numpy(dtype="datetime64[s]").astype(np.int64)
+
+
+def day_labels(day_numbers):
+    """Format day numbers (days since 1970-01-01) as YYYY-MM-DD strings"""
+    return np.datetime_as_string(np.asarray(day_numbers, dtype="datetime64[D]"), unit="D").tolist()
+
+
+class SessionColumns:
+    """Sessions held as parallel NumPy arrays.
+
+    Timestamps are wall-clock seconds since 1970-01-01, so integer division
+    by 86400 gives the same calendar day as the ISO string. Activities and
+    types are stored as small integer codes into ``activities`` and
+    ``types``. Appends grow the arrays geometrically.
+    """
+
+    def __init__(self, capacity=0):
+        self.size = 0
+        self.start = np.zeros(capacity, dtype=np.int64)
+        self.end = np.zeros(capacity, dtype=np.int64)
+        self.duration = np.zeros(capacity, dtype=np.float64)
+        self.activity = np.zeros(capacity, dtype=np.int32)
+        self.type = np.zeros(capacity, dtype=np.int32)
+        self.activities = []
+        self.types = []
+        self._activity_codes = {}
+        self._type_codes = {}
+
+    @classmethod
+    def from_table(cls, table):
+        """Build columns from a SessionTable without parsing any strings"""
+        columns = cls()
+        columns.size = len(table)
+        # np.array copies, so the table's arrays stay resizable
+        columns.start = np.array(table.start, dtype=np.int64) // 1000000
+        columns.end = np.array(table.end, dtype=np.int64) // 1000000
+        columns.duration = np.array(table.duration, dtype=np.float64)
+        columns.activity = np.array(table.activity, dtype=np.int32)
+        columns.type = np.array(table.type, dtype=np.int32)
+        columns.activities = list(table.activities.names)
+        columns.types = list(table.types.names)
+        columns._activity_codes = dict(table.activities.codes)
+        columns._type_codes = dict(table.types.codes)
+        return columns
+
+    @classmethod
+    def from_packed(cls, packed):
+        """Build columns over binstore records; durations and codes stay views of the mapping"""
+        columns = cls()
+        records = packed.records
+        columns.size = len(records)
+        columns.start = records["start"] // 1000000
+        columns.end = records["end"] // 1000000
+        columns.duration = records["duration"]
+        columns.activity = records["activity"]
+        columns.type = records["type"]
+        columns.activities = list(packed.activities)
+        columns.types = list(packed.types)
+        columns._activity_codes = {name: i for i, name in enumerate(columns.activities)}
+        columns._type_codes = {name: i for i, name in enumerate(columns.types)}
+        return columns
+
+    @classmethod
+    def from_sessions(cls, sessions):
+        """Build columns from session dicts in a single pass"""
+        sessions = list(sessions)
+        columns = cls()
+        if not sessions:
+            return columns
+        if isinstance(sessions[0], SessionRecord):
+            return cls.from_table(SessionTable.from_sessions(sessions))
+
+        activity_codes, activities = pd.factorize(
+            pd.Series([s["activity"] for s in sessions], dtype=object))
+        type_codes, types = pd.factorize(
+            pd.Series([s.get("type", "manual") for s in sessions], dtype=object))
+
+        columns.size = len(sessions)
+        columns.start = parse_timestamps([s["start_time"] for s in sessions])
+        columns.end = parse_timestamps([s["end_time"] for s in sessions])
+        columns.duration = np.array([s["duration"] for s in sessions], dtype=np.float64)
+        columns.activity = activity_codes.astype(np.int32)
+        columns.type = type_codes.astype(np.int32)
+        columns.activities = list(activities)
+        columns.types = list(types)
+        columns._activity_codes = {name: i for i, name in enumerate(columns.activities)}
+        columns._type_codes = {name: i for i, name in enumerate(columns.types)}
+        return columns
+
+    @classmethod
+    def concat(cls, parts):
+        """Join several SessionColumns, merging their category tables"""
+        columns = cls()
+        if not parts:
+            return columns
+
+        activity_codes = []
+        type_codes = []
+        for part in parts:
+            activity_map = np.array([columns._code(columns._activity_codes, columns.activities, name)
+                                     for name in part.activities], dtype=np.int32)
+            type_map = np.array([columns._code(columns._type_codes, columns.types, name)
+                                 for name in part.types], dtype=np.int32)
+            activity_codes.append(activity_map[part.view("activity")] if len(activity_map)
+                                  else part.view("activity"))
+            type_codes.append(type_map[part.view("type")] if len(type_map) else part.view("type"))
+
+        columns.start = np.concatenate([part.view("start") for part in parts])
+        columns.end = np.concatenate([part.view("end") for part in parts])
+        columns.duration = np.concatenate([part.view("duration") for part in parts])
+        columns.activity = np.concatenate(activity_codes)
+        columns.type = np.concatenate(type_codes)
+        columns.size = len(columns.start)
+        return columns
+
+    def __len__(self):
+        return self.size
+
+    def to_arrays(self):
+        """Return the columns and category tables as a dict of arrays"""
+        return {
+            "start": self.view("start"),
+            "end": self.view("end"),
+            "duration": self.view("duration"),
+            "activity": self.view("activity"),
+            "type": self.view("type"),
+            "activities": np.array(self.activities, dtype=str),
+            "types": np.array(self.types, dtype=str)
+        }
+
+    def to_frame(self):
+        """Return the sessions as a pandas DataFrame with categorical columns"""
+        return pd.DataFrame({
+            "start_time": self.view("start").astype("datetime64[s]"),
+            "end_time": self.view("end").astype("datetime64[s]"),
+            "duration": self.view("duration"),
+            "activity": pd.Categorical.from_codes(self.view("activity"), categories=self.activities),
+            "type": pd.Categorical.from_codes(self.view("type"), categories=self.types)
+        })
+
+    def _code(self, codes, names, name):
+        """Return the integer code for a category, adding it if new"""
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(names)
+            names.append(name)
+        return code
+
+    def _grow(self):
+        """Double the capacity of every column"""
+        capacity = max(16, 2 * len(self.start))
+        for name in ("start", "end", "duration", "activity", "type"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def append(self, session):
+        """Append one session dict or record"""
+        if self.size == len(self.start):
+            self._grow()
+        i = self.size
+        record = SessionRecord.from_dict(session)
+        self.start[i] = record.start_us // 1000000
+        self.end[i] = record.end_us // 1000000
+        self.duration[i] = record.duration
+        self.activity[i] = self._code(self._activity_codes, self.activities, record.activity)
+        self.type[i] = self._code(self._type_codes, self.types, record.type)
+        self.size += 1
+
+    def view(self, name):
+        """Return the filled part of a column"""
+        return getattr(self, name)[:self.size]
+
+    def total_time(self):
+        """Sum of all durations"""
+        return float(self.view("duration").sum())
+
+    def _totals_by(self, codes, names):
+        time = np.bincount(codes, weights=self.view("duration"), minlength=len(names))
+        count = np.bincount(codes, minlength=len(names))
+        return {
+            name: {"time": float(time[i]), "sessions": int(count[i])}
+            for i, name in enumerate(names) if count[i]
+        }
+
+    def activity_totals(self):
+        """Time and session count per activity"""
+        return self._totals_by(self.view("activity"), self.activities)
+
+    def type_totals(self):
+        """Time and session count per session type"""
+        return self._totals_by(self.view("type"), self.types)
+
+    def daily_totals(self):
+        """Per-day totals, pomodoro counts and per-activity time"""
+        if not self.size:
+            return {}
+
+        days, day_index = np.unique(self.view("start") // SECONDS_PER_DAY, return_inverse=True)
+        duration = self.view("duration")
+        n_days = len(days)
+        n_activities = len(self.activities)
+
+        total_time = np.bincount(day_index, weights=duration, minlength=n_days)
+        sessions = np.bincount(day_index, minlength=n_days)
+        pomodoro_code = self._type_codes.get("pomodoro")
+        if pomodoro_code is None:
+            pomodoros = np.zeros(n_days, dtype=np.int64)
+        else:
+            pomodoros = np.bincount(day_index, weights=self.view("type") == pomodoro_code,
+                                    minlength=n_days).astype(np.int64)
+
+        pair_index = day_index * n_activities + self.view("activity")
+        pair_time = np.bincount(pair_index, weights=duration,
+                                minlength=n_days * n_activities).reshape(n_days, n_activities)
+        pair_count = np.bincount(pair_index,
+                                 minlength=n_days * n_activities).reshape(n_days, n_activities)
+
+        daily = {}
+        for i, label in enumerate(day_labels(days)):
+            daily[label] = {
+                "total_time": float(total_time[i]),
+                "sessions": int(sessions[i]),
+                "pomodoros": int(pomodoros[i]),
+                "activities": {
+                    self.activities[a]: float(pair_time[i, a])
+                    for a in np.flatnonzero(pair_count[i])
+                }
+            }
+        return daily
+
+    def focus_heatmap(self, start=None, end=None):
+        """Productive minutes and Pomodoros per weekday and hour of day.
+
+        Returns 7x24 arrays ``minutes`` and ``pomodoros``, rows Monday
+        first, for sessions starting in ``[start, end)`` (seconds; None
+        for no bound). A session's duration is spread over the clock hours
+        between its start and end in proportion to the overlap, so a
+        session from 9:40 to 10:20 adds 20 minutes to both 9:00 and 10:00.
+        Breaks are not productive time; Pomodoros count in the hour they
+        start. Memory is proportional to the clock hours the sessions span.
+        """
+        session_start = self.view("start")
+        keep = np.ones(self.size, dtype=bool)
+        if start is not None:
+            keep &= session_start >= start
+        if end is not None:
+            keep &= session_start < end
+        types = self.view("type")
+        is_pomodoro = types == self._type_codes.get("pomodoro", -1)
+        pomodoro_hours = session_start[keep & is_pomodoro] // SECONDS_PER_HOUR
+
+        keep &= types != self._type_codes.get("break", -1)
+        first = session_start[keep]
+        last = np.maximum(self.view("end")[keep], first)
+        duration = self.view("duration")[keep]
+
+        # One piece per clock hour a session touches
+        first_hour = first // SECONDS_PER_HOUR
+        last_hour = np.maximum(last - 1, first) // SECONDS_PER_HOUR
+        pieces = last_hour - first_hour + 1
+        owner = np.repeat(np.arange(len(first)), pieces)
+        offset = np.arange(len(owner)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+        hour = first_hour[owner] + offset
+        overlap = (np.minimum(last[owner], (hour + 1) * SECONDS_PER_HOUR)
+                   - np.maximum(first[owner], hour * SECONDS_PER_HOUR))
+        span = (last - first)[owner]
+        # A session without a clock span lands whole in its start hour
+        share = np.where(span > 0, overlap / np.maximum(span, 1), 1.0)
+
+        minutes = np.bincount(self.week_slot(hour), weights=duration[owner] * share / 60,
+                              minlength=7 * 24)
+        pomodoros = np.bincount(self.week_slot(pomodoro_hours), minlength=7 * 24)
+        return {"minutes": minutes.reshape(7, 24), "pomodoros": pomodoros.reshape(7, 24)}
+
+    @staticmethod
+    def week_slot(hours):
+        """Weekday * 24 + hour of day of hour numbers; 1970-01-01 was a Thursday"""
+        return (hours // 24 + 3) % 7 * 24 + hours % 24
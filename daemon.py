@@ -0,0 +1,574 @@
+# daemon.py - Local ingestion daemon that owns one session store
+#
+# Usage:
+#   python daemon.py productivity_data.json --socket /tmp/productivity.sock
+#   python daemon.py team_data.db --tcp 127.0.0.1:8765
+#   python main.py --daemon /tmp/productivity.sock
+#
+# Several timers sharing a data file each overwrote the others' writes.
+# With the daemon running, only the daemon touches the file; timers and
+# statistics windows connect to it through RemoteStore.
+#
+# The protocol is one JSON object per line. Every request carries an "id"
+# that its response echoes, so requests can be pipelined:
+#   {"id": 1, "op": "append", "session": {...}}     -> {"id": 1, "revision": 42}
+#   {"id": 2, "op": "increment", "key": "comfort_choices", "amount": 1}
+#   {"id": 5, "op": "append_many", "sessions": [...]}  -> {"id": 5, "revision": 1042}
+#   {"id": 3, "op": "totals"}                       -> {"id": 3, "result": {...}, "revision": 42}
+#   {"id": 4, "op": "query_sessions", "first_day": "2024-01-01"}
+#       -> {"id": 4, "rows": [...]} per chunk, then {"id": 4, "result": <count>, ...}
+# A failed request is answered with {"id": ..., "error": "..."}.
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from records import SessionRecord, SessionTable, session_dict
+from storage import SessionStore
+
+MUTATIONS = ("append", "append_many", "increment")
+COUNTERS = ("comfort_choices", "total_pomodoros")  # the only keys "increment" may touch
+QUERIES = ("status", "totals", "daily_totals", "activity_totals", "type_totals",
+           "session_count", "session_page", "query_sessions", "compact", "flush")
+ROW_CHUNK = 1000  # sessions per "rows" message
+LINE_LIMIT = 1 << 20  # longest request line accepted
+
+
+class DaemonError(Exception):
+    """A request failed in the daemon, or the connection to it was lost"""
+
+
+def parse_address(address):
+    """Return ("tcp", host, port) for HOST:PORT and ("unix", path) otherwise"""
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit() and "/" not in host and os.sep not in host:
+        return "tcp", host or "127.0.0.1", int(port)
+    return "unix", address
+
+
+def encode(message):
+    return (json.dumps(message) + "\n").encode("utf-8")
+
+
+def validate_session(session):
+    record = SessionRecord.from_dict(session)
+    if not isinstance(record.activity, str) or not isinstance(record.type, str):
+        raise ValueError("activity and type must be strings")
+    if isinstance(record.duration, bool) or not isinstance(record.duration, (int, float)):
+        raise ValueError("duration must be a number")
+
+
+def validate(request):
+    """Reject a malformed mutation before it is queued"""
+    if request["op"] == "append":
+        validate_session(request["session"])
+    elif request["op"] == "append_many":
+        if not isinstance(request["sessions"], list):
+            raise ValueError("sessions must be a list")
+        for session in request["sessions"]:
+            validate_session(session)
+    else:
+        if request["key"] not in COUNTERS:
+            raise ValueError(f"key must be one of {', '.join(COUNTERS)}")
+        amount = request.get("amount", 1)
+        if isinstance(amount, bool) or not isinstance(amount, int):
+            raise ValueError("amount must be an integer")
+
+
+class IngestionDaemon:
+    """Serves one SessionStore to many local clients.
+
+    Mutations from every connection share one bounded queue. The ingest
+    task takes whatever has accumulated, up to ``batch_size``, and applies
+    it on a single writer thread under one acquisition of the store lock
+    before acknowledging each request. While the queue is full,
+    connections are not read, so the socket buffers push back on the
+    clients. Queries run on a small thread pool and never wait behind
+    ingestion for longer than one batch.
+    """
+
+    def __init__(self, store, batch_size=256, queue_size=4096, query_threads=4):
+        self.store = store
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.ingest_executor = ThreadPoolExecutor(1, thread_name_prefix="ingest")
+        self.query_executor = ThreadPoolExecutor(query_threads, thread_name_prefix="query")
+        self.address = None
+        self.queue = None
+        self.server = None
+        self.ingest_task = None
+        self.writers = set()
+        self.stopping = None
+
+        # Instrumentation
+        self.connections = 0
+        self.batches = 0
+        self.ingested = 0
+        self.largest_batch = 0
+
+    async def start(self, address):
+        """Start listening on a Unix socket path or a HOST:PORT"""
+        self.address = address
+        self.queue = asyncio.Queue(self.queue_size)
+        self.stopping = asyncio.Event()
+        self.ingest_task = asyncio.create_task(self.ingest())
+        kind, *where = parse_address(address)
+        if kind == "tcp":
+            self.server = await asyncio.start_server(self.handle_client, where[0], where[1],
+                                                     backlog=4096, limit=LINE_LIMIT)
+        else:
+            path = where[0]
+            if os.path.exists(path):
+                if self.socket_alive(path):
+                    raise DaemonError(f"a daemon is already listening on {path}")
+                os.remove(path)  # left behind by a daemon that did not exit cleanly
+            self.server = await asyncio.start_unix_server(self.handle_client, path,
+                                                          backlog=4096, limit=LINE_LIMIT)
+        return self.server
+
+    @staticmethod
+    def socket_alive(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            return True
+        except OSError:
+            return False
+        finally:
+            probe.close()
+
+    async def serve(self, address):
+        """Run until SIGINT or SIGTERM, then flush the store"""
+        await self.start(address)
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # not available on this platform; Ctrl+C still ends the loop
+        await self.stopping.wait()
+        await self.stop()
+
+    async def stop(self):
+        """Stop accepting clients, apply everything queued and close the store"""
+        self.server.close()
+        for writer in list(self.writers):
+            writer.close()
+        await self.queue.join()
+        self.ingest_task.cancel()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.ingest_executor, self.store.close)
+        self.ingest_executor.shutdown()
+        self.query_executor.shutdown()
+        kind, *where = parse_address(self.address)
+        if kind == "unix" and os.path.exists(where[0]):
+            os.remove(where[0])
+
+    def reply(self, writer, message):
+        if not writer.is_closing():
+            writer.write(encode(message))
+
+    async def handle_client(self, reader, writer):
+        self.connections += 1
+        self.writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request_id = None
+                try:
+                    request = json.loads(line)
+                    request_id = request.get("id")
+                    op = request["op"]
+                    if op in MUTATIONS:
+                        validate(request)
+                    elif op not in QUERIES:
+                        raise ValueError(f"unknown op {op!r}")
+                except KeyError as exc:
+                    self.reply(writer, {"id": request_id, "error": f"bad request: missing {exc}"})
+                    continue
+                except (ValueError, TypeError, AttributeError) as exc:
+                    self.reply(writer, {"id": request_id, "error": f"bad request: {exc}"})
+                    continue
+
+                if op in MUTATIONS:
+                    # Waits while the queue is full: this connection stops being read
+                    await self.queue.put((writer, request))
+                else:
+                    await self.answer(writer, request)
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass  # client went away, or sent a line over LINE_LIMIT
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    async def ingest(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                results = await loop.run_in_executor(
+                    self.ingest_executor, self.apply_batch, [request for _, request in batch])
+            except Exception as exc:
+                results = [{"error": f"{type(exc).__name__}: {exc}"}] * len(batch)
+            for (writer, request), result in zip(batch, results):
+                self.reply(writer, dict(result, id=request.get("id")))
+                self.queue.task_done()
+
+    def apply_batch(self, requests):
+        """Writer thread: apply a batch of mutations under one store lock"""
+        store = self.store
+        results = []
+        with store.lock:
+            for request in requests:
+                try:
+                    if request["op"] == "append":
+                        store.append_session(request["session"])
+                        results.append({"revision": store.revision})
+                    elif request["op"] == "append_many":
+                        store.append_sessions(request["sessions"])
+                        results.append({"revision": store.revision})
+                    else:
+                        key = request["key"]
+                        store.increment(key, request.get("amount", 1))
+                        results.append({"revision": store.revision,
+                                        "counters": {key: store.data.get(key, 0)}})
+                except Exception as exc:
+                    results.append({"error": f"{type(exc).__name__}: {exc}"})
+        self.batches += 1
+        self.ingested += len(requests)
+        self.largest_batch = max(self.largest_batch, len(requests))
+        return results
+
+    async def answer(self, writer, request):
+        loop = asyncio.get_running_loop()
+        request_id = request.get("id")
+        try:
+            if request["op"] == "query_sessions":
+                table = await loop.run_in_executor(self.query_executor, self.store.query_sessions,
+                                                   request.get("first_day"), request.get("last_day"),
+                                                   request.get("activities"))
+                chunks = self.row_chunks(request_id, table)
+                while True:
+                    # Encoded off the event loop, sent one chunk at a time
+                    line = await loop.run_in_executor(self.query_executor, next, chunks, None)
+                    if line is None:
+                        break
+                    writer.write(line)
+                    await writer.drain()
+                result = len(table)
+            else:
+                result = await loop.run_in_executor(self.query_executor, self.run_query, request)
+            self.reply(writer, {"id": request_id, "result": result, "revision": self.store.revision})
+        except (ValueError, KeyError, TypeError, OSError) as exc:
+            self.reply(writer, {"id": request_id, "error": f"{type(exc).__name__}: {exc}"})
+
+    @staticmethod
+    def row_chunks(request_id, table):
+        rows = []
+        for row in table.json_rows():
+            rows.append(row)
+            if len(rows) == ROW_CHUNK:
+                yield f'{{"id": {json.dumps(request_id)}, "rows": [{", ".join(rows)}]}}\n'.encode("utf-8")
+                rows = []
+        if rows:
+            yield f'{{"id": {json.dumps(request_id)}, "rows": [{", ".join(rows)}]}}\n'.encode("utf-8")
+
+    def run_query(self, request):
+        """Query thread: answer one read-only request"""
+        store = self.store
+        op = request["op"]
+        if op == "status":
+            with store.lock:
+                return {"revision": store.revision,
+                        "counters": {key: value for key, value in store.data.items()
+                                     if key != "sessions"}}
+        if op == "daily_totals":
+            return store.daily_totals(request["first_day"], request["last_day"])
+        if op == "session_page":
+            page = store.session_page(request.get("offset", 0), request.get("limit", 50))
+            return [session_dict(session) for session in page]
+        if op == "compact":
+            store.compact()
+            return None
+        if op == "flush":
+            store.flush()
+            return None
+        return getattr(store, op)()
+
+
+class DaemonClient:
+    """Blocking connection to an IngestionDaemon; safe to share between threads.
+
+    ``submit`` sends a request and returns a Future for its response, so
+    callers can pipeline; ``request`` waits for it. Responses are read on
+    a background thread.
+    """
+
+    def __init__(self, address, timeout=30.0):
+        kind, *where = parse_address(address)
+        if kind == "tcp":
+            self.sock = socket.create_connection(tuple(where))
+        else:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(where[0])
+        self.timeout = timeout
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.closed = False
+        self.reader = threading.Thread(target=self.read_responses, name="daemon-client",
+                                       daemon=True)
+        self.reader.start()
+
+    def submit(self, op, **args):
+        """Send a request and return a Future for its response message"""
+        future = Future()
+        request_id = next(self.ids)
+        with self.lock:
+            if self.closed:
+                raise DaemonError("connection to the daemon is closed")
+            self.pending[request_id] = [future, None]
+        line = encode(dict(args, id=request_id, op=op))
+        try:
+            with self.send_lock:
+                self.sock.sendall(line)
+        except OSError as exc:
+            with self.lock:
+                self.pending.pop(request_id, None)
+            raise DaemonError(f"could not reach the daemon: {exc}") from exc
+        return future
+
+    def request(self, op, **args):
+        """Send a request and return its response message"""
+        return self.wait(self.submit(op, **args))
+
+    def wait(self, future):
+        """Return the response message of a submitted request"""
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            raise DaemonError(f"the daemon did not answer within {self.timeout} s") from None
+
+    def read_responses(self):
+        reason = "connection to the daemon closed"
+        try:
+            for line in self.sock.makefile("rb"):
+                response = json.loads(line)
+                with self.lock:
+                    entry = self.pending.get(response.get("id"))
+                if entry is None:
+                    continue
+                if "rows" in response:
+                    if entry[1] is None:
+                        entry[1] = SessionTable()
+                    for row in response["rows"]:
+                        entry[1].append(row)
+                    continue
+
+                with self.lock:
+                    del self.pending[response["id"]]
+                if "error" in response:
+                    entry[0].set_exception(DaemonError(response["error"]))
+                else:
+                    if entry[1] is not None:
+                        response["rows"] = entry[1]
+                    entry[0].set_result(response)
+        except (OSError, ValueError) as exc:
+            reason = f"connection to the daemon failed: {exc}"
+        finally:
+            with self.lock:
+                self.closed = True
+                pending, self.pending = self.pending, {}
+            for future, rows in pending.values():
+                future.set_exception(DaemonError(reason))
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class RemoteStore:
+    """The SessionStore interface, served by an IngestionDaemon.
+
+    Mutations wait for the daemon's acknowledgement before listeners are
+    notified, so listeners run on the calling thread as with a local
+    store. ``revision`` is cached and kept current by every response;
+    reading it asks the daemon again, refreshing the counters in
+    ``data`` too, only once ``max_age`` seconds have passed since the
+    last ``refresh``, so other clients' changes show up within about one
+    UI tick. Aggregates are always answered by the daemon, so
+    ``loads_on_demand`` is set.
+    """
+
+    loads_on_demand = True
+
+    def __init__(self, address, timeout=30.0, max_age=0.1):
+        self.data_file = address
+        self.client = DaemonClient(address, timeout)
+        self.max_age = max_age
+        self.lock = threading.RLock()
+        self.listeners = []
+        self.data = {}
+        self.cached_revision = 0
+        self.refreshed = 0.0
+        self.refresh()
+
+    def refresh(self):
+        """Fetch the counters and return the current revision"""
+        status = self.query("status")
+        self.data.update(status["counters"])
+        self.refreshed = time.monotonic()
+        self.cached_revision = status["revision"]
+        return self.cached_revision
+
+    @property
+    def revision(self):
+        if time.monotonic() - self.refreshed >= self.max_age:
+            return self.refresh()
+        return self.cached_revision
+
+    def seen(self, revision):
+        """Note a revision from a response; pipelined responses may arrive out of order"""
+        self.cached_revision = max(self.cached_revision, revision)
+        return revision
+
+    def subscribe(self, listener):
+        """Register a change listener"""
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        """Remove a change listener"""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def notify(self, event, payload, revision):
+        for listener in list(self.listeners):
+            listener(event, payload, revision)
+
+    def request(self, op, **args):
+        response = self.client.request(op, **args)
+        if "revision" in response:
+            self.seen(response["revision"])
+        return response
+
+    def query(self, op, **args):
+        return self.request(op, **args)["result"]
+
+    def append_session(self, session):
+        """Store a finished session and notify listeners"""
+        response = self.request("append", session=session_dict(session))
+        self.notify("session_appended", session, response["revision"])
+
+    def append_sessions(self, sessions):
+        """Store many sessions, sent in pipelined chunks, and notify listeners once"""
+        futures = []
+        for i in range(0, len(sessions), ROW_CHUNK):
+            chunk = [session_dict(sessions[j]) for j in range(i, min(i + ROW_CHUNK, len(sessions)))]
+            futures.append(self.client.submit("append_many", sessions=chunk))
+        revision = None
+        for future in futures:
+            revision = self.seen(self.client.wait(future)["revision"])
+        if futures:
+            self.notify("sessions_imported", len(sessions), revision)
+
+    def increment(self, key, amount=1):
+        """Bump a counter and notify listeners"""
+        response = self.request("increment", key=key, amount=amount)
+        self.data.update(response["counters"])
+        self.notify("counter_incremented", key, response["revision"])
+
+    def query_sessions(self, first_day=None, last_day=None, activities=None):
+        """Return a SessionTable of sessions matching a date range and activity filter"""
+        if activities is not None:
+            activities = list(activities)
+        response = self.request("query_sessions", first_day=first_day,
+                                last_day=last_day, activities=activities)
+        return response.get("rows") or SessionTable()
+
+    def snapshot_sessions(self):
+        """Return a SessionTable of all sessions and the matching revision"""
+        response = self.request("query_sessions")
+        return response.get("rows") or SessionTable(), response["revision"]
+
+    def iter_sessions(self):
+        return iter(self.snapshot_sessions()[0])
+
+    def session_page(self, offset=0, limit=50):
+        """Return one page of sessions, newest first"""
+        return [SessionRecord.from_dict(session)
+                for session in self.query("session_page", offset=offset, limit=limit)]
+
+    def recent_sessions(self, limit=10):
+        return self.session_page(0, limit)
+
+    def session_count(self):
+        return self.query("session_count")
+
+    def totals(self):
+        return self.query("totals")
+
+    def daily_totals(self, first_day, last_day):
+        return self.query("daily_totals", first_day=first_day, last_day=last_day)
+
+    def activity_totals(self):
+        return self.query("activity_totals")
+
+    def type_totals(self):
+        return self.query("type_totals")
+
+    def compact(self):
+        """Ask the daemon to persist a compact copy of the data"""
+        self.query("compact")
+
+    def flush(self):
+        """Wait until the daemon has everything so far on disk"""
+        self.query("flush")
+
+    def close(self):
+        """Disconnect; the daemon keeps the store open for other clients"""
+        self.client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a productivity data file to local clients")
+    parser.add_argument("data_file", nargs="?", default="productivity_data.json")
+    where = parser.add_mutually_exclusive_group()
+    where.add_argument("--socket", default="productivity.sock", help="Unix socket path")
+    where.add_argument("--tcp", metavar="HOST:PORT", help="listen on TCP instead, e.g. 127.0.0.1:8765")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--queue-size", type=int, default=4096,
+                        help="mutations accepted before clients are made to wait")
+    args = parser.parse_args()
+
+    address = args.tcp or args.socket
+    if parse_address(address)[0] == "unix" and not hasattr(socket, "AF_UNIX"):
+        parser.error("Unix sockets are not available here; use --tcp")
+    daemon = IngestionDaemon(SessionStore(args.data_file), args.batch_size, args.queue_size)
+    print(f"Serving {args.data_file} on {address}", file=sys.stderr, flush=True)
+    try:
+        asyncio.run(daemon.serve(address))
+    except KeyboardInterrupt:
+        daemon.store.close()  # no signal handlers on this platform
+    print(f"Stopped after {daemon.ingested} mutations in {daemon.batches} batches", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
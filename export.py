@@ -0,0 +1,137 @@
+# export.py - Streaming session export to CSV and columnar formats
+import csv
+import os
+
+from records import SessionTable
+from profiling import profiled
+
+CSV_HEADER = ["Start Time", "End Time", "Activity", "Duration (minutes)", "Type"]
+
+FORMATS = {
+    "csv": ("CSV files", "*.csv"),
+    "parquet": ("Parquet files", "*.parquet"),
+    "npz": ("NumPy archives", "*.npz")
+}
+
+
+class ExportCancelled(Exception):
+    """Raised when an export is cancelled before it finishes"""
+
+
+def format_for_path(path):
+    """Guess the export format from a file name, defaulting to CSV"""
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    return extension if extension in FORMATS else "csv"
+
+
+def csv_row(session):
+    """Convert a SessionRecord to a CSV row in the export layout"""
+    return [
+        session.start_time,
+        session.end_time,
+        session.activity,
+        round(session.duration / 60, 2),
+        session.type
+    ]
+
+
+class SessionExporter:
+    """Writes sessions to disk in chunks, reporting progress and honouring cancellation.
+
+    ``progress`` is called as ``progress(done, total)`` after every chunk and
+    ``cancel_event`` is a ``threading.Event`` checked between chunks, so an
+    exporter can run on a worker thread while the UI stays responsive.
+    Output goes to a temporary file that only replaces ``path`` on success.
+    """
+
+    def __init__(self, chunk_size=5000, progress=None, cancel_event=None):
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.cancel_event = cancel_event
+
+    def report(self, done, total):
+        if self.progress is not None:
+            self.progress(done, total)
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise ExportCancelled()
+
+    @profiled
+    def export(self, path, sessions, fmt=None):
+        """Export a SessionTable or list of sessions to path and return the number written"""
+        fmt = fmt or format_for_path(path)
+        writer = {
+            "csv": self.write_csv,
+            "parquet": self.write_parquet,
+            "npz": self.write_npz
+        }[fmt]
+
+        tmp_path = path + ".part"
+        try:
+            writer(tmp_path, sessions)
+            self.check_cancelled()
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return len(sessions)
+
+    def write_csv(self, path, sessions):
+        """Write CSV rows chunk by chunk"""
+        total = len(sessions)
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(CSV_HEADER)
+            for start in range(0, total, self.chunk_size):
+                self.check_cancelled()
+                chunk = sessions[start:start + self.chunk_size]
+                writer.writerows(csv_row(session) for session in chunk)
+                self.report(start + len(chunk), total)
+        self.report(total, total)
+
+    def build_columns(self, sessions):
+        """Convert sessions to SessionColumns chunk by chunk"""
+        from columnar import SessionColumns
+
+        if isinstance(sessions, SessionTable):
+            self.check_cancelled()
+            return SessionColumns.from_table(sessions)
+
+        total = len(sessions)
+        parts = []
+        for start in range(0, total, self.chunk_size):
+            self.check_cancelled()
+            parts.append(SessionColumns.from_sessions(sessions[start:start + self.chunk_size]))
+            # Column conversion is the slow half; writing is the rest
+            self.report((start + len(parts[-1])) // 2, total)
+        return SessionColumns.concat(parts)
+
+    def write_parquet(self, path, sessions):
+        """Write a Parquet file through pandas (needs pyarrow or fastparquet)"""
+        columns = self.build_columns(sessions)
+        self.check_cancelled()
+        columns.to_frame().to_parquet(path, index=False)
+        self.report(len(sessions), len(sessions))
+
+    def write_npz(self, path, sessions):
+        """Write a compressed NumPy archive of the session columns"""
+        import numpy as np
+
+        columns = self.build_columns(sessions)
+        self.check_cancelled()
+        # np.savez appends .npz to names without it, so write through a handle
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, **columns.to_arrays())
+        self.report(len(sessions), len(sessions))
+
+
+def parquet_available():
+    """Return True if pandas has a Parquet engine installed"""
+    for engine in ("pyarrow", "fastparquet"):
+        try:
+            __import__(engine)
+            return True
+        except ImportError:
+            continue
+    return False
@@ -0,0 +1,360 @@
+# importer.py - Streaming bulk import of sessions from CSV and JSON files
+#
+# Usage: python importer.py [--data-file productivity_data.json] history.csv [more files...]
+import csv
+import json
+import math
+import os
+
+import numpy as np
+
+from profiling import count, profiled
+from records import SessionRecord, SessionTable, parse_timestamp
+
+FORMATS = {
+    "csv": ("CSV files", "*.csv"),
+    "jsonl": ("JSON lines", "*.jsonl"),
+    "json": ("JSON documents", "*.json")
+}
+
+# Accepted CSV headers, compared lowercased; the first of each is what
+# export_data writes
+FIELD_HEADERS = {
+    "start_time": ("start time", "start_time", "start", "started", "begin"),
+    "end_time": ("end time", "end_time", "end", "ended", "stop"),
+    "activity": ("activity", "task", "project", "description"),
+    "type": ("type", "session type", "kind")
+}
+# Duration headers and the seconds in one unit of each
+DURATION_HEADERS = {
+    "duration (minutes)": 60, "duration_minutes": 60, "minutes": 60,
+    "duration (hours)": 3600, "duration_hours": 3600, "hours": 3600,
+    "duration (seconds)": 1, "duration_seconds": 1, "duration": 1, "seconds": 1
+}
+
+# Odd 64-bit constants for mixing the dedup key
+MIX = tuple(np.uint64(value) for value in
+            (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xFF51AFD7ED558CCD))
+
+
+class ImportCancelled(Exception):
+    """Raised when an import is cancelled before anything was written"""
+
+
+def format_for_path(path):
+    """Guess the input format from a file name, defaulting to CSV"""
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    return extension if extension in FORMATS else "csv"
+
+
+def key_hashes(start_us, activity_hashes, duration):
+    """64-bit hashes of (start time, activity, duration) keys.
+
+    Durations are compared in hundredths of a minute, the precision of
+    the export CSV, so re-importing an export finds every session.
+    """
+    h = np.asarray(start_us, dtype=np.int64).view(np.uint64) * MIX[0]
+    h += np.asarray(activity_hashes, dtype=np.uint64) * MIX[1]
+    h += np.rint(np.asarray(duration, dtype=np.float64) / 0.6).astype(np.int64).view(np.uint64) * MIX[2]
+    h ^= h >> np.uint64(33)
+    h *= MIX[3]
+    h ^= h >> np.uint64(29)
+    return h
+
+
+def activity_hash(name):
+    return hash(name) & 0xFFFFFFFFFFFFFFFF
+
+
+class DedupIndex:
+    """Sorted 64-bit hashes of the session keys seen so far.
+
+    Eight bytes per session; lookups are a vectorized binary search. A
+    hash collision would drop a session as a duplicate, which for 64-bit
+    hashes is vanishingly unlikely at these sizes. New hashes are kept in
+    a few sorted runs, merged with each other like a binary counter, and
+    folded into the main array by ``merge`` once per file, so adding a
+    chunk never copies the whole index.
+    """
+
+    def __init__(self, hashes=()):
+        self.hashes = np.unique(np.asarray(hashes, dtype=np.uint64))
+        self.runs = []  # sorted hashes added since the last merge, largest first
+
+    @classmethod
+    def from_table(cls, table):
+        """Index the sessions of a SessionTable without building records"""
+        names = np.array([activity_hash(name) for name in table.activities.names], dtype=np.uint64)
+        activity = np.array(table.activity, dtype=np.int64)
+        return cls(key_hashes(np.array(table.start, dtype=np.int64),
+                              names[activity] if len(names) else activity,
+                              np.array(table.duration, dtype=np.float64)))
+
+    def __len__(self):
+        return len(self.hashes) + sum(len(run) for run in self.runs)
+
+    @staticmethod
+    def contains(hashes, values):
+        """Mask of the values found in a sorted array"""
+        positions = np.searchsorted(hashes, values)
+        known = positions < len(hashes)
+        known[known] = hashes[positions[known]] == values[known]
+        return known
+
+    def add(self, hashes):
+        """Add a chunk of hashes and return a mask of the ones not seen before"""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        # Only the first occurrence within the chunk can be new
+        unique, first = np.unique(hashes, return_index=True)
+        known = self.contains(self.hashes, unique)
+        for run in self.runs:
+            known |= self.contains(run, unique)
+        fresh = np.zeros(len(hashes), dtype=bool)
+        fresh[first[~known]] = True
+
+        run = unique[~known]
+        if len(run):
+            while self.runs and len(self.runs[-1]) <= len(run):
+                run = np.concatenate((self.runs.pop(), run))
+                run.sort()
+            self.runs.append(run)
+        return fresh
+
+    def merge(self):
+        """Fold the runs into the main array"""
+        if self.runs:
+            # Runs never repeat a hash of the index, so sorting is enough
+            self.hashes = np.concatenate([self.hashes] + self.runs)
+            self.hashes.sort()
+            self.runs = []
+
+
+class ImportResult:
+    """Counts of what an import did, plus the first few rejected rows"""
+
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.errors = []  # (file:line, message)
+
+    def summary(self):
+        return (f"{self.imported:,} sessions imported, {self.duplicates:,} duplicates skipped, "
+                f"{self.rejected:,} rows rejected")
+
+
+def parse_row_timestamp(text):
+    try:
+        return parse_timestamp(text)[0]
+    except ValueError:
+        raise ValueError(f"invalid timestamp {text!r}") from None
+
+
+def normalize(row, duration_scale=1):
+    """Validate one input row and return it as a SessionRecord.
+
+    ``row`` has the session field names; a missing end time is derived
+    from the duration and vice versa. Timestamps keep their wall-clock
+    time. Raises ValueError with a message for invalid rows.
+    """
+    if not isinstance(row, dict):
+        raise ValueError("not a session object")
+    start = (row.get("start_time") or "").strip()
+    end = (row.get("end_time") or "").strip()
+    activity = (row.get("activity") or "").strip()
+    duration = row.get("duration")
+    if not start:
+        raise ValueError("missing start time")
+    if not activity:
+        raise ValueError("missing activity")
+    start_us = parse_row_timestamp(start)
+    end_us = parse_row_timestamp(end) if end else None
+
+    if isinstance(duration, str):
+        duration = duration.strip() or None
+    if duration is not None:
+        try:
+            duration = float(duration) * duration_scale
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid duration {row.get('duration')!r}") from None
+        if not math.isfinite(duration) or duration < 0:
+            raise ValueError(f"invalid duration {row.get('duration')!r}")
+    if end_us is None:
+        if duration is None:
+            raise ValueError("missing end time and duration")
+        end_us = start_us + round(duration * 1000000)
+    if end_us < start_us:
+        raise ValueError("ends before it starts")
+
+    span = (end_us - start_us) / 1000000
+    # Minutes rounded to two decimals (as exported) that match the clock
+    # span are the span itself
+    if duration is None or (duration_scale > 1
+                            and abs(span - duration) <= 0.005 * duration_scale + 1e-6):
+        duration = span
+    if duration == int(duration):
+        duration = int(duration)
+    session_type = (row.get("type") or "manual").strip().lower() or "manual"
+    return SessionRecord(activity, duration, start_us, end_us, session_type)
+
+
+class SessionImporter:
+    """Reads sessions in chunks, validates them and commits them in one batch.
+
+    Like SessionExporter, ``progress(done, total)`` is called after every
+    chunk (in bytes of input) and ``cancel_event`` is checked between
+    chunks. Rows are normalized into a SessionTable, about 33 bytes per
+    session, and checked against a DedupIndex of the existing sessions;
+    nothing is stored until every input has been read, and then all new
+    sessions go to the store in one ``append_sessions`` call.
+    """
+
+    def __init__(self, chunk_size=10000, progress=None, cancel_event=None, max_errors=20):
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.cancel_event = cancel_event
+        self.max_errors = max_errors
+
+    def report(self, done, total):
+        if self.progress is not None:
+            self.progress(done, total)
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise ImportCancelled()
+
+    @profiled
+    def import_files(self, store, paths):
+        """Import several files into a SessionStore and return an ImportResult"""
+        existing, _ = store.snapshot_sessions()
+        index = DedupIndex.from_table(existing)
+        del existing
+        result = ImportResult()
+        table = SessionTable()
+        for path in paths:
+            self.read_file(path, index, table, result)
+        self.check_cancelled()
+        if len(table):
+            store.append_sessions(table)
+        result.imported = len(table)
+        count("sessions_imported", len(table))
+        return result
+
+    def import_file(self, store, path):
+        return self.import_files(store, [path])
+
+    def read_file(self, path, index, table, result):
+        """Add the new sessions of one file to ``table``"""
+        total = os.path.getsize(path)
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            fmt = format_for_path(path)
+            if fmt == "csv":
+                rows, scale = self.csv_rows(f)
+            elif fmt == "jsonl":
+                rows, scale = self.jsonl_rows(f), 1
+            else:
+                rows, scale = self.json_rows(f), 1
+
+            chunk = []
+            for line, row in rows:
+                chunk.append((line, row))
+                if len(chunk) >= self.chunk_size:
+                    self.add_chunk(path, chunk, scale, index, table, result)
+                    chunk = []
+                    # Bytes, like the total; ahead of the rows by at most the read buffer
+                    self.report(f.buffer.tell(), total)
+            self.add_chunk(path, chunk, scale, index, table, result)
+        index.merge()
+        self.report(total, total)
+
+    def add_chunk(self, path, chunk, scale, index, table, result):
+        self.check_cancelled()
+        records = []
+        for line, row in chunk:
+            try:
+                records.append(normalize(row, scale))
+            except (ValueError, TypeError, AttributeError) as exc:
+                result.rejected += 1
+                if len(result.errors) < self.max_errors:
+                    result.errors.append((f"{path}:{line}", str(exc)))
+        result.read += len(chunk)
+        if not records:
+            return
+
+        fresh = index.add(key_hashes([record.start_us for record in records],
+                                     [activity_hash(record.activity) for record in records],
+                                     [record.duration for record in records]))
+        for record, keep in zip(records, fresh):
+            if keep:
+                table.append(record)
+        result.duplicates += len(records) - int(fresh.sum())
+
+    def csv_rows(self, f):
+        """Map a CSV header to session fields; returns (rows, seconds per duration unit)"""
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader, [])]
+        columns = {}
+        for field, names in FIELD_HEADERS.items():
+            for name in names:
+                if name in header:
+                    columns[field] = header.index(name)
+                    break
+        scale = 1
+        for name, seconds in DURATION_HEADERS.items():
+            if name in header:
+                columns["duration"] = header.index(name)
+                scale = seconds
+                break
+        if "start_time" not in columns or "activity" not in columns:
+            raise ValueError("CSV needs a start time and an activity column")
+
+        def rows():
+            width = max(columns.values()) + 1
+            for line, values in enumerate(reader, start=2):
+                if not values:
+                    continue
+                if len(values) < width:
+                    values = values + [""] * (width - len(values))
+                yield line, {field: values[i] for field, i in columns.items()}
+        return rows(), scale
+
+    def jsonl_rows(self, f):
+        for line, text in enumerate(f, start=1):
+            if text.strip():
+                try:
+                    yield line, json.loads(text)
+                except ValueError:
+                    yield line, None
+
+    def json_rows(self, f):
+        """Sessions of a data document or a list; the document is read whole"""
+        document = json.load(f)
+        sessions = document.get("sessions", []) if isinstance(document, dict) else document
+        for number, session in enumerate(sessions, start=1):
+            yield number, session
+
+
+def main():
+    import argparse
+
+    from storage import SessionStore
+
+    parser = argparse.ArgumentParser(description="Import session history from CSV or JSON files")
+    parser.add_argument("inputs", nargs="+", help="files to import (.csv, .jsonl or .json)")
+    parser.add_argument("--data-file", default="productivity_data.json",
+                        help="data file to import into (.json, .db, .parts or .bin)")
+    args = parser.parse_args()
+
+    store = SessionStore(args.data_file)
+    try:
+        result = SessionImporter().import_files(store, args.inputs)
+    finally:
+        store.close()
+    for location, message in result.errors:
+        print(f"{location}: {message}")
+    print(result.summary())
+
+
+if __name__ == "__main__":
+    main()
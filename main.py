@@ -1,27 +1,36 @@
 import tkinter as tk
-from tkinter import ttk
-import json
-import os
+from tkinter import messagebox, ttk
+import queue
+import threading
 from datetime import datetime, timedelta
 
-from productivity_stats import ProductivityStatsWindow
+from profiling import profiled, profiler
+from scheduler import WakeScheduler, clock, seconds_until_next_tick
+from storage import SessionStore
 
 class ProductivityTimer:
-    def __init__(self):
+    def __init__(self, preload_analytics=True, daemon_address=None):
         self.root = tk.Tk()
         self.root.title("Productivity Timer Pro")
         self.root.geometry("800x600")
         
-        # Data storage
+        # Data storage, either the local file or a shared daemon.py
         self.data_file = "productivity_data.json"
+        self.daemon_address = daemon_address
         self.load_data()
         
         # Timer state
         self.is_running = False
-        self.start_time = None
+        self.start_time = None  # clock() reading when the current run began
         self.elapsed_time = 0
         self.current_activity = ""
         
+        # Pomodoro and break deadlines, as clock() readings
+        self.pomodoro_mode = False
+        self.pomodoro_deadline = None
+        self.break_mode = False
+        self.break_deadline = None
+        
         # Pomodoro settings
         self.pomodoro_duration = 25 * 60  # 25 minutes in seconds
         self.break_duration = 5 * 60     # 5 minutes in seconds
@@ -33,61 +42,35 @@ class ProductivityTimer:
         
         self.setup_ui()
         
+        # The analytics stack (pandas, matplotlib, numpy) is imported on first
+        # use; optionally warm it up in the background once the window is up
+        if preload_analytics:
+            self.root.after_idle(self.preload_analytics)
+        
+    def preload_analytics(self):
+        """Import the statistics module on a background thread"""
+        def load():
+            import productivity_stats  # noqa: F401
+        
+        threading.Thread(target=load, daemon=True).start()
+    
+    @profiled
     def load_data(self):
-        """Load existing data from JSON file"""
-        if os.path.exists(self.data_file):
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
+        """Open the session store shared with the statistics window"""
+        if self.daemon_address:
+            from daemon import RemoteStore
+            self.store = RemoteStore(self.daemon_address)
         else:
-            self.data = {
-                "sessions": [],
-                "comfort_choices": 0,
-                "total_pomodoros": 0
-            }
+            self.store = SessionStore(self.data_file)
+        self.data = self.store.data
+        self.stats_manager = None
+        self.chart_cache = None  # dashboard figure kept between statistics windows
     
+    @profiled
     def save_data(self):
-        """Save data to JSON file"""
-        with open(self.data_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
+        """Queue a compact copy of the data; written by the background persister"""
+        self.store.compact()
     
-    def setup_ui(self):
-        """Initialize the user interface"""
-        # Main container
-        main_frame = ttk.Frame(self.root, padding="10")
-        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        # Title
-        title_label = ttk.Label(main_frame, text="Productivity Timer Pro", 
-                               font=("Arial", 16, "bold"))
-        title_label.grid(row=0, column=0, columnspan=3, pady=(0, 20))
-        
-        # Timer display
-        self.time_var = tk.StringVar(value="00:00:00")
-        time_display = ttk.Label(main_frame, textvariable=self.time_var, 
-                                font=("Arial", 24, "bold"))
-        time_display.grid(row=1, column=0, columnspan=3, pady=(0, 20))
-        
-        # Activity selection
-        ttk.Label(main_frame, text="Current Activity:").grid(row=2, column=0, sticky=tk.W)
-        self.activity_var = tk.StringVar()
-        self.activity_combo = ttk.Combobox(main_frame, textvariable=self.activity_var,
-                                          values=["Work", "Study", "Exercise", "Reading", 
-                                                 "Project", "Learning", "Other"])
-        self.activity_combo.grid(row=2, column=1, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
-
-        # Add statistics button to the main UI
-        stats_frame = ttk.LabelFrame(main_frame, text="📊 Analytics", padding="10")
-        stats_frame.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 20))
-        
-        stats_btn = ttk.Button(stats_frame, text="📈 View Statistics", 
-                              command=self.show_statistics,
-                              style="Accent.TButton")
-        stats_btn.grid(row=0, column=0, padx=5)
-        
-        export_btn = ttk.Button(stats_frame, text="📤 Export Data", 
-                               command=self.export_data)
-        export_btn.grid(row=0, column=1, padx=5)
-
     def setup_ui(self):
         """Initialize the user interface"""
         # Main container
@@ -154,17 +137,35 @@ class ProductivityTimer:
                                      style="Accent.TButton")
         self.comfort_btn.grid(row=0, column=1, padx=5)
         
-        # Start the timer update loop
+        # Add statistics button to the main UI
+        stats_frame = ttk.LabelFrame(main_frame, text="📊 Analytics", padding="10")
+        stats_frame.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 20))
+        
+        stats_btn = ttk.Button(stats_frame, text="📈 View Statistics", 
+                              command=self.show_statistics,
+                              style="Accent.TButton")
+        stats_btn.grid(row=0, column=0, padx=5)
+        
+        export_btn = ttk.Button(stats_frame, text="📤 Export Data", 
+                               command=self.export_data)
+        export_btn.grid(row=0, column=1, padx=5)
+        
+        import_btn = ttk.Button(stats_frame, text="📥 Import Data", 
+                               command=self.import_data)
+        import_btn.grid(row=0, column=2, padx=5)
+        
+        # Display updates are scheduled only while a timer is running
+        self.scheduler = WakeScheduler(self.root, self.update_timer)
         self.update_timer()
     
     def start_timer(self):
         """Start the timer"""
         if not self.activity_var.get():
-            tk.messagebox.showwarning("Warning", "Please select an activity first!")
+            messagebox.showwarning("Warning", "Please select an activity first!")
             return
             
         self.is_running = True
-        self.start_time = datetime.now()
+        self.start_time = clock()
         self.current_activity = self.activity_var.get()
         
         # Update button states
@@ -172,24 +173,26 @@ class ProductivityTimer:
         self.pause_btn.config(state="normal")
         self.stop_btn.config(state="normal")
         self.pomodoro_btn.config(state="disabled")
+        self.update_timer()
     
     def pause_timer(self):
         """Pause/resume the timer"""
         if self.is_running:
             self.is_running = False
-            self.elapsed_time += (datetime.now() - self.start_time).total_seconds()
+            self.elapsed_time += clock() - self.start_time
             self.pause_btn.config(text="Resume")
             self.start_btn.config(state="normal")
         else:
             self.is_running = True
-            self.start_time = datetime.now()
+            self.start_time = clock()
             self.pause_btn.config(text="Pause")
             self.start_btn.config(state="disabled")
+        self.update_timer()
     
     def stop_timer(self):
         """Stop the timer and save session"""
         if self.is_running:
-            self.elapsed_time += (datetime.now() - self.start_time).total_seconds()
+            self.elapsed_time += clock() - self.start_time
             self.is_running = False
         
         # Save session data
@@ -201,8 +204,7 @@ class ProductivityTimer:
                 "end_time": datetime.now().isoformat(),
                 "type": "manual"
             }
-            self.data["sessions"].append(session)
-            self.save_data()
+            self.store.append_session(session)
         
         self.reset_timer()
     
@@ -212,6 +214,7 @@ class ProductivityTimer:
         self.elapsed_time = 0
         self.start_time = None
         self.time_var.set("00:00:00")
+        self.scheduler.cancel()
         
         # Reset button states
         self.start_btn.config(state="normal")
@@ -222,58 +225,58 @@ class ProductivityTimer:
     def start_pomodoro(self):
         """Start a Pomodoro session"""
         if not self.activity_var.get():
-            tk.messagebox.showwarning("Warning", "Please select an activity first!")
+            messagebox.showwarning("Warning", "Please select an activity first!")
             return
         
         self.is_running = True
-        self.start_time = datetime.now()
+        self.start_time = clock()
         self.current_activity = self.activity_var.get()
         self.pomodoro_mode = True
-        self.pomodoro_end_time = datetime.now() + timedelta(seconds=self.pomodoro_duration)
+        self.pomodoro_deadline = self.start_time + self.pomodoro_duration
         
         # Update button states
         self.start_btn.config(state="disabled")
         self.pause_btn.config(state="normal")
         self.stop_btn.config(state="normal")
         self.pomodoro_btn.config(state="disabled")
+        self.update_timer()
     
     def start_break(self):
         """Start a break session"""
         self.activity_var.set("Break")
         self.is_running = True
-        self.start_time = datetime.now()
+        self.start_time = clock()
         self.current_activity = "Break"
         self.break_mode = True
-        self.break_end_time = datetime.now() + timedelta(seconds=self.break_duration)
+        self.break_deadline = self.start_time + self.break_duration
         
         self.break_btn.config(state="disabled")
+        self.update_timer()
     
     def increment_comfort(self):
         """Increment the comfort choice counter"""
-        self.data["comfort_choices"] = self.data.get("comfort_choices", 0) + 1
+        self.store.increment("comfort_choices")
         self.comfort_var.set(f"Comfort Choices: {self.data['comfort_choices']}")
-        self.save_data()
         
         # Show a motivational message
-        tk.messagebox.showinfo("Comfort Choice Recorded", 
+        messagebox.showinfo("Comfort Choice Recorded", 
                               "Remember: Every small step towards your goals matters! 💪")
     
     def update_timer(self):
-        """Update the timer display"""
-        if self.is_running and self.start_time:
-            current_elapsed = self.elapsed_time + (datetime.now() - self.start_time).total_seconds()
+        """Update the timer display and schedule the next wake-up"""
+        now = clock()
+        if self.is_running and self.start_time is not None:
+            current_elapsed = self.elapsed_time + (now - self.start_time)
             
             # Check for Pomodoro completion
-            if hasattr(self, 'pomodoro_mode') and self.pomodoro_mode:
-                if datetime.now() >= self.pomodoro_end_time:
-                    self.complete_pomodoro()
-                    return
+            if self.pomodoro_mode and now >= self.pomodoro_deadline:
+                self.complete_pomodoro()
+                return
             
             # Check for break completion
-            if hasattr(self, 'break_mode') and self.break_mode:
-                if datetime.now() >= self.break_end_time:
-                    self.complete_break()
-                    return
+            if self.break_mode and now >= self.break_deadline:
+                self.complete_break()
+                return
         else:
             current_elapsed = self.elapsed_time
         
@@ -283,13 +286,25 @@ class ProductivityTimer:
         seconds = int(current_elapsed % 60)
         self.time_var.set(f"{hours:02d}:{minutes:02d}:{seconds:02d}")
         
-        # Schedule next update
-        self.root.after(1000, self.update_timer)
+        # Wake exactly when the display or a deadline changes; sleep when idle
+        if self.is_running:
+            deadlines = [deadline - now for active, deadline in
+                         ((self.pomodoro_mode, self.pomodoro_deadline),
+                          (self.break_mode, self.break_deadline)) if active]
+            self.scheduler.wake_in(seconds_until_next_tick(
+                current_elapsed, min(deadlines) if deadlines else None))
+        else:
+            self.scheduler.cancel()
+    
+    def wall_time_at(self, deadline):
+        """Convert a clock() reading into local wall-clock time"""
+        return datetime.now() - timedelta(seconds=clock() - deadline)
     
     def complete_pomodoro(self):
         """Handle Pomodoro completion"""
-        self.data["total_pomodoros"] = self.data.get("total_pomodoros", 0) + 1
+        self.store.increment("total_pomodoros")
         self.pomodoro_count += 1
+        self.pomodoro_end_time = self.wall_time_at(self.pomodoro_deadline)
         
         # Save the session
         session = {
@@ -299,8 +314,7 @@ class ProductivityTimer:
             "end_time": self.pomodoro_end_time.isoformat(),
             "type": "pomodoro"
         }
-        self.data["sessions"].append(session)
-        self.save_data()
+        self.store.append_session(session)
         
         # Reset timer state
         self.pomodoro_mode = False
@@ -309,11 +323,13 @@ class ProductivityTimer:
         # Enable break button
         self.break_btn.config(state="normal")
         
-        tk.messagebox.showinfo("Pomodoro Complete!", 
+        messagebox.showinfo("Pomodoro Complete!", 
                               f"Great job! You completed a Pomodoro session.\nTotal Pomodoros today: {self.pomodoro_count}")
     
     def complete_break(self):
         """Handle break completion"""
+        self.break_end_time = self.wall_time_at(self.break_deadline)
+        
         # Save break session
         session = {
             "activity": "Break",
@@ -322,51 +338,249 @@ class ProductivityTimer:
             "end_time": self.break_end_time.isoformat(),
             "type": "break"
         }
-        self.data["sessions"].append(session)
-        self.save_data()
+        self.store.append_session(session)
         
         # Reset timer state
         self.break_mode = False
         self.reset_timer()
         self.break_btn.config(state="disabled")
         
-        tk.messagebox.showinfo("Break Complete!", "Break time is over. Ready for another Pomodoro?")
+        messagebox.showinfo("Break Complete!", "Break time is over. Ready for another Pomodoro?")
 
     def run(self):
         """Start the application"""
         self.root.mainloop()
+        self.store.close()
 
 
     def show_statistics(self):
         """Show statistics window"""
-        ProductivityStatsWindow(self.root)
+        from productivity_stats import ProductivityStatsManager, ProductivityStatsWindow
+        
+        # Reuse one manager so its parsed columns and rollups survive between
+        # openings and stay current through store notifications
+        if self.stats_manager is None:
+            self.stats_manager = ProductivityStatsManager(self.data_file, store=self.store)
+        window = ProductivityStatsWindow(self.root, self.stats_manager, self.chart_cache)
+        self.chart_cache = window.chart_cache
 
+    @profiled
     def export_data(self):
-        """Export data to CSV"""
-        import csv
+        """Ask for export filters and format, then export in the background"""
+        from export import parquet_available
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("📤 Export Data")
+        dialog.transient(self.root)
+        
+        frame = ttk.Frame(dialog, padding="10")
+        frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Date range (inclusive, blank for no limit)
+        ttk.Label(frame, text="From (YYYY-MM-DD):").grid(row=0, column=0, sticky=tk.W)
+        from_var = tk.StringVar()
+        ttk.Entry(frame, textvariable=from_var).grid(row=0, column=1, pady=2)
+        
+        ttk.Label(frame, text="To (YYYY-MM-DD):").grid(row=1, column=0, sticky=tk.W)
+        to_var = tk.StringVar()
+        ttk.Entry(frame, textvariable=to_var).grid(row=1, column=1, pady=2)
+        
+        # Activity filter
+        ttk.Label(frame, text="Activity:").grid(row=2, column=0, sticky=tk.W)
+        activity_var = tk.StringVar(value="All")
+        ttk.Combobox(frame, textvariable=activity_var, state="readonly",
+                     values=["All"] + list(self.activity_combo["values"]) + ["Break"]
+                     ).grid(row=2, column=1, pady=2)
+        
+        # Output format
+        formats = {"CSV": "csv", "NumPy (.npz)": "npz"}
+        if parquet_available():
+            formats["Parquet"] = "parquet"
+        ttk.Label(frame, text="Format:").grid(row=3, column=0, sticky=tk.W)
+        format_var = tk.StringVar(value="CSV")
+        ttk.Combobox(frame, textvariable=format_var, state="readonly",
+                     values=list(formats)).grid(row=3, column=1, pady=2)
+        
+        def on_export():
+            filters = {}
+            for key, var in (("first_day", from_var), ("last_day", to_var)):
+                value = var.get().strip()
+                if value:
+                    try:
+                        datetime.strptime(value, "%Y-%m-%d")
+                    except ValueError:
+                        messagebox.showwarning("Warning", f"Invalid date: {value}", parent=dialog)
+                        return
+                    filters[key] = value
+            if activity_var.get() != "All":
+                filters["activities"] = {activity_var.get()}
+            
+            dialog.destroy()
+            self.choose_export_file(formats[format_var.get()], filters)
+        
+        buttons = ttk.Frame(frame)
+        buttons.grid(row=4, column=0, columnspan=2, pady=(10, 0))
+        ttk.Button(buttons, text="Export", command=on_export).grid(row=0, column=0, padx=5)
+        ttk.Button(buttons, text="Cancel", command=dialog.destroy).grid(row=0, column=1, padx=5)
+    
+    def choose_export_file(self, fmt, filters):
+        """Ask for the output file and start the export"""
         from tkinter import filedialog
+        from export import FORMATS
         
+        description, pattern = FORMATS[fmt]
         filename = filedialog.asksaveasfilename(
-            defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            defaultextension=pattern[1:],
+            filetypes=[(description, pattern), ("All files", "*.*")]
         )
         
         if filename:
-            with open(filename, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(["Start Time", "End Time", "Activity", "Duration (minutes)", "Type"])
-                
-                for session in self.data["sessions"]:
-                    writer.writerow([
-                        session["start_time"],
-                        session["end_time"], 
-                        session["activity"],
-                        round(session["duration"] / 60, 2),
-                        session.get("type", "manual")
-                    ])
-            
-            tk.messagebox.showinfo("Export Complete", f"Data exported to {filename}")
+            self.start_export(filename, fmt, filters)
+    
+    def start_export(self, filename, fmt, filters):
+        """Run an export on a worker thread with a progress window"""
+        from export import ExportCancelled, SessionExporter
+        
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title("Exporting...")
+        progress_window.transient(self.root)
+        
+        status_var = tk.StringVar(value="Collecting sessions...")
+        ttk.Label(progress_window, textvariable=status_var).pack(padx=20, pady=(15, 5))
+        progress_bar = ttk.Progressbar(progress_window, mode="determinate", length=300)
+        progress_bar.pack(padx=20, pady=5)
+        
+        cancel_event = threading.Event()
+        ttk.Button(progress_window, text="Cancel", 
+                   command=cancel_event.set).pack(pady=(5, 15))
+        progress_window.protocol("WM_DELETE_WINDOW", cancel_event.set)
+        
+        updates = queue.Queue()
+        
+        def work():
+            exporter = SessionExporter(
+                progress=lambda done, total: updates.put(("progress", done, total)),
+                cancel_event=cancel_event
+            )
+            try:
+                sessions = self.store.query_sessions(**filters)
+                updates.put(("done", exporter.export(filename, sessions, fmt)))
+            except ExportCancelled:
+                updates.put(("cancelled",))
+            except Exception as exc:
+                updates.put(("error", exc))
+        
+        def poll():
+            try:
+                while True:
+                    update = updates.get_nowait()
+                    if update[0] == "progress":
+                        done, total = update[1:]
+                        progress_bar.config(maximum=max(total, 1), value=done)
+                        status_var.set(f"Exported {done:,} of {total:,} sessions")
+                        continue
+                    
+                    progress_window.destroy()
+                    if update[0] == "done":
+                        messagebox.showinfo("Export Complete", 
+                                               f"{update[1]:,} sessions exported to {filename}")
+                    elif update[0] == "error":
+                        messagebox.showerror("Export Failed", str(update[1]))
+                    return
+            except queue.Empty:
+                pass
+            progress_window.after(100, poll)
+        
+        threading.Thread(target=work, daemon=True).start()
+        poll()
+    
+    @profiled
+    def import_data(self):
+        """Ask for session history files and import them in the background"""
+        from tkinter import filedialog
+        from importer import FORMATS
+        
+        filenames = filedialog.askopenfilenames(
+            title="Import Sessions",
+            filetypes=list(FORMATS.values()) + [("All files", "*.*")]
+        )
+        if filenames:
+            self.start_import(list(filenames))
+    
+    def start_import(self, filenames):
+        """Run an import on a worker thread with a progress window"""
+        from importer import ImportCancelled, SessionImporter
+        
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title("Importing...")
+        progress_window.transient(self.root)
+        
+        status_var = tk.StringVar(value="Reading files...")
+        ttk.Label(progress_window, textvariable=status_var).pack(padx=20, pady=(15, 5))
+        progress_bar = ttk.Progressbar(progress_window, mode="determinate", length=300)
+        progress_bar.pack(padx=20, pady=5)
+        
+        cancel_event = threading.Event()
+        ttk.Button(progress_window, text="Cancel", 
+                   command=cancel_event.set).pack(pady=(5, 15))
+        progress_window.protocol("WM_DELETE_WINDOW", cancel_event.set)
+        
+        updates = queue.Queue()
+        
+        def work():
+            importer = SessionImporter(
+                progress=lambda done, total: updates.put(("progress", done, total)),
+                cancel_event=cancel_event
+            )
+            try:
+                updates.put(("done", importer.import_files(self.store, filenames)))
+            except ImportCancelled:
+                updates.put(("cancelled",))
+            except Exception as exc:
+                updates.put(("error", exc))
+        
+        def poll():
+            try:
+                while True:
+                    update = updates.get_nowait()
+                    if update[0] == "progress":
+                        done, total = update[1:]
+                        progress_bar.config(maximum=max(total, 1), value=done)
+                        status_var.set(f"Read {done * 100 // max(total, 1)}% of the current file")
+                        continue
+                    
+                    progress_window.destroy()
+                    if update[0] == "done":
+                        result = update[1]
+                        message = result.summary()
+                        if result.errors:
+                            message += "\n\n" + "\n".join(f"{location}: {error}"
+                                                         for location, error in result.errors[:5])
+                        messagebox.showinfo("Import Complete", message)
+                    elif update[0] == "error":
+                        messagebox.showerror("Import Failed", str(update[1]))
+                    return
+            except queue.Empty:
+                pass
+            progress_window.after(100, poll)
+        
+        threading.Thread(target=work, daemon=True).start()
+        poll()
               
 if __name__ == "__main__":
-    app = ProductivityTimer()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Productivity Timer Pro")
+    parser.add_argument("--daemon", metavar="ADDRESS",
+                        help="record sessions through a running daemon.py "
+                             "(Unix socket path or HOST:PORT)")
+    parser.add_argument("--profile", metavar="TRACE_FILE",
+                        help="record profiling spans and write them as a Chrome trace on exit")
+    args = parser.parse_args()
+    
+    if args.profile:
+        profiler.enabled = True
+    app = ProductivityTimer(daemon_address=args.daemon)
     app.run()
+    if args.profile:
+        profiler.dump(args.profile)
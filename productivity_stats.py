@@ -1,94 +1,54 @@
 # statistics.py - Create a new file for statistics functionality
 import json
 import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkinter
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.dates as mdates
 from datetime import datetime, timedelta
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk
 import numpy as np
 
-class ProductivityStatsManager:
-    def __init__(self, data_file="productivity_data.json"):
-        self.data_file = data_file
-        self.load_data()
-        
-    def load_data(self):
-        """Load data from JSON file"""
-        try:
-            with open(self.data_file, 'r') as f:
-                self.data = json.load(f)
-        except FileNotFoundError:
-            self.data = {"sessions": [], "comfort_choices": 0, "total_pomodoros": 0}
-    
-    def get_daily_stats(self, days=7):
-        """Get statistics for the last N days"""
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        daily_data = {}
-        for i in range(days):
-            date = start_date + timedelta(days=i)
-            date_str = date.strftime("%Y-%m-%d")
-            daily_data[date_str] = {
-                "total_time": 0,
-                "sessions": 0,
-                "pomodoros": 0,
-                "activities": {}
-            }
-        
-        for session in self.data.get("sessions", []):
-            session_date = datetime.fromisoformat(session["start_time"]).strftime("%Y-%m-%d")
-            if session_date in daily_data:
-                daily_data[session_date]["total_time"] += session["duration"]
-                daily_data[session_date]["sessions"] += 1
-                
-                if session.get("type") == "pomodoro":
-                    daily_data[session_date]["pomodoros"] += 1
-                
-                activity = session["activity"]
-                if activity not in daily_data[session_date]["activities"]:
-                    daily_data[session_date]["activities"][activity] = 0
-                daily_data[session_date]["activities"][activity] += session["duration"]
-        
-        return daily_data
-    
-    def get_activity_breakdown(self):
-        """Get breakdown by activity type"""
-        activities = {}
-        for session in self.data.get("sessions", []):
-            activity = session["activity"]
-            if activity not in activities:
-                activities[activity] = {"time": 0, "sessions": 0}
-            activities[activity]["time"] += session["duration"]
-            activities[activity]["sessions"] += 1
-        return activities
-    
-    def get_productivity_score(self):
-        """Calculate productivity score based on various metrics"""
-        total_sessions = len(self.data.get("sessions", []))
-        total_time = sum(s["duration"] for s in self.data.get("sessions", []))
-        comfort_choices = self.data.get("comfort_choices", 0)
-        pomodoros = self.data.get("total_pomodoros", 0)
-        
-        if total_sessions == 0:
-            return 0
-        
-        # Calculate score (0-100)
-        time_score = min(total_time / 3600, 10) * 10  # Max 10 points for 10+ hours
-        session_score = min(total_sessions, 20) * 2   # Max 40 points for 20+ sessions
-        pomodoro_score = min(pomodoros, 10) * 3       # Max 30 points for 10+ pomodoros
-        comfort_penalty = min(comfort_choices * 2, 20) # Max -20 points
-        
-        score = max(0, time_score + session_score + pomodoro_score - comfort_penalty)
-        return min(100, score)
+from animation import Animator
+import charts
+from profiling import profiled, profiler
+from scheduler import TkEventQueue
+from session_browser import SessionBrowser
+from stats_manager import (DASHBOARD_METRICS, INSIGHT_METRICS, ProductivityStatsManager,
+                           calculate_insights)
+from timeseries import VIEWS
 
 class ProductivityStatsWindow:
-    def __init__(self, parent):
+    POLL_INTERVAL = 50  # ms between checks for worker results
+    HISTORY_BLOCK = 200  # sessions fetched per page of the history browser
+    # Metrics of the chosen period, read by the charts and insights tabs
+    VIEW_METRICS = tuple(dict.fromkeys(charts.DashboardCache.METRICS + INSIGHT_METRICS))
+    # Opening the window also reads the all-time overview and focus heatmap
+    METRICS = VIEW_METRICS + DASHBOARD_METRICS
+    # Periods the charts and insights can show; the overview is always all-time
+    VIEW_LABELS = {"7d": "Last 7 days", "30d": "Last 30 days", "365d": "Last 365 days",
+                   "all": "All time"}
+    
+    def __init__(self, parent, stats_manager=None, chart_cache=None):
         self.parent = parent
-        self.stats_manager = ProductivityStatsManager()
+        self.stats_manager = stats_manager
+        # Passing the previous window's cache makes reopening with unchanged
+        # data reuse the drawn figure; a figure can only be shown once at a time
+        if chart_cache is None or chart_cache.owner is not None:
+            chart_cache = charts.DashboardCache(VIEWS["7d"])
+        self.chart_cache = chart_cache
+        self.canvas = None
+        self.results = queue.Queue()
+        self.polling = False
+        self.pending_tabs = {}
+        # Chart refreshes are computed by the worker, one request at a time
+        self.metrics_requests = queue.Queue()
+        self.metrics_busy = False
+        self.metrics_stale = False  # the data or period changed after the request in flight was sent
+        self.insights = None  # the insights shown
         self.create_window()
+        self.start_worker()
         
     def create_window(self):
         """Create the statistics window with animations"""
@@ -97,22 +57,155 @@ class ProductivityStatsWindow:
         self.window.geometry("1200x800")
         self.window.configure(bg="#f0f0f0")
         
+        # Every card and fade animation advances from this one frame clock
+        self.animator = Animator(self.window)
+        self.window.bind("<Destroy>", self.stop_animations, add="+")
+        
+        # Store changes can come from worker threads, e.g. an import
+        self.tk_events = TkEventQueue(self.window)
+        self.store_listener = self.tk_events.wrap(self.on_store_change)
+        self.history_listener = self.tk_events.wrap(self.on_history_change)
+        self.history_refresh_pending = False
+        self.window.bind("<Destroy>", self.on_destroy, add="+")
+        
         # Create notebook for tabs
         self.notebook = ttk.Notebook(self.window)
         self.notebook.pack(fill="both", expand=True, padx=10, pady=10)
         
-        # Create tabs
-        self.create_overview_tab()
-        self.create_charts_tab()
-        self.create_insights_tab()
+        # Create tabs with loading placeholders, filled in as results arrive
+        self.overview_frame = self.create_placeholder_tab("overview", "📈 Overview")
+        self.charts_frame = self.create_placeholder_tab("charts", "📊 Charts")
+        self.insights_frame = self.create_placeholder_tab("insights", "💡 Insights")
+        self.focus_frame = self.create_placeholder_tab("focus", "🕒 Focus Hours")
+        
+        # Span timings and counters, hidden until Ctrl+Shift+D
+        self.debug_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.debug_frame, text="🐞 Performance", state="hidden")
+        self.debug_tree = None
+        self.window.bind("<Control-Shift-D>", self.toggle_debug_tab)
         
         # Add fade-in animation
         self.fade_in_animation()
     
-    def create_overview_tab(self):
+    def create_placeholder_tab(self, key, text):
+        """Add a tab showing a progress indicator until its data is ready"""
+        frame = ttk.Frame(self.notebook)
+        self.notebook.add(frame, text=text)
+        
+        placeholder = tk.Frame(frame, bg="#f0f0f0")
+        placeholder.pack(expand=True)
+        
+        message = tk.Label(placeholder, text="Loading statistics...", 
+                           font=("Arial", 14), bg="#f0f0f0", fg="#34495e")
+        message.pack(pady=(0, 10))
+        
+        progress = ttk.Progressbar(placeholder, mode="indeterminate", length=200)
+        progress.pack()
+        progress.start(15)
+        
+        self.pending_tabs[key] = (placeholder, message, progress)
+        return frame
+    
+    def clear_placeholder(self, key):
+        """Remove the loading placeholder of a tab"""
+        placeholder, message, progress = self.pending_tabs.pop(key)
+        progress.stop()
+        placeholder.destroy()
+    
+    def start_worker(self):
+        """Load and aggregate data on a worker thread, which then serves chart refreshes"""
+        threading.Thread(target=self.run_worker, daemon=True).start()
+        self.poll_soon()
+    
+    def run_worker(self):
+        self.compute_stats()
+        self.serve_metrics()
+    
+    @profiled
+    def compute_stats(self):
+        """Worker thread: compute each tab's data and queue it for the UI"""
+        try:
+            if self.stats_manager is None:
+                self.stats_manager = ProductivityStatsManager()
+            # Every tab reads the same metrics, computed together in one pass
+            metrics = self.stats_manager.compute_metrics(self.METRICS, self.chart_cache.days)
+            self.results.put(("overview", self.compute_overview(metrics.overall())))
+            self.chart_cache.update(metrics)
+            self.results.put(("charts", self.chart_cache.fig))
+            self.results.put(("insights", self.calculate_insights(metrics)))
+            self.results.put(("focus", charts.build_focus_figure(metrics.get_focus_heatmap())))
+        except Exception as exc:
+            self.results.put(("error", exc))
+    
+    def serve_metrics(self):
+        """Worker thread: compute the metrics of each period the Tk thread asks for"""
+        while True:
+            days = self.metrics_requests.get()
+            if days is None:
+                return
+            try:
+                metrics = self.stats_manager.compute_metrics(self.VIEW_METRICS, days)
+                result = (days, metrics, self.calculate_insights(metrics))
+            except Exception as exc:
+                result = (days, exc, None)
+            self.results.put(("metrics", result))
+    
+    def poll_soon(self):
+        if not self.polling:
+            self.polling = True
+            self.window.after(self.POLL_INTERVAL, self.poll_results)
+    
+    def poll_results(self):
+        """Fill in tabs whose results have arrived; runs on the Tk thread"""
+        self.polling = False
+        if not self.window.winfo_exists():
+            return
+        
+        handlers = {
+            "overview": self.create_overview_tab,
+            "charts": self.create_charts_tab,
+            "insights": self.create_insights_tab,
+            "focus": self.create_focus_tab,
+            "metrics": self.apply_metrics,
+            "error": self.show_error
+        }
+        try:
+            while True:
+                key, payload = self.results.get_nowait()
+                handlers[key](payload)
+        except queue.Empty:
+            pass
+        
+        if self.pending_tabs or self.metrics_busy:
+            self.poll_soon()
+    
+    def show_error(self, error):
+        """Replace the remaining placeholders with an error message"""
+        for placeholder, message, progress in self.pending_tabs.values():
+            progress.stop()
+            progress.pack_forget()
+            message.config(text=f"Could not load statistics: {error}", fg="#e74c3c")
+        self.pending_tabs.clear()
+    
+    @profiled
+    def compute_overview(self, metrics):
+        """Collect the numbers shown on the overview tab"""
+        totals = metrics.get_totals()
+        return {
+            "total_time": totals["total_time"],
+            "total_sessions": totals["sessions"],
+            "productivity_score": metrics.get_productivity_score(),
+            "comfort_choices": metrics.data.get("comfort_choices", 0),
+            # First block of the history browser, so opening it costs no query on the Tk thread
+            "recent_sessions": self.stats_manager.get_session_page(0, self.HISTORY_BLOCK),
+            "session_count": self.stats_manager.get_session_count()
+        }
+    
+    @profiled
+    def create_overview_tab(self, overview):
         """Create overview tab with key metrics"""
-        overview_frame = ttk.Frame(self.notebook)
-        self.notebook.add(overview_frame, text="📈 Overview")
+        self.clear_placeholder("overview")
+        overview_frame = self.overview_frame
         
         # Title with animation
         title_frame = tk.Frame(overview_frame, bg="#2c3e50", height=80)
@@ -127,21 +220,21 @@ class ProductivityStatsWindow:
         metrics_frame = tk.Frame(overview_frame, bg="#f0f0f0")
         metrics_frame.pack(fill="both", expand=True, padx=10, pady=10)
         
-        self.create_metric_cards(metrics_frame)
+        self.create_metric_cards(metrics_frame, overview)
         
         # Recent activity
-        self.create_recent_activity(overview_frame)
+        self.create_recent_activity(overview_frame, overview["recent_sessions"],
+                                    overview["session_count"])
     
-    def create_metric_cards(self, parent):
+    def create_metric_cards(self, parent, overview):
         """Create animated metric cards"""
         cards_frame = tk.Frame(parent, bg="#f0f0f0")
         cards_frame.pack(fill="x", pady=20)
         
-        # Calculate metrics
-        total_time = sum(s["duration"] for s in self.stats_manager.data.get("sessions", []))
-        total_sessions = len(self.stats_manager.data.get("sessions", []))
-        productivity_score = self.stats_manager.get_productivity_score()
-        comfort_choices = self.stats_manager.data.get("comfort_choices", 0)
+        total_time = overview["total_time"]
+        total_sessions = overview["total_sessions"]
+        productivity_score = overview["productivity_score"]
+        comfort_choices = overview["comfort_choices"]
         
         metrics = [
             ("⏱️", "Total Time", f"{total_time/3600:.1f}h", "#3498db"),
@@ -185,31 +278,21 @@ class ProductivityStatsWindow:
     
     def animate_counter(self, label, target_value, delay):
         """Animate counter from 0 to target value"""
-        def start_animation():
-            if target_value.replace(".", "").replace("%", "").replace("h", "").isdigit():
-                target_num = float(target_value.replace("%", "").replace("h", ""))
-                self.counter_animation(label, 0, target_num, target_value, 50)
-            else:
-                label.config(text=target_value)
-        
-        label.after(delay, start_animation)
-    
-    def counter_animation(self, label, current, target, original_text, steps):
-        """Animate counter with smooth transition"""
-        if steps > 0:
-            increment = (target - current) / steps
-            new_value = current + increment
-            
-            if "%" in original_text:
-                label.config(text=f"{new_value:.0f}%")
-            elif "h" in original_text:
-                label.config(text=f"{new_value:.1f}h")
-            else:
-                label.config(text=f"{new_value:.0f}")
-            
-            label.after(20, lambda: self.counter_animation(label, new_value, target, original_text, steps-1))
+        if not target_value.replace(".", "").replace("%", "").replace("h", "").isdigit():
+            label.config(text=target_value)
+            return
+        
+        if "%" in target_value:
+            pattern = "{:.0f}%"
+        elif "h" in target_value:
+            pattern = "{:.1f}h"
         else:
-            label.config(text=original_text)
+            pattern = "{:.0f}"
+        target_num = float(target_value.replace("%", "").replace("h", ""))
+        self.animator.animate(0, target_num, 1.0,
+                              lambda value: label.config(text=pattern.format(value)),
+                              delay=delay / 1000,
+                              on_done=lambda: label.config(text=target_value))
     
     def add_hover_effect(self, widget, color):
         """Add hover effect to cards"""
@@ -226,145 +309,131 @@ class ProductivityStatsWindow:
             child.bind("<Enter>", on_enter)
             child.bind("<Leave>", on_leave)
     
-    def create_recent_activity(self, parent):
-        """Create recent activity section"""
+    def create_recent_activity(self, parent, recent_sessions, session_count):
+        """Create the recent activity section, scrollable back through the whole history"""
         activity_frame = tk.LabelFrame(parent, text="📋 Recent Activity", 
                                      font=("Arial", 14, "bold"), bg="#f0f0f0")
         activity_frame.pack(fill="both", expand=True, padx=10, pady=10)
         
-        # Create treeview for recent sessions
-        columns = ("Time", "Activity", "Duration", "Type")
-        tree = ttk.Treeview(activity_frame, columns=columns, show="headings", height=8)
-        
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=150)
-        
-        # Add recent sessions
-        recent_sessions = sorted(self.stats_manager.data.get("sessions", []), 
-                               key=lambda x: x["start_time"], reverse=True)[:10]
-        
-        for session in recent_sessions:
-            start_time = datetime.fromisoformat(session["start_time"]).strftime("%H:%M")
-            duration = f"{session['duration']/60:.0f}m"
-            session_type = session.get("type", "manual").title()
-            
-            tree.insert("", "end", values=(start_time, session["activity"], duration, session_type))
-        
-        tree.pack(fill="both", expand=True, padx=10, pady=10)
-        
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(activity_frame, orient="vertical", command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side="right", fill="y")
+        # Only one screenful of rows is ever inserted into Tk; scrolling
+        # fetches further pages from the store's time index
+        self.history = SessionBrowser(activity_frame, self.stats_manager.get_session_page,
+                                      self.stats_manager.get_session_count,
+                                      version=lambda: self.stats_manager.store.revision,
+                                      rows=8, block_size=self.HISTORY_BLOCK)
+        self.history.seed(recent_sessions, session_count)
+        self.history.pack(fill="both", expand=True, padx=10, pady=10)
+        self.stats_manager.store.subscribe(self.history_listener)
+    
+    def on_history_change(self, event, payload, revision):
+        """Store listener, on the Tk thread: schedule a history refresh when sessions arrive"""
+        if event in ("session_appended", "sessions_imported") and not self.history_refresh_pending:
+            self.history_refresh_pending = True
+            self.window.after_idle(self.refresh_history)
     
-    def create_charts_tab(self):
+    def refresh_history(self):
+        """Show new sessions in the history browser, keeping its scroll position"""
+        self.history_refresh_pending = False
+        if self.window.winfo_exists():
+            self.history.refresh()
+    
+    @profiled
+    def create_charts_tab(self, fig):
         """Create charts tab with matplotlib visualizations"""
-        charts_frame = ttk.Frame(self.notebook)
-        self.notebook.add(charts_frame, text="📊 Charts")
-        
-        # Create matplotlib figure
-        self.fig, ((self.ax1, self.ax2), (self.ax3, self.ax4)) = plt.subplots(2, 2, figsize=(12, 8))
-        self.fig.patch.set_facecolor('#f0f0f0')
-        
-        self.create_activity_pie_chart()
-        self.create_daily_trend_chart()
-        self.create_productivity_score_chart()
-        self.create_pomodoro_chart()
+        self.clear_placeholder("charts")
+        charts_frame = self.charts_frame
+        
+        controls = tk.Frame(charts_frame, bg="#f0f0f0")
+        controls.pack(fill="x", padx=10, pady=(5, 0))
+        tk.Label(controls, text="Period:", font=("Arial", 11), bg="#f0f0f0").pack(side="left")
+        self.view_var = tk.StringVar(
+            value=self.VIEW_LABELS[getattr(self.chart_cache.days, "name", "7d")])
+        selector = ttk.Combobox(controls, textvariable=self.view_var, state="readonly",
+                                values=list(self.VIEW_LABELS.values()), width=16)
+        selector.pack(side="left", padx=5)
+        selector.bind("<<ComboboxSelected>>", self.on_view_selected)
         
         # Embed in tkinter
-        canvas = FigureCanvasTkinter(self.fig, charts_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True)
-    
-    def create_activity_pie_chart(self):
-        """Create activity breakdown pie chart"""
-        activities = self.stats_manager.get_activity_breakdown()
-        
-        if activities:
-            labels = list(activities.keys())
-            sizes = [activities[activity]["time"]/3600 for activity in labels]
-            colors = plt.cm.Set3(np.linspace(0, 1, len(labels)))
-            
-            wedges, texts, autotexts = self.ax1.pie(sizes, labels=labels, autopct='%1.1f%%', 
-                                                   colors=colors, startangle=90)
-            self.ax1.set_title("📊 Time by Activity", fontsize=14, fontweight='bold')
-            
-            # Animate pie chart
-            for wedge in wedges:
-                wedge.set_linewidth(2)
-                wedge.set_edgecolor('white')
-        else:
-            self.ax1.text(0.5, 0.5, "No data available", ha='center', va='center', transform=self.ax1.transAxes)
-            self.ax1.set_title("📊 Time by Activity", fontsize=14, fontweight='bold')
-    
-    def create_daily_trend_chart(self):
-        """Create daily productivity trend"""
-        daily_stats = self.stats_manager.get_daily_stats(7)
-        
-        dates = list(daily_stats.keys())
-        times = [daily_stats[date]["total_time"]/3600 for date in dates]
-        
-        self.ax2.plot(dates, times, marker='o', linewidth=3, markersize=8, color='#3498db')
-        self.ax2.fill_between(dates, times, alpha=0.3, color='#3498db')
-        self.ax2.set_title("📈 Daily Productivity (Hours)", fontsize=14, fontweight='bold')
-        self.ax2.set_ylabel("Hours")
-        self.ax2.tick_params(axis='x', rotation=45)
-        self.ax2.grid(True, alpha=0.3)
-    
-    def create_productivity_score_chart(self):
-        """Create productivity score gauge"""
-        score = self.stats_manager.get_productivity_score()
-        
-        # Create gauge chart
-        theta = np.linspace(0, np.pi, 100)
-        r = np.ones_like(theta)
-        
-        # Background arc
-        self.ax3.plot(theta, r, color='lightgray', linewidth=20)
-        
-        # Score arc
-        score_theta = np.linspace(0, np.pi * (score/100), int(score))
-        score_r = np.ones_like(score_theta)
-        
-        if score >= 80:
-            color = '#2ecc71'
-        elif score >= 60:
-            color = '#f39c12'
-        else:
-            color = '#e74c3c'
+        self.canvas = FigureCanvasTkAgg(fig, charts_frame)
+        self.chart_cache.attach(self.canvas, owner=self)
+        self.canvas.draw()
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
         
-        self.ax3.plot(score_theta, score_r, color=color, linewidth=20)
-        
-        # Add score text
-        self.ax3.text(0, 0, f"{score:.0f}%", ha='center', va='center', 
-                     fontsize=24, fontweight='bold', color=color)
-        self.ax3.set_title("🎯 Productivity Score", fontsize=14, fontweight='bold')
-        self.ax3.set_ylim(0, 1.2)
-        self.ax3.axis('off')
+        # Keep the charts live while the window is open
+        self.stats_manager.store.subscribe(self.store_listener)
     
-    def create_pomodoro_chart(self):
-        """Create Pomodoro sessions chart"""
-        daily_stats = self.stats_manager.get_daily_stats(7)
-        
-        dates = list(daily_stats.keys())
-        pomodoros = [daily_stats[date]["pomodoros"] for date in dates]
-        
-        bars = self.ax4.bar(dates, pomodoros, color='#e74c3c', alpha=0.8)
-        self.ax4.set_title("🍅 Daily Pomodoros", fontsize=14, fontweight='bold')
-        self.ax4.set_ylabel("Pomodoros")
-        self.ax4.tick_params(axis='x', rotation=45)
-        
-        # Add value labels on bars
-        for bar, value in zip(bars, pomodoros):
-            if value > 0:
-                self.ax4.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1,
-                             str(int(value)), ha='center', va='bottom', fontweight='bold')
+    def on_store_change(self, event, payload, revision):
+        """Store listener, on the Tk thread: have the worker recompute the charts and insights"""
+        if self.canvas is not None:
+            self.request_metrics()
+    
+    def request_metrics(self):
+        """Ask the worker for the current period's metrics and insights.
+        
+        Only one request is in flight; changes of the data or the period
+        meanwhile are coalesced into a single follow-up request once its
+        answer arrives.
+        """
+        if self.metrics_busy:
+            self.metrics_stale = True
+            return
+        self.metrics_busy = True
+        self.metrics_requests.put(self.chart_cache.days)
+        self.poll_soon()
+    
+    @profiled
+    def apply_metrics(self, result):
+        """Redraw the chart panels and insights that changed; runs on the Tk thread"""
+        days, metrics, insights = result
+        self.metrics_busy = False
+        if self.metrics_stale:
+            self.metrics_stale = False
+            self.request_metrics()
+        if isinstance(metrics, Exception):
+            self.window.report_callback_exception(type(metrics), metrics, metrics.__traceback__)
+            return
+        if self.canvas is None or days != self.chart_cache.days:
+            return
+        changed = self.chart_cache.update(metrics)
+        self.chart_cache.blit_panels(self.canvas, changed)
+        if "insights" not in self.pending_tabs and insights != self.insights:
+            self.show_insights(insights)
     
-    def create_insights_tab(self):
+    def on_view_selected(self, event):
+        """Show the charts and insights for the chosen period"""
+        names = {label: name for name, label in self.VIEW_LABELS.items()}
+        self.show_view(VIEWS[names[self.view_var.get()]])
+    
+    def show_view(self, view):
+        """Switch the charts and insights to a View; they are redrawn when the worker has it"""
+        if self.canvas is None:
+            return
+        self.chart_cache.set_days(view)
+        self.request_metrics()
+    
+    def on_destroy(self, event):
+        if event.widget is self.window:
+            self.tk_events.stop()
+            self.metrics_requests.put(None)
+            if self.stats_manager is not None:
+                self.stats_manager.store.unsubscribe(self.store_listener)
+                self.stats_manager.store.unsubscribe(self.history_listener)
+            if self.chart_cache.owner is self:
+                self.chart_cache.owner = None
+            self.canvas = None
+    
+    @profiled
+    def create_insights_tab(self, insights):
         """Create insights and recommendations tab"""
-        insights_frame = ttk.Frame(self.notebook)
-        self.notebook.add(insights_frame, text="💡 Insights")
+        self.clear_placeholder("insights")
+        self.show_insights(insights)
+    
+    def show_insights(self, insights):
+        """Fill the insights tab, replacing any cards shown before"""
+        self.insights = insights
+        insights_frame = self.insights_frame
+        for child in insights_frame.winfo_children():
+            child.destroy()
         
         # Create scrollable frame
         canvas = tk.Canvas(insights_frame, bg="#f0f0f0")
@@ -379,80 +448,101 @@ class ProductivityStatsWindow:
         canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
         canvas.configure(yscrollcommand=scrollbar.set)
         
-        self.generate_insights(scrollable_frame)
+        self.generate_insights(scrollable_frame, insights)
         
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
     
-    def generate_insights(self, parent):
+    @profiled
+    def create_focus_tab(self, fig):
+        """Create the weekday by hour-of-day focus heatmaps"""
+        self.clear_placeholder("focus")
+        canvas = FigureCanvasTkAgg(fig, self.focus_frame)
+        canvas.draw()
+        canvas.get_tk_widget().pack(fill="both", expand=True)
+    
+    def toggle_debug_tab(self, event=None):
+        """Show or hide the performance tab"""
+        if self.notebook.tab(self.debug_frame, "state") == "hidden":
+            if self.debug_tree is None:
+                self.create_debug_tab()
+            self.notebook.tab(self.debug_frame, state="normal")
+            self.notebook.select(self.debug_frame)
+            self.refresh_debug_tab()
+        else:
+            self.notebook.tab(self.debug_frame, state="hidden")
+    
+    def create_debug_tab(self):
+        """Create the performance tab: span totals, counters and frame timings"""
+        controls = tk.Frame(self.debug_frame, bg="#f0f0f0")
+        controls.pack(fill="x", padx=10, pady=(10, 0))
+        
+        self.recording_var = tk.BooleanVar(value=profiler.enabled)
+        ttk.Checkbutton(controls, text="Record spans", variable=self.recording_var,
+                        command=self.on_recording_toggled).pack(side="left")
+        ttk.Button(controls, text="Refresh", command=self.refresh_debug_tab).pack(side="left", padx=5)
+        ttk.Button(controls, text="Clear", command=self.clear_profile).pack(side="left", padx=5)
+        ttk.Button(controls, text="Save Trace...", command=self.save_trace).pack(side="left", padx=5)
+        
+        columns = ("calls", "total", "mean", "max")
+        self.debug_tree = ttk.Treeview(self.debug_frame, columns=columns)
+        self.debug_tree.heading("#0", text="Span")
+        self.debug_tree.column("#0", width=380)
+        for column, title in zip(columns, ("Calls", "Total (ms)", "Mean (ms)", "Max (ms)")):
+            self.debug_tree.heading(column, text=title)
+            self.debug_tree.column(column, width=110, anchor="e")
+        self.debug_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        self.counters_var = tk.StringVar()
+        tk.Label(self.debug_frame, textvariable=self.counters_var, font=("Courier", 10),
+                 bg="#f0f0f0", justify="left", anchor="w").pack(fill="x", padx=10, pady=(0, 10))
+    
+    def on_recording_toggled(self):
+        profiler.enabled = self.recording_var.get()
+    
+    def refresh_debug_tab(self):
+        """Show the current span totals and counters"""
+        self.debug_tree.delete(*self.debug_tree.get_children())
+        for row in profiler.summary():
+            self.debug_tree.insert("", "end", text=row["name"], values=(
+                row["calls"], f"{row['total_ms']:.1f}", f"{row['mean_ms']:.2f}", f"{row['max_ms']:.1f}"))
+        
+        lines = [f"{name}: {value:,}" for name, value in sorted(profiler.counters.items())]
+        frames = self.animation_stats()
+        if frames["frames"]:
+            lines.append(f"animation: {frames['frames']} frames, {frames['dropped']} dropped, "
+                         f"{frames['work_mean_ms']:.2f} ms mean work")
+        if not profiler.enabled:
+            lines.append("Recording is off; tick Record spans, or start with PRODUCTIVITY_PROFILE=1")
+        self.counters_var.set("\n".join(lines))
+    
+    def clear_profile(self):
+        profiler.clear()
+        self.refresh_debug_tab()
+    
+    def save_trace(self):
+        """Write the recorded spans as a Chrome trace (chrome://tracing, Perfetto)"""
+        from tkinter import filedialog, messagebox
+        
+        filename = filedialog.asksaveasfilename(
+            parent=self.window, defaultextension=".json",
+            filetypes=[("Chrome trace", "*.json"), ("All files", "*.*")])
+        if not filename:
+            return
+        try:
+            profiler.dump(filename)
+        except OSError as exc:
+            messagebox.showerror("Save Failed", str(exc), parent=self.window)
+    
+    def generate_insights(self, parent, insights):
         """Generate AI-like insights and recommendations"""
-        insights = self.calculate_insights()
-        
         for i, insight in enumerate(insights):
             self.create_insight_card(parent, insight, i)
     
-    def calculate_insights(self):
+    @profiled
+    def calculate_insights(self, metrics=None):
         """Calculate insights based on user data"""
-        insights = []
-        
-        # Analyze productivity patterns
-        daily_stats = self.stats_manager.get_daily_stats(7)
-        activities = self.stats_manager.get_activity_breakdown()
-        score = self.stats_manager.get_productivity_score()
-        comfort_choices = self.stats_manager.data.get("comfort_choices", 0)
-        
-        # Productivity score insight
-        if score >= 80:
-            insights.append({
-                "icon": "🌟",
-                "title": "Excellent Productivity!",
-                "message": "You're maintaining high productivity levels. Keep up the great work!",
-                "type": "success"
-            })
-        elif score >= 60:
-            insights.append({
-                "icon": "📈",
-                "title": "Good Progress",
-                "message": "You're on the right track. Consider increasing your Pomodoro sessions for better focus.",
-                "type": "info"
-            })
-        else:
-            insights.append({
-                "icon": "🎯",
-                "title": "Room for Improvement",
-                "message": "Try setting smaller, achievable goals and use the Pomodoro technique more frequently.",
-                "type": "warning"
-            })
-        
-        # Comfort choices insight
-        if comfort_choices > 5:
-            insights.append({
-                "icon": "💪",
-                "title": "Comfort Zone Challenge",
-                "message": f"You've chosen comfort {comfort_choices} times. Remember: growth happens outside your comfort zone!",
-                "type": "warning"
-            })
-        
-        # Activity diversity insight
-        if len(activities) > 3:
-            insights.append({
-                "icon": "🎨",
-                "title": "Great Activity Diversity",
-                "message": "You're working on multiple types of activities. This helps prevent burnout and keeps you engaged!",
-                "type": "success"
-            })
-        
-        # Time-based insights
-        total_time = sum(s["duration"] for s in self.stats_manager.data.get("sessions", []))
-        if total_time > 7200:  # More than 2 hours
-            insights.append({
-                "icon": "⏰",
-                "title": "Consistent Time Investment",
-                "message": f"You've logged {total_time/3600:.1f} hours of productive time. Consistency is key to success!",
-                "type": "success"
-            })
-        
-        return insights
+        return calculate_insights(metrics or self.stats_manager)
     
     def create_insight_card(self, parent, insight, index):
         """Create an animated insight card"""
@@ -501,25 +591,20 @@ class ProductivityStatsWindow:
         original_x = widget.winfo_x()
         widget.place(x=1000, y=widget.winfo_y())
         
-        def animate():
-            current_x = widget.winfo_x()
-            if current_x > original_x:
-                new_x = current_x - 50
-                widget.place(x=max(new_x, original_x))
-                widget.after(20, animate)
-            else:
-                widget.pack(fill="x", padx=20, pady=10)
-        
-        widget.after(delay, animate)
+        self.animator.animate(1000, original_x, 0.4,
+                              lambda x: widget.place(x=int(x)),
+                              delay=delay / 1000,
+                              on_done=lambda: widget.pack(fill="x", padx=20, pady=10))
     
     def fade_in_animation(self):
         """Fade in the entire window"""
         self.window.attributes('-alpha', 0.0)
-        self.fade_step(0.0)
-    
-    def fade_step(self, alpha):
-        """Step function for fade animation"""
-        alpha += 0.05
-        self.window.attributes('-alpha', alpha)
-        if alpha < 1.0:
-            self.window.after(30, lambda: self.fade_step(alpha))
+        self.animator.animate(0.0, 1.0, 0.6, lambda alpha: self.window.attributes('-alpha', alpha))
+    
+    def stop_animations(self, event):
+        if event.widget is self.window:
+            self.animator.stop()
+    
+    def animation_stats(self):
+        """Frame timings of the window's animations, see FrameStats.summary"""
+        return self.animator.stats.summary()
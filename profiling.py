@@ -0,0 +1,154 @@
+# profiling.py - Opt-in timing spans and counters, exportable as a Chrome trace
+#
+# Recording is off unless PRODUCTIVITY_PROFILE=1 is set, main.py is started
+# with --profile, or the statistics window's debug tab (Ctrl+Shift+D)
+# switches it on. A dump opens in chrome://tracing or https://ui.perfetto.dev.
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class Span:
+    """Times one ``with`` block into a Profiler"""
+
+    __slots__ = ("profiler", "name", "args", "start")
+
+    def __init__(self, profiler, name, args=None):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns() - self.start, self.args)
+        return False
+
+
+class NullSpan:
+    """What ``span`` returns while recording is off"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Profiler:
+    """Timing spans and counters, recorded only while ``enabled``.
+
+    ``spans`` keeps the last ``history`` spans as
+    ``(name, start_ns, duration_ns, thread_id, args)`` and ``counters``
+    the running total of each counter, with every change kept in
+    ``counter_events`` for the trace. While disabled ``span`` returns a
+    shared no-op context manager and ``profiled`` functions cost one
+    attribute check per call.
+    """
+
+    def __init__(self, enabled=False, history=100000):
+        self.enabled = enabled
+        self.spans = deque(maxlen=history)
+        self.counters = {}
+        self.counter_events = deque(maxlen=history)
+        self.threads = {}
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter_ns()
+
+    def span(self, name, **args):
+        """Context manager timing a block as ``name``; keyword args go into the trace"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args or None)
+
+    def record(self, name, start_ns, duration_ns, args=None):
+        thread = threading.current_thread()
+        self.threads[thread.ident] = thread.name
+        self.spans.append((name, start_ns, duration_ns, thread.ident, args))
+
+    def count(self, name, amount=1):
+        """Add to a counter"""
+        if not self.enabled:
+            return
+        with self.lock:
+            value = self.counters[name] = self.counters.get(name, 0) + amount
+            self.counter_events.append((name, time.perf_counter_ns(), value))
+
+    def clear(self):
+        with self.lock:
+            self.spans.clear()
+            self.counters.clear()
+            self.counter_events.clear()
+
+    def summary(self):
+        """Calls and milliseconds per span name, largest total first"""
+        totals = {}
+        for name, start, duration, thread, args in list(self.spans):
+            entry = totals.setdefault(name, [0, 0, 0])
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] = max(entry[2], duration)
+        rows = [{"name": name, "calls": calls, "total_ms": total / 1e6,
+                 "mean_ms": total / calls / 1e6, "max_ms": longest / 1e6}
+                for name, (calls, total, longest) in totals.items()]
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def chrome_trace(self):
+        """The recorded spans and counters in the Chrome trace event format"""
+        pid = os.getpid()
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": thread,
+                   "args": {"name": name}} for thread, name in list(self.threads.items())]
+        for name, start, duration, thread, args in list(self.spans):
+            event = {"name": name, "cat": "productivity", "ph": "X", "pid": pid, "tid": thread,
+                     "ts": (start - self.origin) / 1000, "dur": duration / 1000}
+            if args:
+                event["args"] = {key: str(value) for key, value in args.items()}
+            events.append(event)
+        for name, moment, value in list(self.counter_events):
+            events.append({"name": name, "cat": "productivity", "ph": "C", "pid": pid,
+                           "ts": (moment - self.origin) / 1000, "args": {name: value}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, path):
+        """Write the Chrome trace JSON to a file"""
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+profiler = Profiler(enabled=os.environ.get("PRODUCTIVITY_PROFILE", "0") not in ("", "0"))
+
+
+def span(name, **args):
+    """Time a ``with`` block on the shared profiler"""
+    return profiler.span(name, **args)
+
+
+def count(name, amount=1):
+    """Add to a counter of the shared profiler"""
+    profiler.count(name, amount)
+
+
+def profiled(func):
+    """Decorator recording each call of ``func`` as a span named after it"""
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not profiler.enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.record(name, start, time.perf_counter_ns() - start)
+    return wrapper
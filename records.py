@@ -0,0 +1,358 @@
+# records.py - Compact typed session records
+from array import array
+from bisect import bisect_left, bisect_right
+import json
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+MICROSECOND = timedelta(microseconds=1)
+MICROSECONDS_PER_DAY = 86400 * 1000000
+
+FIELDS = ("activity", "duration", "start_time", "end_time", "type")
+
+
+def parse_timestamp(text):
+    """Parse an ISO-8601 timestamp into wall-clock microseconds since 1970-01-01.
+
+    Returns ``(microseconds, canonical)`` where canonical is False when
+    formatting the value back would not reproduce ``text`` exactly.
+    """
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is not None:
+        return (moment.replace(tzinfo=None) - EPOCH) // MICROSECOND, False
+    length = len(text)
+    canonical = text[10:11] == "T" and (length == 19 or (length == 26 and text[19] == "."
+                                                          and moment.microsecond != 0))
+    return (moment - EPOCH) // MICROSECOND, canonical
+
+
+def extra_fields(session, start_canonical=True, end_canonical=True):
+    """Return the parts of a session dict the typed fields cannot hold, or None"""
+    extra = None
+    if len(session) > len(FIELDS) or "type" not in session:
+        extra = {key: value for key, value in session.items() if key not in FIELDS}
+        if "type" not in session:
+            extra["type"] = None
+        extra = extra or None
+    if not (start_canonical and end_canonical):
+        extra = extra or {}
+        if not start_canonical:
+            extra["start_time"] = session["start_time"]
+        if not end_canonical:
+            extra["end_time"] = session["end_time"]
+    return extra
+
+
+def format_timestamp(microseconds):
+    """Format wall-clock microseconds the way datetime.isoformat() does"""
+    return (EPOCH + timedelta(microseconds=microseconds)).isoformat()
+
+
+def day_number(day):
+    """Days since 1970-01-01 for a YYYY-MM-DD string"""
+    return date.fromisoformat(day).toordinal() - EPOCH_ORDINAL
+
+
+def day_label(number):
+    """YYYY-MM-DD string for a day number"""
+    return date.fromordinal(number + EPOCH_ORDINAL).isoformat()
+
+
+class CategoryTable:
+    """Interns category names as small integer codes"""
+
+    def __init__(self, names=()):
+        self.names = []
+        self.codes = {}
+        for name in names:
+            self.code(name)
+
+    def code(self, name):
+        """Return the code for a name, adding it if new"""
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def __len__(self):
+        return len(self.names)
+
+
+class SessionRecord:
+    """One session with typed fields.
+
+    Timestamps are wall-clock microseconds since 1970-01-01, so
+    ``start_us // MICROSECONDS_PER_DAY`` is the calendar day of the ISO
+    string. Records also answer ``record["start_time"]`` and ``.get()``
+    like the JSON dicts, so code written against the dicts keeps working.
+    ``extra`` holds anything the typed fields cannot reproduce exactly:
+    non-canonical timestamp strings and unknown keys. ``extra["type"]`` is
+    None when the source had no type; the record then counts as "manual"
+    but ``to_dict`` leaves the key out again.
+    """
+
+    __slots__ = ("activity", "duration", "start_us", "end_us", "type", "extra")
+
+    def __init__(self, activity, duration, start_us, end_us, session_type="manual", extra=None):
+        self.activity = activity
+        self.duration = duration
+        self.start_us = start_us
+        self.end_us = end_us
+        self.type = session_type
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, session):
+        """Build a record from a session dict in the JSON layout"""
+        if isinstance(session, cls):
+            return session
+        start_us, start_canonical = parse_timestamp(session["start_time"])
+        end_us, end_canonical = parse_timestamp(session["end_time"])
+        return cls(session["activity"], session["duration"], start_us, end_us,
+                   session.get("type", "manual"),
+                   extra_fields(session, start_canonical, end_canonical))
+
+    @property
+    def start_time(self):
+        if self.extra and "start_time" in self.extra:
+            return self.extra["start_time"]
+        return format_timestamp(self.start_us)
+
+    @property
+    def end_time(self):
+        if self.extra and "end_time" in self.extra:
+            return self.extra["end_time"]
+        return format_timestamp(self.end_us)
+
+    @property
+    def start(self):
+        """Start as a naive datetime"""
+        return EPOCH + timedelta(microseconds=self.start_us)
+
+    @property
+    def end(self):
+        """End as a naive datetime"""
+        return EPOCH + timedelta(microseconds=self.end_us)
+
+    @property
+    def day(self):
+        """Day number of the start time"""
+        return self.start_us // MICROSECONDS_PER_DAY
+
+    def to_dict(self):
+        """Return the session in the JSON layout"""
+        session = {
+            "activity": self.activity,
+            "duration": self.duration,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "type": self.type
+        }
+        if self.extra:
+            session.update(self.extra)
+            if "type" in self.extra:
+                del session["type"]
+        return session
+
+    def keys(self):
+        keys = list(FIELDS)
+        if self.extra:
+            if "type" in self.extra:
+                keys.remove("type")
+            keys.extend(key for key in self.extra if key not in FIELDS)
+        return keys
+
+    def __getitem__(self, key):
+        if key in FIELDS:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        if self.extra and key in self.extra:
+            return key != "type"
+        return key in FIELDS
+
+    def __eq__(self, other):
+        if isinstance(other, (SessionRecord, dict)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"SessionRecord({self.to_dict()!r})"
+
+
+def session_dict(session):
+    """Return a session in the JSON layout, whether it is a record or a dict"""
+    return session.to_dict() if isinstance(session, SessionRecord) else session
+
+
+class TimeIndex:
+    """Row numbers of a SessionTable kept sorted by start time.
+
+    ``keys`` mirrors the start times in sorted order so ``bisect`` finds
+    a time range in O(log n); rows appended in time order go to the end
+    in O(1), out-of-order ones are inserted in place.
+    """
+
+    def __init__(self, starts):
+        if all(a <= b for a, b in zip(starts, islice(starts, 1, None))):
+            # The usual case: sessions were recorded in time order
+            self.rows = array("I", range(len(starts)))
+            self.keys = array("q", starts)
+        else:
+            self.rows = array("I", sorted(range(len(starts)), key=starts.__getitem__))
+            self.keys = array("q", (starts[row] for row in self.rows))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, row, start):
+        """Index a newly appended row"""
+        if not self.keys or start >= self.keys[-1]:
+            self.keys.append(start)
+            self.rows.append(row)
+        else:
+            position = bisect_right(self.keys, start)
+            self.keys.insert(position, start)
+            self.rows.insert(position, row)
+
+    def span(self, low=None, high=None):
+        """Positions [first, last) of the rows with low <= start < high"""
+        first = 0 if low is None else bisect_left(self.keys, low)
+        last = len(self.keys) if high is None else bisect_left(self.keys, high)
+        return first, last
+
+    def newest(self, offset=0, limit=10):
+        """Rows newest first, skipping the ``offset`` newest"""
+        last = len(self.rows) - offset
+        if last <= 0 or limit <= 0:
+            return []
+        return self.rows[max(last - limit, 0):last][::-1].tolist()
+
+
+class SessionTable:
+    """Sessions stored column-wise in typed arrays.
+
+    About 33 bytes per session instead of a dict with two ISO strings.
+    Activities and types are interned through ``CategoryTable``s and
+    ``integral`` remembers which durations were JSON integers, so
+    ``to_dicts()`` reproduces the original documents. Indexing returns a
+    ``SessionRecord``.
+    """
+
+    def __init__(self):
+        self.start = array("q")
+        self.end = array("q")
+        self.duration = array("d")
+        self.integral = array("b")
+        self.activity = array("I")
+        self.type = array("I")
+        self.activities = CategoryTable()
+        self.types = CategoryTable()
+        self.extras = {}
+        self._index = None
+
+    @classmethod
+    def from_sessions(cls, sessions):
+        """Build a table from session dicts or records"""
+        table = cls()
+        for session in sessions:
+            table.append(session)
+        return table
+
+    def __len__(self):
+        return len(self.start)
+
+    def index(self):
+        """Return the TimeIndex, building it on first use"""
+        if self._index is None:
+            self._index = TimeIndex(self.start)
+        return self._index
+
+    def append(self, session):
+        """Append a session dict or record"""
+        # Dicts are unpacked inline: this runs once per session on load
+        if isinstance(session, SessionRecord):
+            start_us, end_us, extra = session.start_us, session.end_us, session.extra
+            session_type = session.type
+        else:
+            start_us, start_canonical = parse_timestamp(session["start_time"])
+            end_us, end_canonical = parse_timestamp(session["end_time"])
+            extra = extra_fields(session, start_canonical, end_canonical)
+            session_type = session.get("type", "manual")
+        if extra:
+            self.extras[len(self.start)] = dict(extra)
+
+        duration = session["duration"]
+        self.start.append(start_us)
+        self.end.append(end_us)
+        self.duration.append(duration)
+        self.integral.append(isinstance(duration, int))
+        self.activity.append(self.activities.code(session["activity"]))
+        self.type.append(self.types.code(session_type))
+        if self._index is not None:
+            self._index.add(len(self.start) - 1, start_us)
+
+    def record(self, i):
+        """Return row i as a SessionRecord"""
+        duration = self.duration[i]
+        if self.integral[i]:
+            duration = int(duration)
+        return SessionRecord(self.activities.names[self.activity[i]], duration,
+                             self.start[i], self.end[i], self.types.names[self.type[i]],
+                             self.extras.get(i if i >= 0 else i + len(self.start)))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.record(j) for j in range(*i.indices(len(self)))]
+        return self.record(i)
+
+    def __iter__(self):
+        for i in range(len(self.start)):
+            yield self.record(i)
+
+    def json_rows(self):
+        """Yield each session as a JSON object string without building dicts"""
+        activities = [json.dumps(name) for name in self.activities.names]
+        types = [json.dumps(name) for name in self.types.names]
+        for i, (start, end, duration, integral, activity, session_type) in enumerate(zip(
+                self.start, self.end, self.duration, self.integral, self.activity, self.type)):
+            if i in self.extras:
+                yield json.dumps(self.record(i).to_dict())
+                continue
+            yield (f'{{"activity": {activities[activity]}, '
+                   f'"duration": {int(duration) if integral else repr(duration)}, '
+                   f'"start_time": "{format_timestamp(start)}", '
+                   f'"end_time": "{format_timestamp(end)}", '
+                   f'"type": {types[session_type]}}}')
+
+    def to_dicts(self):
+        """Return every session in the JSON layout"""
+        return [record.to_dict() for record in self]
+
+    def copy(self):
+        """Return an independent copy"""
+        table = SessionTable()
+        for name in ("start", "end", "duration", "integral", "activity", "type"):
+            setattr(table, name, array(getattr(self, name).typecode, getattr(self, name)))
+        table.activities = CategoryTable(self.activities.names)
+        table.types = CategoryTable(self.types.names)
+        table.extras = {i: dict(extra) for i, extra in self.extras.items()}
+        if self._index is not None:
+            table._index = TimeIndex.__new__(TimeIndex)
+            table._index.rows = array("I", self._index.rows)
+            table._index.keys = array("q", self._index.keys)
+        return table
@@ -0,0 +1,141 @@
+# report.py - Headless statistics reports for one or many data files
+#
+# Usage:
+#   python report.py productivity_data.json
+#   python report.py --format csv --output reports/ --charts alice.json bob.db
+#   find /srv/profiles -name '*.json' | python report.py --output reports/ -
+#
+# Runs ProductivityStatsManager without tkinter; charts are rendered to PNG
+# through the Agg backend. All files are processed in one interpreter, so
+# the numpy/pandas/matplotlib import cost is paid once.
+import argparse
+import csv
+import json
+import os
+import sys
+
+from stats_manager import METRICS, ProductivityStatsManager, calculate_insights
+from timeseries import VIEWS
+
+
+def build_report(manager, days=7):
+    """Run every statistics query for one data file"""
+    metrics = manager.compute_metrics(METRICS, days)
+    return {
+        "data_file": manager.data_file,
+        "totals": metrics.get_totals(),
+        "comfort_choices": metrics.data["comfort_choices"],
+        "total_pomodoros": metrics.data["total_pomodoros"],
+        "productivity_score": metrics.get_productivity_score(),
+        "daily_stats": metrics.get_daily_stats(days),
+        "activity_breakdown": metrics.get_activity_breakdown(),
+        "insights": calculate_insights(metrics)
+    }
+
+
+def report_name(data_file, taken):
+    """Base name used for the output files of one data file.
+
+    ``taken`` holds the names handed out so far; a later a/alice.json and
+    b/alice.json get alice_json and alice_json_2 instead of overwriting
+    each other's reports.
+    """
+    # Keep the extension so alice.json and alice.db do not collide
+    base = name = os.path.basename(os.path.normpath(data_file)).replace(".", "_")
+    suffix = 1
+    while name in taken:
+        suffix += 1
+        name = f"{base}_{suffix}"
+    taken.add(name)
+    return name
+
+
+def write_json(report, stream):
+    json.dump(report, stream, indent=2, ensure_ascii=False)
+    stream.write("\n")
+
+
+def write_csv(report, stream):
+    """Write the daily stats and activity breakdown as one long-format table"""
+    writer = csv.writer(stream)
+    writer.writerow(["data_file", "section", "key", "total_time", "sessions", "pomodoros"])
+    for date, stats in report["daily_stats"].items():
+        writer.writerow([report["data_file"], "daily", date, stats["total_time"],
+                         stats["sessions"], stats["pomodoros"]])
+    for activity, stats in report["activity_breakdown"].items():
+        writer.writerow([report["data_file"], "activity", activity, stats["time"],
+                         stats["sessions"], ""])
+    writer.writerow([report["data_file"], "score", "productivity_score",
+                     report["productivity_score"], "", ""])
+
+
+def iter_data_files(paths):
+    """Expand '-' into paths read from stdin, one per line"""
+    for path in paths:
+        if path == "-":
+            for line in sys.stdin:
+                line = line.strip()
+                if line:
+                    yield line
+        else:
+            yield path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate productivity reports without a display")
+    parser.add_argument("data_files", nargs="+",
+                        help="data files (.json, .db, .parts or .bin); '-' reads paths from stdin")
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--days", type=int, default=7, help="days of daily stats (default 7)")
+    parser.add_argument("--view", choices=list(VIEWS),
+                        help="report on a period instead, bucketed by day, week or month")
+    parser.add_argument("--output", help="directory for per-file reports (default: stdout)")
+    parser.add_argument("--charts", action="store_true",
+                        help="also render the dashboard to PNG (requires --output)")
+    args = parser.parse_args(argv)
+
+    if args.charts and not args.output:
+        parser.error("--charts requires --output")
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    writer = write_json if args.format == "json" else write_csv
+    days = VIEWS[args.view] if args.view else args.days
+    failures = 0
+    names = set()
+    for data_file in iter_data_files(args.data_files):
+        if not os.path.exists(data_file):
+            print(f"{data_file}: no such file", file=sys.stderr)
+            failures += 1
+            continue
+        # One broken file must not cost the reports of the others
+        try:
+            manager = ProductivityStatsManager(data_file)
+        except Exception as exc:
+            print(f"{data_file}: {type(exc).__name__}: {exc}", file=sys.stderr)
+            failures += 1
+            continue
+
+        try:
+            report = build_report(manager, days)
+            if args.output:
+                name = report_name(data_file, names)
+                path = os.path.join(args.output, f"{name}.{args.format}")
+                with open(path, 'w', newline='') as stream:
+                    writer(report, stream)
+                if args.charts:
+                    import charts
+                    charts.save_dashboard_png(manager, os.path.join(args.output, f"{name}.png"), days)
+            else:
+                writer(report, sys.stdout)
+        except Exception as exc:
+            print(f"{data_file}: {type(exc).__name__}: {exc}", file=sys.stderr)
+            failures += 1
+        finally:
+            manager.store.close()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# rollups.py - Incrementally maintained aggregates over sessions
+
+
+class SessionRollups:
+    """Per-day, per-activity and per-type totals kept up to date on append.
+
+    Adding a session touches a fixed number of dict entries, so dashboards
+    read totals in time proportional to the days shown instead of the
+    whole history. ``session_count`` records how many sessions the rollups
+    cover and is used to detect when they have gone stale.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """Drop all aggregates"""
+        self.by_day = {}
+        self.by_activity = {}
+        self.by_type = {}
+        self.total_time = 0
+        self.session_count = 0
+        self.built = False
+
+    def rebuild(self, sessions):
+        """Recompute every aggregate from an iterable of sessions"""
+        self.clear()
+        for session in sessions:
+            self.add(session)
+        self.built = True
+
+    def rebuild_from_columns(self, columns):
+        """Recompute every aggregate from a SessionColumns with vectorized group-bys"""
+        self.clear()
+        self.by_day = columns.daily_totals()
+        self.by_activity = columns.activity_totals()
+        self.by_type = columns.type_totals()
+        self.total_time = columns.total_time()
+        self.session_count = len(columns)
+        self.built = True
+
+    def add(self, session):
+        """Fold one session into the aggregates"""
+        duration = session["duration"]
+        activity = session["activity"]
+        session_type = session.get("type", "manual")
+        day = session["start_time"][:10]
+
+        day_stats = self.by_day.get(day)
+        if day_stats is None:
+            day_stats = self.by_day[day] = self.empty_day()
+        day_stats["total_time"] += duration
+        day_stats["sessions"] += 1
+        if session_type == "pomodoro":
+            day_stats["pomodoros"] += 1
+        day_stats["activities"][activity] = day_stats["activities"].get(activity, 0) + duration
+
+        activity_stats = self.by_activity.setdefault(activity, {"time": 0, "sessions": 0})
+        activity_stats["time"] += duration
+        activity_stats["sessions"] += 1
+
+        type_stats = self.by_type.setdefault(session_type, {"time": 0, "sessions": 0})
+        type_stats["time"] += duration
+        type_stats["sessions"] += 1
+
+        self.total_time += duration
+        self.session_count += 1
+
+    @staticmethod
+    def empty_day():
+        """Return the totals of a day without sessions"""
+        return {"total_time": 0, "sessions": 0, "pomodoros": 0, "activities": {}}
+
+    def day(self, day):
+        """Return a copy of the totals for one YYYY-MM-DD day"""
+        stats = self.by_day.get(day)
+        if stats is None:
+            return self.empty_day()
+        return dict(stats, activities=dict(stats["activities"]))
+
+    def activities(self):
+        """Return a copy of the per-activity totals"""
+        return {activity: dict(stats) for activity, stats in self.by_activity.items()}
+
+    def types(self):
+        """Return a copy of the per-type totals"""
+        return {session_type: dict(stats) for session_type, stats in self.by_type.items()}
@@ -0,0 +1,102 @@
+# scheduler.py - Clock and wake-up scheduling for the Tk windows
+import math
+import queue
+import sys
+import threading
+import time
+
+# A clock that is immune to wall-clock changes but keeps counting while the
+# machine is suspended, so a Pomodoro ends at the right real-world moment.
+# time.monotonic() stops during suspend on Linux and macOS.
+if hasattr(time, "CLOCK_BOOTTIME"):
+    _CLOCK_ID = time.CLOCK_BOOTTIME
+elif sys.platform == "darwin":
+    _CLOCK_ID = time.CLOCK_MONOTONIC
+else:
+    _CLOCK_ID = None
+
+
+def clock():
+    """Return seconds from a monotonic, suspend-inclusive clock"""
+    if _CLOCK_ID is None:
+        return time.monotonic()
+    return time.clock_gettime(_CLOCK_ID)
+
+
+def seconds_until_next_tick(elapsed, deadline_in=None):
+    """Seconds until the displayed whole second changes or a deadline is due"""
+    delay = math.floor(elapsed) + 1 - elapsed
+    if deadline_in is not None:
+        delay = min(delay, deadline_in)
+    return max(delay, 0)
+
+
+class WakeScheduler:
+    """Keeps at most one pending Tk after() callback.
+
+    Each wake-up is scheduled for an exact delay computed from ``clock()``
+    rather than a fixed period, so errors never accumulate, and nothing is
+    scheduled at all while the timer is idle.
+    """
+
+    def __init__(self, widget, callback):
+        self.widget = widget
+        self.callback = callback
+        self.pending = None
+
+    def wake_in(self, seconds):
+        """Run the callback after the given delay, replacing any pending wake-up"""
+        self.cancel()
+        # Round up: waking a millisecond early would show the old second
+        self.pending = self.widget.after(max(1, math.ceil(seconds * 1000)), self._fire)
+
+    def cancel(self):
+        """Drop the pending wake-up, if any"""
+        if self.pending is not None:
+            self.widget.after_cancel(self.pending)
+            self.pending = None
+
+    def _fire(self):
+        self.pending = None
+        self.callback()
+
+
+class TkEventQueue:
+    """Runs callbacks handed over from any thread on the Tk thread.
+
+    Store listeners are called on whichever thread changed the store, such
+    as an import worker, but widgets may only be touched from the thread
+    running Tk. ``wrap(listener)`` returns a listener that calls through
+    at once on the Tk thread and otherwise queues the call; the Tk thread
+    drains the queue every ``interval`` ms until ``stop()``.
+    """
+
+    def __init__(self, widget, interval=100):
+        self.widget = widget
+        self.interval = interval
+        self.thread = threading.get_ident()
+        self.calls = queue.SimpleQueue()
+        self.pending = self.widget.after(self.interval, self.poll)
+
+    def call(self, callback, *args):
+        if threading.get_ident() == self.thread:
+            callback(*args)
+        else:
+            self.calls.put((callback, args))
+
+    def wrap(self, callback):
+        return lambda *args: self.call(callback, *args)
+
+    def poll(self):
+        try:
+            while True:
+                callback, args = self.calls.get_nowait()
+                callback(*args)
+        except queue.Empty:
+            pass
+        self.pending = self.widget.after(self.interval, self.poll)
+
+    def stop(self):
+        if self.pending is not None:
+            self.widget.after_cancel(self.pending)
+            self.pending = None
@@ -0,0 +1,134 @@
+# session_browser.py - Virtualized Treeview for browsing the session history
+from collections import OrderedDict
+import tkinter as tk
+from tkinter import ttk
+
+
+class SessionBrowser:
+    """A Treeview that only ever holds one screenful of sessions.
+
+    The scrollbar is driven by hand: its position is ``offset / count``
+    rather than the Treeview's own contents. Rows are fetched in blocks of
+    ``block_size`` through ``fetch_page(offset, limit)`` (newest first) and
+    the last few blocks are cached, so scrolling line by line does not
+    query the store on every step. ``version()`` should change whenever
+    sessions are added; the cache is dropped when it does.
+    """
+
+    COLUMNS = ("Date", "Time", "Activity", "Duration", "Type")
+    CACHED_BLOCKS = 8
+
+    def __init__(self, parent, fetch_page, count, version=None, rows=8, block_size=200):
+        self.fetch_page = fetch_page
+        self.count = count
+        self.version = version or (lambda: None)
+        self.rows = rows
+        self.block_size = block_size
+        self.offset = 0
+        self.total = 0
+        self.blocks = OrderedDict()
+        self.cached_version = None
+
+        self.frame = tk.Frame(parent, bg="#f0f0f0")
+        self.tree = ttk.Treeview(self.frame, columns=self.COLUMNS, show="headings",
+                                 height=rows, selectmode="browse")
+        for col in self.COLUMNS:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=120)
+
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(3))
+        self.tree.bind("<Prior>", lambda e: self.scroll_by(-self.rows))
+        self.tree.bind("<Next>", lambda e: self.scroll_by(self.rows))
+        self.tree.bind("<Home>", lambda e: self.scroll_to(0))
+        self.tree.bind("<End>", lambda e: self.scroll_to(self.total))
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def seed(self, sessions, total):
+        """Show an already fetched first page, e.g. one computed off the Tk thread"""
+        self.cached_version = self.version()
+        self.blocks.clear()
+        if len(sessions) >= min(self.block_size, total):
+            self.blocks[0] = list(sessions[:self.block_size])
+        self.total = total
+        self.offset = 0
+        self.render(sessions[:self.rows])
+
+    def refresh(self):
+        """Re-read the session count and redraw the current page"""
+        self.total = self.count()
+        self.scroll_to(self.offset, force=True)
+
+    def rows_at(self, offset):
+        """Return the visible rows starting at offset, fetching blocks as needed"""
+        version = self.version()
+        if version != self.cached_version:
+            self.blocks.clear()
+            self.cached_version = version
+
+        rows = []
+        position = offset
+        while len(rows) < self.rows and position < self.total:
+            block = position // self.block_size
+            if block in self.blocks:
+                self.blocks.move_to_end(block)
+            else:
+                self.blocks[block] = self.fetch_page(block * self.block_size, self.block_size)
+                if len(self.blocks) > self.CACHED_BLOCKS:
+                    self.blocks.popitem(last=False)
+            sessions = self.blocks[block]
+            start = position - block * self.block_size
+            if start >= len(sessions):
+                break
+            taken = sessions[start:start + self.rows - len(rows)]
+            rows.extend(taken)
+            position += len(taken)
+        return rows
+
+    def scroll_to(self, offset, force=False):
+        offset = max(0, min(int(offset), self.total - self.rows))
+        if offset == self.offset and not force:
+            return
+        self.offset = offset
+        self.render(self.rows_at(offset))
+
+    def scroll_by(self, delta):
+        self.scroll_to(self.offset + delta)
+        return "break"
+
+    def on_scrollbar(self, action, value, unit=None):
+        """Scrollbar command: ("moveto", fraction) or ("scroll", n, "units"|"pages")"""
+        if action == "moveto":
+            self.scroll_to(float(value) * self.total)
+        elif action == "scroll":
+            step = self.rows if unit == "pages" else 1
+            self.scroll_by(int(value) * step)
+
+    def on_mousewheel(self, event):
+        return self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def render(self, sessions):
+        """Replace the Treeview contents with one page of sessions"""
+        self.tree.delete(*self.tree.get_children())
+        for session in sessions:
+            start = session.start
+            self.tree.insert("", "end", values=(
+                start.strftime("%Y-%m-%d"),
+                start.strftime("%H:%M"),
+                session.activity,
+                f"{session.duration/60:.0f}m",
+                session.type.title()
+            ))
+
+        if self.total:
+            first = self.offset / self.total
+            self.scrollbar.set(first, min(1.0, (self.offset + self.rows) / self.total))
+        else:
+            self.scrollbar.set(0, 1)
@@ -0,0 +1,469 @@
+# stats_manager.py - Statistics queries over the session store (no GUI imports)
+from collections import deque
+from datetime import datetime, timedelta
+import threading
+
+from columnar import SessionColumns
+from profiling import count, profiled
+from rollups import SessionRollups
+from storage import SessionStore
+from timeseries import TimeSeries, View, to_seconds, view_window
+
+# Metrics a window can declare up front; see ProductivityStatsManager.compute_metrics
+METRICS = ("totals", "daily", "activities", "types", "score")
+# Also computed in the same pass for the statistics window: the all-time
+# totals and score whatever the period, and the all-time focus heatmap
+DASHBOARD_METRICS = ("overall", "heatmap")
+
+
+def productivity_score(totals, comfort_choices, pomodoros):
+    """Calculate productivity score based on various metrics"""
+    total_sessions = totals["sessions"]
+    total_time = totals["total_time"]
+    
+    if total_sessions == 0:
+        return 0
+    
+    # Calculate score (0-100)
+    time_score = min(total_time / 3600, 10) * 10  # Max 10 points for 10+ hours
+    session_score = min(total_sessions, 20) * 2   # Max 40 points for 20+ sessions
+    pomodoro_score = min(pomodoros, 10) * 3       # Max 30 points for 10+ pomodoros
+    comfort_penalty = min(comfort_choices * 2, 20) # Max -20 points
+    
+    score = max(0, time_score + session_score + pomodoro_score - comfort_penalty)
+    return min(100, score)
+
+
+class MetricSet:
+    """Dashboard metrics computed together from one revision of the store.
+
+    Answers the same getters as ProductivityStatsManager, so charts and
+    insights can be handed either one. The values are shared between
+    readers and must not be modified. Asking for a metric that was not
+    declared when the set was computed raises KeyError rather than
+    quietly querying the store again.
+    """
+    
+    def __init__(self, metrics, days, revision, data):
+        self.metrics = metrics
+        self.days = days
+        self.revision = revision
+        self.data = data
+    
+    def __contains__(self, name):
+        return name in self.metrics
+    
+    def get(self, name):
+        try:
+            return self.metrics[name]
+        except KeyError:
+            raise KeyError(f"metric {name!r} was not declared") from None
+    
+    def compute_metrics(self, metrics=METRICS, days=7):
+        """Return self if it already holds the requested metrics"""
+        for name in metrics:
+            self.get(name)
+        if "daily" in metrics:
+            self.get_daily_stats(days)
+        return self
+    
+    def store_revision(self):
+        return self.revision
+    
+    def get_totals(self):
+        return self.get("totals")
+    
+    def get_daily_stats(self, days=7):
+        if days != self.days:
+            raise KeyError(f"daily stats were computed for {self.days} days, not {days}")
+        return self.get("daily")
+    
+    def get_activity_breakdown(self):
+        return self.get("activities")
+    
+    def get_type_breakdown(self):
+        return self.get("types")
+    
+    def get_productivity_score(self):
+        return self.get("score")
+    
+    def get_focus_heatmap(self):
+        return self.get("heatmap")
+    
+    def overall(self):
+        """The all-time totals and score as a MetricSet, whatever the period"""
+        return MetricSet(self.get("overall"), None, self.revision, self.data)
+
+
+class ProductivityStatsManager:
+    def __init__(self, data_file="productivity_data.json", store=None):
+        self.data_file = data_file
+        self.store = store
+        self.load_data()
+        
+    def load_data(self):
+        """Attach to the shared session store, opening one if none was given"""
+        if self.store is None:
+            self.store = SessionStore(self.data_file)
+        self.data = self.store.data
+        
+        # Partitioned storage answers aggregates from its manifest and the
+        # partitions in range; building full rollups would defeat that
+        self.on_demand = self.store.loads_on_demand
+        self.columns = None
+        self.rollups = SessionRollups()
+        self.revision = None
+        self.series = None  # (revision, TimeSeries) built from self.columns
+        self.heatmap = None  # (revision, all-time focus heatmap)
+        self.lock = threading.RLock()
+        
+        # Sessions appended since the last query, applied lazily so the
+        # notifying thread never waits on a rebuild in progress
+        self.pending = deque()
+        
+        # Instrumentation: aggregate queries answered and full rebuilds of the rollups
+        self.passes = 0
+        self.rebuilds = 0
+        self.store.subscribe(self.on_store_change)
+    
+    def close(self):
+        """Stop listening to store changes"""
+        self.store.unsubscribe(self.on_store_change)
+    
+    def on_store_change(self, event, payload, revision):
+        """Store listener: queue appended sessions for the rollups"""
+        if event == "session_appended":
+            self.pending.append((revision, payload))
+    
+    @profiled
+    def ensure_rollups(self):
+        """Bring the columns and rollups up to date with the store"""
+        if self.on_demand:
+            return None
+        with self.lock:
+            if self.revision is None:
+                packed, self.revision = self.store.packed_sessions()
+                if packed is not None:
+                    self.columns = SessionColumns.from_packed(packed)
+                else:
+                    table, self.revision = self.store.snapshot_sessions()
+                    self.columns = SessionColumns.from_table(table)
+                self.rebuilds += 1
+                count("rollup_rebuilds")
+                self.rollups.rebuild_from_columns(self.columns)
+            
+            while self.pending:
+                revision, session = self.pending.popleft()
+                if revision > self.revision:
+                    self.columns.append(session)
+                    self.rollups.add(session)
+                    self.revision = revision
+            
+            # Stale if changes reached the store without a notification
+            if self.revision != self.store.revision:
+                self.revision = None
+                return self.ensure_rollups()
+        return self.rollups
+    
+    def append_session(self, session):
+        """Store a new session; the rollups pick it up through the store"""
+        self.store.append_session(session)
+    
+    def store_revision(self):
+        return self.store.revision
+    
+    def time_series(self, start=None, end=None):
+        """Return a TimeSeries covering at least the given range.
+        
+        Locally it covers every session and is rebuilt only when the store
+        has changed; storage that loads on demand reads just the sessions
+        in the range.
+        """
+        if self.on_demand:
+            first_day = None if start is None else self._day(to_seconds(start))
+            last_day = None if end is None else self._day(to_seconds(end) - 1)
+            table = self.store.query_sessions(first_day, last_day)
+            return TimeSeries(SessionColumns.from_table(table))
+        with self.lock:
+            self.ensure_rollups()
+            if self.series is None or self.series[0] != self.revision:
+                self.series = (self.revision, TimeSeries(self.columns))
+            return self.series[1]
+    
+    @staticmethod
+    def _day(seconds):
+        return (datetime(1970, 1, 1) + timedelta(seconds=seconds)).strftime("%Y-%m-%d")
+    
+    @profiled
+    def get_focus_heatmap(self, start=None, end=None):
+        """Get productive minutes and Pomodoros per weekday and hour of day.
+        
+        Returns 7x24 arrays, Monday first; see SessionColumns.focus_heatmap.
+        The all-time heatmap is shared until the store changes and must not
+        be modified.
+        """
+        self.passes += 1
+        return self._focus_heatmap(start, end)
+    
+    def _focus_heatmap(self, start=None, end=None):
+        first = None if start is None else to_seconds(start)
+        last = None if end is None else to_seconds(end)
+        if self.on_demand:
+            first_day = None if first is None else self._day(first)
+            last_day = None if last is None else self._day(last - 1)
+            columns = SessionColumns.from_table(self.store.query_sessions(first_day, last_day))
+            return columns.focus_heatmap(first, last)
+        with self.lock:
+            self.ensure_rollups()
+            if first is not None or last is not None:
+                return self.columns.focus_heatmap(first, last)
+            if self.heatmap is None or self.heatmap[0] != self.revision:
+                self.heatmap = (self.revision, self.columns.focus_heatmap())
+            return self.heatmap[1]
+    
+    def get_series(self, granularity="day", start=None, end=None):
+        """Get per-bucket statistics by hour, day, week or month between two times"""
+        self.passes += 1
+        return self.time_series(start, end).series(granularity, start, end)
+    
+    def get_range_totals(self, start=None, end=None):
+        """Get total tracked time and number of sessions between two times"""
+        self.passes += 1
+        return self.time_series(start, end).totals(start, end)
+    
+    @profiled
+    def compute_metrics(self, metrics=METRICS, days=7):
+        """Compute every requested metric in one pass and return a MetricSet.
+        
+        Totals feed both "totals" and "score", and the daily stats are read
+        once however many panels show them. ``days`` may also be a View
+        (see timeseries.VIEWS): every metric then covers the view's window
+        and "daily" holds its buckets, while "overall" and "heatmap" stay
+        all-time.
+        """
+        unknown = set(metrics) - set(METRICS + DASHBOARD_METRICS)
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(sorted(unknown))}")
+        if isinstance(days, View):
+            return self._compute_view(metrics, days)
+        self.passes += 1
+        
+        values = {}
+        if self.on_demand:
+            # Read first: a remote store may refresh the counters along with it
+            revision = self.store.revision
+            if {"totals", "score", "overall"} & set(metrics):
+                values["totals"] = self.store.totals()
+            if "daily" in metrics:
+                values["daily"] = self._daily_from_store(days)
+            if "activities" in metrics:
+                values["activities"] = self.store.activity_totals()
+            if "types" in metrics:
+                values["types"] = self.store.type_totals()
+        else:
+            with self.lock:
+                rollups = self.ensure_rollups()
+                revision = self.revision
+                values["totals"] = {"total_time": rollups.total_time,
+                                    "sessions": rollups.session_count}
+                if "daily" in metrics:
+                    values["daily"] = {day: rollups.day(day) for day in self.day_labels(days)}
+                if "activities" in metrics:
+                    values["activities"] = rollups.activities()
+                if "types" in metrics:
+                    values["types"] = rollups.types()
+                if "heatmap" in metrics:
+                    values["heatmap"] = self._focus_heatmap()
+        if "heatmap" in metrics and self.on_demand:
+            values["heatmap"] = self._focus_heatmap()
+        
+        data = {key: self.data.get(key, 0) for key in ("comfort_choices", "total_pomodoros")}
+        if "score" in metrics or "overall" in metrics:
+            values["score"] = productivity_score(values["totals"], data["comfort_choices"],
+                                                 data["total_pomodoros"])
+        if "overall" in metrics:
+            values["overall"] = {"totals": values["totals"], "score": values["score"]}
+        for name in ("totals", "score"):
+            if name not in metrics:
+                values.pop(name, None)
+        return MetricSet(values, days, revision, data)
+    
+    def _compute_view(self, metrics, view):
+        self.passes += 1
+        start, end = view_window(view)
+        if self.on_demand:
+            # Read first: a remote store may refresh the counters along with it
+            revision = self.store.revision
+            series = self.time_series(start, end)
+            if "overall" in metrics and view.days is not None:
+                overall_totals = self.store.totals()
+            if "heatmap" in metrics:
+                heatmap = self._focus_heatmap()
+        else:
+            with self.lock:
+                series = self.time_series(start, end)
+                revision = self.series[0]
+                # The rollups time_series brought up to date hold the all-time totals
+                overall_totals = {"total_time": self.rollups.total_time,
+                                  "sessions": self.rollups.session_count}
+                if "heatmap" in metrics:
+                    heatmap = self._focus_heatmap()
+        
+        values = {"totals": series.totals(start, end)}
+        if view.days is None:
+            overall_totals = values["totals"]
+        if "daily" in metrics:
+            values["daily"] = series.series(view.granularity, start, end)
+        if "activities" in metrics:
+            values["activities"] = series.activity_totals(start, end)
+        if "types" in metrics:
+            values["types"] = series.type_totals(start, end)
+        
+        data = {key: self.data.get(key, 0) for key in ("comfort_choices", "total_pomodoros")}
+        if "score" in metrics:
+            # The Pomodoro counter has no timestamps, so windows count the
+            # Pomodoro sessions started in them; comfort choices stay all-time
+            pomodoros = (data["total_pomodoros"] if view.days is None
+                         else series.pomodoro_count(start, end))
+            values["score"] = productivity_score(values["totals"], data["comfort_choices"],
+                                                 pomodoros)
+        if "overall" in metrics:
+            values["overall"] = {"totals": overall_totals,
+                                 "score": productivity_score(overall_totals, data["comfort_choices"],
+                                                             data["total_pomodoros"])}
+        if "heatmap" in metrics:
+            values["heatmap"] = heatmap
+        if "totals" not in metrics:
+            values.pop("totals")
+        return MetricSet(values, view, revision, data)
+    
+    @staticmethod
+    def day_labels(days):
+        """YYYY-MM-DD labels of the last N days, oldest first"""
+        start_date = datetime.now() - timedelta(days=days)
+        return [(start_date + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+    
+    def _daily_from_store(self, days):
+        dates = self.day_labels(days)
+        stored = self.store.daily_totals(dates[0], dates[-1]) if dates else {}
+        return {date_str: stored.get(date_str) or SessionRollups.empty_day() for date_str in dates}
+    
+    def get_totals(self):
+        """Get total tracked time and number of sessions"""
+        self.passes += 1
+        if self.on_demand:
+            return self.store.totals()
+        with self.lock:
+            rollups = self.ensure_rollups()
+            return {"total_time": rollups.total_time, "sessions": rollups.session_count}
+    
+    def get_daily_stats(self, days=7):
+        """Get statistics for the last N days"""
+        self.passes += 1
+        if self.on_demand:
+            return self._daily_from_store(days)
+        
+        with self.lock:
+            rollups = self.ensure_rollups()
+            return {date_str: rollups.day(date_str) for date_str in self.day_labels(days)}
+    
+    def get_activity_breakdown(self):
+        """Get breakdown by activity type"""
+        self.passes += 1
+        if self.on_demand:
+            return self.store.activity_totals()
+        with self.lock:
+            return self.ensure_rollups().activities()
+    
+    def get_type_breakdown(self):
+        """Get breakdown by session type (manual, pomodoro, break)"""
+        self.passes += 1
+        if self.on_demand:
+            return self.store.type_totals()
+        with self.lock:
+            return self.ensure_rollups().types()
+    
+    def get_recent_sessions(self, limit=10):
+        """Get the most recent sessions, newest first"""
+        return self.store.recent_sessions(limit)
+    
+    def get_session_page(self, offset=0, limit=50):
+        """Get one page of the session history, newest first"""
+        return self.store.session_page(offset, limit)
+    
+    def get_session_count(self):
+        """Get the number of stored sessions"""
+        return self.store.session_count()
+    
+    def get_productivity_score(self):
+        """Calculate productivity score based on various metrics"""
+        return productivity_score(self.get_totals(), self.data.get("comfort_choices", 0),
+                                  self.data.get("total_pomodoros", 0))
+
+
+# Metrics calculate_insights reads; pass it a MetricSet holding them to avoid re-querying
+INSIGHT_METRICS = ("totals", "activities", "score")
+
+
+@profiled
+def calculate_insights(stats_manager):
+    """Calculate insights based on user data"""
+    insights = []
+    
+    # Analyze productivity patterns
+    activities = stats_manager.get_activity_breakdown()
+    score = stats_manager.get_productivity_score()
+    comfort_choices = stats_manager.data.get("comfort_choices", 0)
+    
+    # Productivity score insight
+    if score >= 80:
+        insights.append({
+            "icon": "🌟",
+            "title": "Excellent Productivity!",
+            "message": "You're maintaining high productivity levels. Keep up the great work!",
+            "type": "success"
+        })
+    elif score >= 60:
+        insights.append({
+            "icon": "📈",
+            "title": "Good Progress",
+            "message": "You're on the right track. Consider increasing your Pomodoro sessions for better focus.",
+            "type": "info"
+        })
+    else:
+        insights.append({
+            "icon": "🎯",
+            "title": "Room for Improvement",
+            "message": "Try setting smaller, achievable goals and use the Pomodoro technique more frequently.",
+            "type": "warning"
+        })
+    
+    # Comfort choices insight
+    if comfort_choices > 5:
+        insights.append({
+            "icon": "💪",
+            "title": "Comfort Zone Challenge",
+            "message": f"You've chosen comfort {comfort_choices} times. Remember: growth happens outside your comfort zone!",
+            "type": "warning"
+        })
+    
+    # Activity diversity insight
+    if len(activities) > 3:
+        insights.append({
+            "icon": "🎨",
+            "title": "Great Activity Diversity",
+            "message": "You're working on multiple types of activities. This helps prevent burnout and keeps you engaged!",
+            "type": "success"
+        })
+    
+    # Time-based insights
+    total_time = stats_manager.get_totals()["total_time"]
+    if total_time > 7200:  # More than 2 hours
+        insights.append({
+            "icon": "⏰",
+            "title": "Consistent Time Investment",
+            "message": f"You've logged {total_time/3600:.1f} hours of productive time. Consistency is key to success!",
+            "type": "success"
+        })
+    
+    return insights
@@ -0,0 +1,1029 @@
+# storage.py - Persistence layer for productivity data
+from array import array
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+from records import (MICROSECONDS_PER_DAY, SessionRecord, SessionTable, day_label, day_number,
+                     session_dict)
+from profiling import count, profiled, span
+import writebehind
+
+
+def default_data():
+    """Return an empty data document"""
+    return {
+        "sessions": [],
+        "comfort_choices": 0,
+        "total_pomodoros": 0
+    }
+
+
+class SessionStorage:
+    """Base class for storage backends.
+
+    Subclasses provide ``load``, ``append_session``, ``increment`` and
+    ``close``. The query methods below scan the in-memory ``SessionTable``
+    column by column and can be overridden by backends that can answer
+    them natively. Sessions are returned as ``SessionRecord`` objects.
+    """
+
+    data = None
+
+    # Backends that keep most of the history on disk set this so callers
+    # ask for aggregates instead of materializing every session
+    loads_on_demand = False
+
+    def sessions(self):
+        """Return the in-memory SessionTable"""
+        return self.data["sessions"]
+
+    def iter_sessions(self):
+        """Yield every session in insertion order"""
+        return iter(self.sessions())
+
+    def snapshot(self):
+        """Return an independent SessionTable of every session"""
+        return self.sessions().copy()
+
+    def session_count(self):
+        """Return the number of stored sessions"""
+        return len(self.sessions())
+
+    def day_span(self, first_day=None, last_day=None):
+        """Positions in the time index of sessions starting between two dates"""
+        low = None if first_day is None else day_number(first_day) * MICROSECONDS_PER_DAY
+        high = None if last_day is None else (day_number(last_day) + 1) * MICROSECONDS_PER_DAY
+        return self.sessions().index().span(low, high)
+
+    def query_sessions(self, first_day=None, last_day=None, activities=None):
+        """Yield sessions starting between two YYYY-MM-DD dates and in the given activities, oldest first"""
+        table = self.sessions()
+        index = table.index()
+        first, last = self.day_span(first_day, last_day)
+        codes = None
+        if activities is not None:
+            codes = {table.activities.codes[a] for a in activities if a in table.activities.codes}
+        for row in index.rows[first:last]:
+            if codes is None or table.activity[row] in codes:
+                yield table.record(row)
+
+    def totals(self):
+        """Return total tracked time and number of sessions"""
+        table = self.sessions()
+        return {
+            "total_time": sum(table.duration),
+            "sessions": len(table)
+        }
+
+    def daily_totals(self, first_day, last_day):
+        """Aggregate sessions per day between two YYYY-MM-DD dates, inclusive"""
+        table = self.sessions()
+        first, last = self.day_span(first_day, last_day)
+        names = table.activities.names
+        pomodoro = table.types.codes.get("pomodoro")
+        by_number = {}
+        for row in table.index().rows[first:last]:
+            day = table.start[row] // MICROSECONDS_PER_DAY
+            duration = table.duration[row]
+            stats = by_number.get(day)
+            if stats is None:
+                stats = by_number[day] = {
+                    "total_time": 0,
+                    "sessions": 0,
+                    "pomodoros": 0,
+                    "activities": {}
+                }
+            stats["total_time"] += duration
+            stats["sessions"] += 1
+            if table.type[row] == pomodoro:
+                stats["pomodoros"] += 1
+            name = names[table.activity[row]]
+            stats["activities"][name] = stats["activities"].get(name, 0) + duration
+        return {day_label(day): stats for day, stats in by_number.items()}
+
+    def _totals_by(self, codes, names):
+        time = [0] * len(names)
+        count = [0] * len(names)
+        for code, duration in zip(codes, self.sessions().duration):
+            time[code] += duration
+            count[code] += 1
+        return {
+            name: {"time": time[i], "sessions": count[i]}
+            for i, name in enumerate(names) if count[i]
+        }
+
+    def activity_totals(self):
+        """Aggregate time and session count per activity"""
+        table = self.sessions()
+        return self._totals_by(table.activity, table.activities.names)
+
+    def type_totals(self):
+        """Aggregate time and session count per session type"""
+        table = self.sessions()
+        return self._totals_by(table.type, table.types.names)
+
+    def session_page(self, offset=0, limit=50):
+        """Return ``limit`` sessions newest first, skipping the ``offset`` newest"""
+        table = self.sessions()
+        return [table.record(row) for row in table.index().newest(offset, limit)]
+
+    def recent_sessions(self, limit=10):
+        """Return the most recent sessions, newest first"""
+        return self.session_page(0, limit)
+
+    def packed(self):
+        """Return the sessions as packed records (see binstore), if the backend keeps them so"""
+        return None
+
+    def append_sessions(self, sessions):
+        """Record many sessions; backends override this to write them in one batch"""
+        for session in sessions:
+            self.append_session(session)
+
+    def compact(self):
+        """Persist a compact copy of the data, if the backend needs it"""
+
+    def flush(self):
+        """Wait until every change made so far is on disk"""
+
+    def close(self):
+        """Release any open resources"""
+
+
+class JournalStorage(SessionStorage):
+    """Snapshot file plus an append-only journal of events.
+
+    Recording a session or a counter bump appends a single line to the
+    journal, so its cost does not depend on the size of the history. Once
+    the journal holds ``compact_every`` records it is folded back into the
+    snapshot and truncated. The writes themselves are queued on a
+    ``WriteBehind`` thread, so callers never wait on the disk; a snapshot
+    is handed over as a copy of the table and serialized on that thread.
+
+    Several instances may write to one file. Journal records carry the
+    writing instance's ``writer`` id and its own ``seq``, and a snapshot
+    records the last ``seq`` of each writer it folded in. Before
+    compacting, an instance catches up: it replays records other writers
+    journaled since, or reloads everything if another instance has
+    written a snapshot in the meantime, so a compaction never drops
+    another instance's sessions.
+    """
+
+    def __init__(self, data_file="productivity_data.json", compact_every=500, persister=None):
+        self.data_file = data_file
+        self.journal_file = data_file + ".journal"
+        self.compact_every = compact_every
+        self.persister = persister or writebehind.shared()
+        self.data = None
+        self.writer = uuid.uuid4().hex[:12]
+        self.journal_seq = 0  # last seq this instance journaled
+        self.journal_records = 0
+        self.applied = {}  # writer: last seq of the current journal reflected in memory
+        self.snapshot_id = None  # of the snapshot loaded or last written
+        self._torn_at = None  # where a torn last journal line starts
+        self._unsaved = False  # journal records written since the last snapshot
+
+    @profiled
+    def load(self):
+        """Load the snapshot and replay the journal on top of it"""
+        # Another instance of this file may still have writes queued
+        self.persister.flush()
+        table = SessionTable()
+        if os.path.exists(self.data_file):
+            # Sessions go straight into the table as they are decoded, so
+            # the full list of dicts never exists at once
+            def decode(obj):
+                if "start_time" in obj and "activity" in obj:
+                    table.append(obj)
+                    return None
+                return obj
+
+            with open(self.data_file, 'r') as f, span("JournalStorage.parse_snapshot"):
+                self.data = json.load(f, object_hook=decode)
+        else:
+            self.data = default_data()
+        self.data["sessions"] = table
+
+        # Records a snapshot already folded in are skipped, so a crash
+        # between compaction steps is harmless
+        self.snapshot_id = self.data.pop("snapshot_id", None)
+        self.applied = self.data.pop("journal_seq", {})
+        if isinstance(self.applied, int):
+            self.applied = {"": self.applied}  # written before journal records named their writer
+        self.journal_records = 0
+        self._torn_at = None
+        self._unsaved = False
+        self.replay()
+
+        count("sessions_loaded", len(table))
+        return self.data
+
+    def replay(self):
+        """Apply the journal records not yet reflected in memory"""
+        if not os.path.exists(self.journal_file):
+            return
+        size = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    line = b""
+                if not line.endswith(b"\n"):
+                    self._torn_at = size  # a torn write from a crash, dropped on next append
+                    break
+                size += len(line)
+                writer = record.get("writer", "")
+                if record["seq"] <= self.applied.get(writer, 0):
+                    continue
+                self._apply(record)
+                self.applied[writer] = record["seq"]
+                self.journal_records += 1
+
+    def _apply(self, record):
+        """Apply a single journal record to the in-memory data"""
+        if record["op"] == "session":
+            self.data["sessions"].append(record["session"])
+        elif record["op"] == "incr":
+            key = record["key"]
+            self.data[key] = self.data.get(key, 0) + record.get("amount", 1)
+
+    def _append(self, record):
+        """Queue one record for the journal and compact when it grows too long"""
+        if self._torn_at is not None:
+            self.persister.truncate(self.journal_file, self._torn_at)
+            self._torn_at = None
+
+        self.journal_seq += 1
+        record["writer"] = self.writer
+        record["seq"] = self.applied[self.writer] = self.journal_seq
+        self.persister.append(self.journal_file, (json.dumps(record) + "\n").encode("utf-8"))
+        self.journal_records += 1
+        self._unsaved = True
+
+        if self.journal_records >= self.compact_every:
+            self.compact()
+
+    def append_session(self, session):
+        """Record a finished session"""
+        self.data["sessions"].append(session)
+        self._append({"op": "session", "session": session_dict(session)})
+
+    def append_sessions(self, sessions):
+        """Record many sessions with one snapshot write instead of a journal line each"""
+        self.catch_up()
+        table = self.data["sessions"]
+        for session in sessions:
+            table.append(session)
+        self.write_compacted()
+
+    def increment(self, key, amount=1):
+        """Bump a counter such as comfort_choices or total_pomodoros"""
+        self.data[key] = self.data.get(key, 0) + amount
+        self._append({"op": "incr", "key": key, "amount": amount})
+
+    def import_data(self, data):
+        """Replace the stored data with a full data document"""
+        self.data = dict(data)
+        self.data["sessions"] = SessionTable.from_sessions(data.get("sessions", []))
+        self.write_compacted()
+
+    @staticmethod
+    @profiled
+    def write_snapshot(f, header, table):
+        """Write a data document with one session per line"""
+        f.write("{\n")
+        for key, value in header.items():
+            f.write(f"  {json.dumps(key)}: {json.dumps(value)},\n")
+        f.write('  "sessions": [')
+        separator = "\n    "
+        for row in table.json_rows():
+            f.write(separator + row)
+            separator = ",\n    "
+        f.write("\n  ]\n}\n")
+
+    def snapshot_id_on_disk(self):
+        """The id on the first header line of the snapshot file, or None"""
+        try:
+            with open(self.data_file, 'r') as f:
+                f.readline()
+                key, _, value = f.readline().strip().rstrip(",").partition(": ")
+        except FileNotFoundError:
+            return None
+        return json.loads(value) if key == '"snapshot_id"' else None
+
+    @profiled
+    def catch_up(self):
+        """Take in what other instances wrote to the file since this one read it"""
+        self.persister.flush()
+        if self.snapshot_id_on_disk() == self.snapshot_id:
+            self.replay()
+            return
+        # Another instance compacted: its snapshot and the journal hold this
+        # instance's records too. The data dict is shared with SessionStore
+        data = self.data
+        self.load()
+        data.clear()
+        data.update(self.data)
+        self.data = data
+
+    def compact(self):
+        """Catch up with other writers, then queue a fresh snapshot that replaces the journal"""
+        self.catch_up()
+        self.write_compacted()
+
+    def write_compacted(self):
+        """Queue a snapshot of the data in memory that replaces the journal"""
+        self.snapshot_id = uuid.uuid4().hex
+        header = {"snapshot_id": self.snapshot_id}
+        header.update((key, value) for key, value in self.data.items() if key != "sessions")
+        if self.applied:
+            header["journal_seq"] = dict(self.applied)
+        table = self.data["sessions"].copy()
+        # The snapshot is renamed into place before the journal goes, so a
+        # crash in between leaves records that load() skips by sequence
+        self.persister.replace(self.data_file, lambda f: self.write_snapshot(f, header, table))
+        self.persister.remove(self.journal_file)
+        self.applied = {}
+        self._torn_at = None
+        self._unsaved = False
+        self.journal_records = 0
+
+    def detach(self):
+        """Queue a compaction if this instance wrote to the journal"""
+        # Read-only users (stats, reports) never wrote and leave the files untouched
+        if self._unsaved:
+            self.compact()
+
+    def flush(self):
+        self.persister.flush()
+
+    def close(self):
+        """Compact the journal if this process wrote to it and wait for the disk"""
+        self.detach()
+        self.flush()
+
+
+class SQLiteStorage(SessionStorage):
+    """Sessions stored in an indexed SQLite table.
+
+    Only the counters are kept in ``data``; session queries run as indexed
+    range and group-by statements instead of scanning a Python list.
+    ``integral`` remembers durations that were integers, which the REAL
+    column would turn into floats, and ``extras`` holds a session's
+    ``SessionRecord.extra`` as JSON, so sessions read back as they went in.
+    """
+
+    COUNTERS = ("comfort_choices", "total_pomodoros")
+    SELECT = "SELECT activity, duration, start_time, end_time, type, integral, extras FROM sessions"
+
+    def __init__(self, data_file="productivity_data.db"):
+        self.data_file = data_file
+        self.conn = None
+        self.data = None
+
+    def connect(self):
+        """Open the database and create the schema if needed"""
+        if self.conn is None:
+            # Shared with stats worker threads; SessionStore serializes access
+            self.conn = sqlite3.connect(self.data_file, check_same_thread=False)
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id INTEGER PRIMARY KEY,
+                    activity TEXT NOT NULL,
+                    duration REAL NOT NULL,
+                    start_time TEXT NOT NULL,
+                    end_time TEXT NOT NULL,
+                    type TEXT NOT NULL DEFAULT 'manual',
+                    integral INTEGER NOT NULL DEFAULT 0,
+                    extras TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_sessions_start_time ON sessions(start_time);
+                CREATE INDEX IF NOT EXISTS idx_sessions_activity ON sessions(activity);
+                CREATE INDEX IF NOT EXISTS idx_sessions_type ON sessions(type);
+                CREATE TABLE IF NOT EXISTS counters (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+            """)
+            self.upgrade_schema()
+        return self.conn
+
+    def upgrade_schema(self):
+        """Add the columns databases created by earlier versions lack"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(sessions)")}
+        with self.conn:
+            if "integral" not in columns:
+                self.conn.execute(
+                    "ALTER TABLE sessions ADD COLUMN integral INTEGER NOT NULL DEFAULT 0")
+                # The original types are gone; whole numbers were most likely integers
+                self.conn.execute(
+                    "UPDATE sessions SET integral = (duration = CAST(duration AS INTEGER))")
+            if "extras" not in columns:
+                self.conn.execute("ALTER TABLE sessions ADD COLUMN extras TEXT")
+
+    @profiled
+    def load(self):
+        """Load the counters; sessions stay in the database"""
+        conn = self.connect()
+        self.data = {key: 0 for key in self.COUNTERS}
+        for key, value in conn.execute("SELECT key, value FROM counters"):
+            self.data[key] = value
+        return self.data
+
+    INSERT = ("INSERT INTO sessions (activity, duration, start_time, end_time, type, integral, "
+              "extras) VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+    def append_session(self, session):
+        """Insert a finished session"""
+        with self.conn:
+            self._insert(session)
+
+    def append_sessions(self, sessions):
+        """Insert many sessions in one transaction"""
+        with self.conn:
+            self.conn.executemany(self.INSERT, (self.row(session) for session in sessions))
+
+    @staticmethod
+    def row(session):
+        record = SessionRecord.from_dict(session)
+        return (record.activity, record.duration, record.start_time, record.end_time,
+                record.type, isinstance(record.duration, int),
+                json.dumps(record.extra) if record.extra else None)
+
+    def _insert(self, session):
+        self.conn.execute(self.INSERT, self.row(session))
+
+    def import_data(self, data):
+        """Replace the stored data with a full data document"""
+        with self.conn:
+            self.conn.execute("DELETE FROM sessions")
+            for session in data.get("sessions", []):
+                self._insert(session)
+            for key in self.COUNTERS:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO counters (key, value) VALUES (?, ?)",
+                    (key, data.get(key, 0))
+                )
+        self.load()
+
+    def increment(self, key, amount=1):
+        """Bump a counter such as comfort_choices or total_pomodoros"""
+        self.data[key] = self.data.get(key, 0) + amount
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO counters (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+                (key, amount)
+            )
+
+    def _rows_to_sessions(self, cursor):
+        for activity, duration, start_time, end_time, session_type, integral, extras in cursor:
+            record = SessionRecord.from_dict({
+                "activity": activity,
+                "duration": int(duration) if integral else duration,
+                "start_time": start_time,
+                "end_time": end_time,
+                "type": session_type
+            })
+            if extras is not None:
+                record.extra = json.loads(extras)
+            yield record
+
+    def sessions(self):
+        """Return every session as a list of records"""
+        return list(self.iter_sessions())
+
+    def snapshot(self):
+        """Return a SessionTable of every session"""
+        return SessionTable.from_sessions(self.iter_sessions())
+
+    def iter_sessions(self):
+        """Yield every session in insertion order"""
+        cursor = self.conn.execute(self.SELECT + " ORDER BY id")
+        return self._rows_to_sessions(cursor)
+
+    def session_count(self):
+        """Return the number of stored sessions"""
+        return self.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def query_sessions(self, first_day=None, last_day=None, activities=None):
+        """Yield sessions starting between two YYYY-MM-DD dates and in the given activities, oldest first"""
+        clauses = []
+        params = []
+        if first_day is not None:
+            clauses.append("start_time >= ?")
+            params.append(first_day)
+        if last_day is not None:
+            clauses.append("start_time < ?")
+            params.append(last_day + "\uffff")
+        if activities is not None:
+            activities = list(activities)
+            clauses.append("activity IN (%s)" % ", ".join("?" * len(activities)))
+            params.extend(activities)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        cursor = self.conn.execute(self.SELECT + where + " ORDER BY start_time, id", params)
+        return self._rows_to_sessions(cursor)
+
+    def totals(self):
+        """Return total tracked time and number of sessions"""
+        total_time, count = self.conn.execute(
+            "SELECT COALESCE(SUM(duration), 0), COUNT(*) FROM sessions").fetchone()
+        return {"total_time": total_time, "sessions": count}
+
+    def daily_totals(self, first_day, last_day):
+        """Aggregate sessions per day between two YYYY-MM-DD dates, inclusive"""
+        # start_time is ISO-8601, so a day range is a prefix range on the index
+        bounds = (first_day, last_day + "\uffff")
+        daily = {}
+        for day, activity, total, count, pomodoros in self.conn.execute(
+                "SELECT substr(start_time, 1, 10) AS day, activity, SUM(duration), "
+                "COUNT(*), SUM(type = 'pomodoro') FROM sessions "
+                "WHERE start_time >= ? AND start_time < ? "
+                "GROUP BY day, activity", bounds):
+            stats = daily.setdefault(day, {
+                "total_time": 0,
+                "sessions": 0,
+                "pomodoros": 0,
+                "activities": {}
+            })
+            stats["total_time"] += total
+            stats["sessions"] += count
+            stats["pomodoros"] += pomodoros
+            stats["activities"][activity] = total
+        return daily
+
+    def activity_totals(self):
+        """Aggregate time and session count per activity"""
+        return {
+            activity: {"time": total, "sessions": count}
+            for activity, total, count in self.conn.execute(
+                "SELECT activity, SUM(duration), COUNT(*) FROM sessions GROUP BY activity")
+        }
+
+    def type_totals(self):
+        """Aggregate time and session count per session type"""
+        return {
+            session_type: {"time": total, "sessions": count}
+            for session_type, total, count in self.conn.execute(
+                "SELECT type, SUM(duration), COUNT(*) FROM sessions GROUP BY type")
+        }
+
+    def session_page(self, offset=0, limit=50):
+        """Return ``limit`` sessions newest first, skipping the ``offset`` newest"""
+        cursor = self.conn.execute(
+            self.SELECT + " ORDER BY start_time DESC LIMIT ? OFFSET ?", (limit, offset))
+        return list(self._rows_to_sessions(cursor))
+
+    def close(self):
+        """Close the database connection"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def summarize_sessions(sessions):
+    """Return a manifest entry (bounds and totals) for a list of sessions"""
+    entry = {
+        "first": None,
+        "last": None,
+        "sessions": 0,
+        "total_time": 0,
+        "pomodoros": 0,
+        "activities": {},
+        "types": {}
+    }
+    for session in sessions:
+        add_to_summary(entry, session)
+    return entry
+
+
+def add_to_summary(entry, session):
+    """Fold one session into a manifest entry"""
+    start = session["start_time"]
+    if entry["first"] is None or start < entry["first"]:
+        entry["first"] = start
+    if entry["last"] is None or start > entry["last"]:
+        entry["last"] = start
+    entry["sessions"] += 1
+    entry["total_time"] += session["duration"]
+    session_type = session.get("type", "manual")
+    if session_type == "pomodoro":
+        entry["pomodoros"] += 1
+    for group, key in (("activities", session["activity"]), ("types", session_type)):
+        stats = entry[group].setdefault(key, {"time": 0, "sessions": 0})
+        stats["time"] += session["duration"]
+        stats["sessions"] += 1
+
+
+class PartitionedStorage(SessionStorage):
+    """Sessions sharded into one journaled JSON file per month.
+
+    A small manifest keeps each partition's start-time bounds and totals,
+    so totals and breakdowns never open a partition and range queries only
+    open the months they overlap. Only the newest partition stays in
+    memory; it is the one new sessions are appended to. The manifest can
+    always be rebuilt from the partitions; counters live in their own file.
+    """
+
+    loads_on_demand = True
+    COUNTERS = ("comfort_choices", "total_pomodoros")
+
+    def __init__(self, directory="productivity_data.parts", persister=None):
+        self.data_file = directory
+        self.persister = persister or writebehind.shared()
+        self.manifest_file = os.path.join(directory, "manifest.json")
+        self.counters_file = os.path.join(directory, "counters.json")
+        self.manifest = None
+        self.data = None
+        self.current_key = None
+        self.current = None
+
+    @staticmethod
+    def partition_key(session):
+        """Partition a session by the month it started in (YYYY-MM)"""
+        return session["start_time"][:7]
+
+    def partition_file(self, key):
+        return os.path.join(self.data_file, f"{key}.json")
+
+    @profiled
+    def load(self):
+        """Read the manifest and the newest partition"""
+        self.persister.flush()
+        os.makedirs(self.data_file, exist_ok=True)
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r') as f:
+                self.manifest = json.load(f)
+        else:
+            self.rebuild_manifest()
+
+        counters = {}
+        if os.path.exists(self.counters_file):
+            with open(self.counters_file, 'r') as f:
+                counters = json.load(f)
+        self.data = {key: counters.get(key, 0) for key in self.COUNTERS}
+
+        # The newest partition is the one a crash could have left ahead of
+        # the manifest, and it is loaded anyway, so refresh its entry
+        if self.manifest["partitions"]:
+            key = max(self.manifest["partitions"])
+            self.manifest["partitions"][key] = summarize_sessions(self.partition(key).sessions())
+        return self.data
+
+    def rebuild_manifest(self):
+        """Recompute the manifest by reading every partition file"""
+        self.manifest = {"partitions": {}}
+        for name in sorted(os.listdir(self.data_file)):
+            key, extension = os.path.splitext(name)
+            if extension == ".json" and key not in ("manifest", "counters"):
+                sessions = JournalStorage(self.partition_file(key),
+                                          persister=self.persister).load()["sessions"]
+                self.manifest["partitions"][key] = summarize_sessions(sessions)
+        self.write_manifest()
+
+    def _write_json(self, path, document):
+        """Queue an atomic replacement of a small JSON file"""
+        # Serialized now: the manifest keeps changing after this returns
+        self.persister.replace(path, json.dumps(document, indent=2))
+
+    def write_manifest(self):
+        self._write_json(self.manifest_file, self.manifest)
+
+    def partition(self, key):
+        """Return a loaded partition; only the newest one is kept resident"""
+        if key == self.current_key:
+            return self.current
+        storage = JournalStorage(self.partition_file(key), persister=self.persister)
+        storage.load()
+        if self.current_key is None or key > self.current_key:
+            if self.current is not None:
+                self.current.detach()
+            self.current_key = key
+            self.current = storage
+        return storage
+
+    def release(self, key, storage):
+        """Compact a partition that is not being kept resident"""
+        if key != self.current_key:
+            storage.detach()
+
+    def keys_between(self, first_day=None, last_day=None):
+        """Partition keys, oldest first, whose sessions may fall in the day range"""
+        keys = []
+        for key in sorted(self.manifest["partitions"]):
+            entry = self.manifest["partitions"][key]
+            if first_day is not None and entry["last"][:10] < first_day:
+                continue
+            if last_day is not None and entry["first"][:10] > last_day:
+                continue
+            keys.append(key)
+        return keys
+
+    def append_session(self, session):
+        """Append a session to its month's journal and update the manifest"""
+        key = self.partition_key(session)
+        storage = self.partition(key)
+        storage.append_session(session)
+        self.release(key, storage)
+
+        entry = self.manifest["partitions"].setdefault(key, summarize_sessions([]))
+        add_to_summary(entry, session)
+        self.write_manifest()
+
+    def append_sessions(self, sessions):
+        """Append many sessions: one write per month touched and one manifest write"""
+        rows = {}
+        for i, session in enumerate(sessions):
+            rows.setdefault(self.partition_key(session), array("I")).append(i)
+        for key in sorted(rows):
+            batch = [sessions[i] for i in rows[key]]
+            storage = self.partition(key)
+            storage.append_sessions(batch)
+            self.release(key, storage)
+            entry = self.manifest["partitions"].setdefault(key, summarize_sessions([]))
+            for session in batch:
+                add_to_summary(entry, session)
+        self.write_manifest()
+
+    def increment(self, key, amount=1):
+        """Bump a counter such as comfort_choices or total_pomodoros"""
+        self.data[key] = self.data.get(key, 0) + amount
+        self._write_json(self.counters_file, self.data)
+
+    def import_data(self, data):
+        """Replace the stored data with a full data document"""
+        by_key = {}
+        for session in data.get("sessions", []):
+            by_key.setdefault(self.partition_key(session), []).append(session)
+
+        self.current_key = self.current = None
+        self.persister.flush()
+        for name in os.listdir(self.data_file):
+            key = name.split(".")[0]
+            if key in ("manifest", "counters") or (len(key) == 7 and key[4] == "-"):
+                os.remove(os.path.join(self.data_file, name))
+
+        self._write_json(self.counters_file, {key: data.get(key, 0) for key in self.COUNTERS})
+        self.manifest = {"partitions": {}}
+        for key, sessions in by_key.items():
+            JournalStorage(self.partition_file(key),
+                           persister=self.persister).import_data({"sessions": sessions})
+            self.manifest["partitions"][key] = summarize_sessions(sessions)
+        self.write_manifest()
+        self.load()
+
+    def iter_sessions(self):
+        """Yield every session, one partition at a time"""
+        for key in self.keys_between():
+            yield from self.partition(key).sessions()
+
+    def sessions(self):
+        """Return every session as a list; reads all partitions"""
+        return list(self.iter_sessions())
+
+    def snapshot(self):
+        """Return a SessionTable of every session; reads all partitions"""
+        return SessionTable.from_sessions(self.iter_sessions())
+
+    def session_count(self):
+        """Return the number of stored sessions"""
+        return sum(entry["sessions"] for entry in self.manifest["partitions"].values())
+
+    def query_sessions(self, first_day=None, last_day=None, activities=None):
+        """Yield matching sessions, opening only the overlapping partitions"""
+        for key in self.keys_between(first_day, last_day):
+            yield from self.partition(key).query_sessions(first_day, last_day, activities)
+
+    def totals(self):
+        """Return total tracked time and number of sessions from the manifest"""
+        entries = self.manifest["partitions"].values()
+        return {
+            "total_time": sum(entry["total_time"] for entry in entries),
+            "sessions": sum(entry["sessions"] for entry in entries)
+        }
+
+    def daily_totals(self, first_day, last_day):
+        """Aggregate sessions per day, opening only the overlapping partitions"""
+        daily = {}
+        for key in self.keys_between(first_day, last_day):
+            daily.update(self.partition(key).daily_totals(first_day, last_day))
+        return daily
+
+    def _merge_totals(self, group):
+        merged = {}
+        for entry in self.manifest["partitions"].values():
+            for name, stats in entry[group].items():
+                total = merged.setdefault(name, {"time": 0, "sessions": 0})
+                total["time"] += stats["time"]
+                total["sessions"] += stats["sessions"]
+        return merged
+
+    def activity_totals(self):
+        """Aggregate time and session count per activity from the manifest"""
+        return self._merge_totals("activities")
+
+    def type_totals(self):
+        """Aggregate time and session count per session type from the manifest"""
+        return self._merge_totals("types")
+
+    def session_page(self, offset=0, limit=50):
+        """Return sessions newest first, skipping whole partitions by their manifest counts"""
+        page = []
+        for key in reversed(self.keys_between()):
+            count = self.manifest["partitions"][key]["sessions"]
+            if offset >= count:
+                offset -= count
+                continue
+            storage = self.partition(key)
+            page.extend(storage.session_page(offset, limit - len(page)))
+            self.release(key, storage)
+            offset = 0
+            if len(page) >= limit:
+                break
+        return page
+
+    def compact(self):
+        """Compact the resident partition and rewrite the manifest"""
+        if self.current is not None:
+            self.current.compact()
+        self.write_manifest()
+
+    def flush(self):
+        self.persister.flush()
+
+    def close(self):
+        """Compact the resident partition and wait for the disk"""
+        if self.current is not None:
+            self.current.detach()
+        self.flush()
+
+
+class SessionStore:
+    """In-process owner of the session data, shared by the timer and the stats.
+
+    Wraps a storage backend, serializes access to it and notifies
+    subscribers of changes, so readers never re-read the file. Listeners are
+    called with ``(event, payload, revision)`` where event is
+    ``"session_appended"`` (payload is the session),
+    ``"sessions_imported"`` (payload is how many) or
+    ``"counter_incremented"`` (payload is the counter name), and revision is
+    the number of sessions stored after the change.
+    """
+
+    def __init__(self, data_file="productivity_data.json", storage=None):
+        self.data_file = data_file
+        self.storage = storage or open_storage(data_file)
+        self.lock = threading.RLock()
+        self.listeners = []
+        with self.lock:
+            self.data = self.storage.load()
+            self.revision = self.storage.session_count()
+
+    @property
+    def loads_on_demand(self):
+        return self.storage.loads_on_demand
+
+    def subscribe(self, listener):
+        """Register a change listener"""
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        """Remove a change listener"""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def notify(self, event, payload):
+        for listener in list(self.listeners):
+            listener(event, payload, self.revision)
+
+    def append_session(self, session):
+        """Store a finished session and notify listeners"""
+        with self.lock:
+            self.storage.append_session(session)
+            self.revision += 1
+            self.notify("session_appended", session)
+
+    def append_sessions(self, sessions):
+        """Store many sessions in one batch and notify listeners once"""
+        with self.lock:
+            self.storage.append_sessions(sessions)
+            self.revision += len(sessions)
+            self.notify("sessions_imported", len(sessions))
+
+    def increment(self, key, amount=1):
+        """Bump a counter and notify listeners"""
+        with self.lock:
+            self.storage.increment(key, amount)
+            self.notify("counter_incremented", key)
+
+    def snapshot_sessions(self):
+        """Return a consistent SessionTable of all sessions and the matching revision"""
+        with self.lock:
+            return self.storage.snapshot(), self.revision
+
+    def packed_sessions(self):
+        """Return the backend's packed records, or None, and the matching revision"""
+        with self.lock:
+            return self.storage.packed(), self.revision
+
+    def iter_sessions(self):
+        """Yield every session as of the time of the call"""
+        return iter(self.snapshot_sessions()[0])
+
+    def query_sessions(self, first_day=None, last_day=None, activities=None):
+        """Return a SessionTable of sessions matching a date range and activity filter"""
+        with self.lock:
+            return SessionTable.from_sessions(
+                self.storage.query_sessions(first_day, last_day, activities))
+
+    def recent_sessions(self, limit=10):
+        """Return the most recent sessions, newest first"""
+        with self.lock:
+            return self.storage.recent_sessions(limit)
+
+    def session_page(self, offset=0, limit=50):
+        """Return one page of sessions, newest first"""
+        with self.lock:
+            return self.storage.session_page(offset, limit)
+
+    def session_count(self):
+        with self.lock:
+            return self.storage.session_count()
+
+    def totals(self):
+        with self.lock:
+            return self.storage.totals()
+
+    def daily_totals(self, first_day, last_day):
+        with self.lock:
+            return self.storage.daily_totals(first_day, last_day)
+
+    def activity_totals(self):
+        with self.lock:
+            return self.storage.activity_totals()
+
+    def type_totals(self):
+        with self.lock:
+            return self.storage.type_totals()
+
+    def compact(self):
+        """Persist a compact copy of the data"""
+        with self.lock:
+            self.storage.compact()
+
+    def flush(self):
+        """Wait until every change made so far is on disk"""
+        self.storage.flush()
+
+    def close(self):
+        """Flush and release the storage backend"""
+        with self.lock:
+            self.storage.close()
+
+
+def open_storage(data_file):
+    """Pick a storage backend from the data file extension"""
+    extension = os.path.splitext(data_file.rstrip(os.sep))[1]
+    if extension in (".db", ".sqlite", ".sqlite3"):
+        return SQLiteStorage(data_file)
+    if extension == ".parts" or os.path.isdir(data_file):
+        return PartitionedStorage(data_file)
+    if extension == ".bin":
+        # NumPy is only imported by those who use the binary format
+        from binstore import BinaryStorage
+        return BinaryStorage(data_file)
+    return JournalStorage(data_file)
+
+
+def migrate_data(source_file, target_file):
+    """Copy every session and counter from one data file to another backend"""
+    source = open_storage(source_file)
+    source.load()
+    data = {key: value for key, value in source.data.items() if key != "sessions"}
+    data["sessions"] = list(source.iter_sessions())
+    source.close()
+
+    target = open_storage(target_file)
+    target.load()
+    target.import_data(data)
+    count = target.session_count()
+    target.close()
+    return count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Migrate productivity data between storage backends "
+                    "(.json journal, .db SQLite, .parts monthly partitions, .bin packed records)")
+    parser.add_argument("source", nargs="?", default="productivity_data.json")
+    parser.add_argument("target", nargs="?", default="productivity_data.db")
+    args = parser.parse_args()
+
+    migrated = migrate_data(args.source, args.target)
+    print(f"Migrated {migrated} sessions to {args.target}")
@@ -0,0 +1,323 @@
+# team.py - Statistics across many users' data files
+#
+# Usage:
+#   python team.py alice.json bob.db carol.parts
+#   find /srv/profiles -name '*.json' | python team.py --workers 8 -
+#   python team.py --user alice.json --days 30 profiles/*.json
+#
+# Every file is opened and aggregated in a worker process; only the small
+# per-user summaries travel back and are merged into team totals.
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from rollups import SessionRollups
+from stats_manager import (METRICS, MetricSet, ProductivityStatsManager, calculate_insights,
+                           productivity_score)
+
+SUMMARY_METRICS = ("totals", "daily", "activities", "types")
+
+
+def summarize_profile(data_file, history_days):
+    """Worker: aggregate one data file into a picklable summary"""
+    if not os.path.exists(data_file):
+        return {"data_file": data_file, "error": "no such file"}
+    manager = None
+    try:
+        manager = ProductivityStatsManager(data_file)
+        metrics = manager.compute_metrics(SUMMARY_METRICS, history_days)
+        return {
+            "data_file": data_file,
+            "totals": metrics.get_totals(),
+            # Only days with sessions; the rest are implied
+            "daily": {day: stats for day, stats in metrics.get_daily_stats(history_days).items()
+                      if stats["sessions"]},
+            "activities": metrics.get_activity_breakdown(),
+            "types": metrics.get_type_breakdown(),
+            "counters": dict(metrics.data)
+        }
+    except Exception as exc:
+        # Malformed sessions can fail anywhere from loading to the getters; report them with the file
+        return {"data_file": data_file, "error": f"{type(exc).__name__}: {exc}"}
+    finally:
+        if manager is not None:
+            manager.store.close()
+
+
+def merge_totals(into, totals):
+    """Add {name: {"time", "sessions"}} totals into another such dict"""
+    for name, stats in totals.items():
+        merged = into.setdefault(name, {"time": 0, "sessions": 0})
+        merged["time"] += stats["time"]
+        merged["sessions"] += stats["sessions"]
+
+
+def merge_day(into, stats):
+    into["total_time"] += stats["total_time"]
+    into["sessions"] += stats["sessions"]
+    into["pomodoros"] += stats["pomodoros"]
+    for activity, time in stats["activities"].items():
+        into["activities"][activity] = into["activities"].get(activity, 0) + time
+
+
+class ProfileStats:
+    """Aggregates of one profile, or of a whole team, with the stats manager getters.
+
+    Daily stats cover the last ``history_days`` days; older days only
+    count towards the totals and breakdowns.
+    """
+
+    def __init__(self, name, history_days):
+        self.name = name
+        self.history_days = history_days
+        self.totals = {"total_time": 0, "sessions": 0}
+        self.by_day = {}
+        self.activities = {}
+        self.types = {}
+        self.data = {"comfort_choices": 0, "total_pomodoros": 0}
+
+    @classmethod
+    def from_summary(cls, summary, history_days):
+        profile = cls(summary["data_file"], history_days)
+        profile.add(summary)
+        return profile
+
+    def add(self, summary):
+        """Merge a worker summary into these aggregates"""
+        self.totals["total_time"] += summary["totals"]["total_time"]
+        self.totals["sessions"] += summary["totals"]["sessions"]
+        for day, stats in summary["daily"].items():
+            merge_day(self.by_day.setdefault(day, SessionRollups.empty_day()), stats)
+        merge_totals(self.activities, summary["activities"])
+        merge_totals(self.types, summary["types"])
+        for key, value in summary["counters"].items():
+            self.data[key] = self.data.get(key, 0) + value
+
+    def get_totals(self):
+        """Get total tracked time and number of sessions"""
+        return dict(self.totals)
+
+    def get_daily_stats(self, days=7):
+        """Get statistics for the last N days"""
+        if days > self.history_days:
+            raise ValueError(f"only the last {self.history_days} days were aggregated")
+        return {day: self.by_day.get(day) or SessionRollups.empty_day()
+                for day in ProductivityStatsManager.day_labels(days)}
+
+    def get_activity_breakdown(self):
+        """Get breakdown by activity type"""
+        return {activity: dict(stats) for activity, stats in self.activities.items()}
+
+    def get_type_breakdown(self):
+        """Get breakdown by session type (manual, pomodoro, break)"""
+        return {session_type: dict(stats) for session_type, stats in self.types.items()}
+
+    def get_productivity_score(self):
+        """Calculate productivity score based on various metrics"""
+        return productivity_score(self.totals, self.data.get("comfort_choices", 0),
+                                  self.data.get("total_pomodoros", 0))
+
+    def compute_metrics(self, metrics=METRICS, days=7):
+        """Return the requested metrics as a MetricSet, for charts and insights"""
+        getters = {
+            "totals": self.get_totals,
+            "daily": lambda: self.get_daily_stats(days),
+            "activities": self.get_activity_breakdown,
+            "types": self.get_type_breakdown,
+            "score": self.get_productivity_score
+        }
+        return MetricSet({name: getters[name]() for name in metrics}, days, None, dict(self.data))
+
+
+class TeamStats(ProfileStats):
+    """Merged aggregates of every profile; the score is the members' average.
+
+    Score components are capped per person, so scoring the summed totals
+    would put any team of a few people at 100.
+    """
+
+    def __init__(self, history_days):
+        super().__init__("team", history_days)
+        self.score_sum = 0
+        self.members = 0
+
+    def add_profile(self, profile):
+        self.score_sum += profile.get_productivity_score()
+        self.members += 1
+
+    def get_productivity_score(self):
+        return self.score_sum / self.members if self.members else 0
+
+
+class TeamStatsManager:
+    """Team statistics over many data files, aggregated in a process pool.
+
+    Files are handed to ``workers`` processes a few at a time, so a worker
+    holds one file in memory and the parent only the per-user summaries,
+    whose daily part is limited to ``history_days``. Summaries are merged
+    into the team totals as they arrive. The getters answer for the team;
+    ``profile(data_file)`` gives the same getters for one user. Files that
+    could not be read or aggregated, or whose worker crashed, are listed in
+    ``errors``.
+    """
+
+    def __init__(self, data_files, workers=None, history_days=365):
+        self.history_days = history_days
+        self.workers = workers or os.cpu_count() or 1
+        self.profiles = {}
+        self.errors = {}
+        self.team = TeamStats(history_days)
+        self.load(data_files)
+
+    def load(self, data_files):
+        """Aggregate the files, which may be any iterable such as paths read from stdin"""
+        data_files = self.unique(data_files)
+        pool = ProcessPoolExecutor(self.workers)
+        running = {}  # future: data file
+        try:
+            while True:
+                # Keep a bounded number of files in flight
+                for data_file in data_files:
+                    running[pool.submit(summarize_profile, data_file, self.history_days)] = data_file
+                    if len(running) >= 2 * self.workers:
+                        break
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                suspects = self.collect(done, running)
+                if suspects:
+                    # A worker died and the pool failed every file in flight with it:
+                    # gather the rest, then rerun each of them alone so only the
+                    # file that crashed is reported
+                    suspects += self.collect(wait(running)[0], running)
+                    pool.shutdown()
+                    for data_file in suspects:
+                        self.add_summary(self.summarize_alone(data_file))
+                    pool = ProcessPoolExecutor(self.workers)
+        finally:
+            pool.shutdown()
+
+    @staticmethod
+    def unique(data_files):
+        """Skip paths naming a file already given, e.g. one listed both in argv and on stdin"""
+        seen = set()
+        for data_file in data_files:
+            path = os.path.realpath(data_file)
+            if path not in seen:
+                seen.add(path)
+                yield data_file
+
+    def collect(self, done, running):
+        """Add the summaries of finished futures; return the files of those a crash took down"""
+        suspects = []
+        for future in done:
+            data_file = running.pop(future)
+            try:
+                summary = future.result()
+            except BrokenProcessPool:
+                suspects.append(data_file)
+                continue
+            except Exception as exc:
+                summary = {"data_file": data_file, "error": f"{type(exc).__name__}: {exc}"}
+            self.add_summary(summary)
+        return suspects
+
+    def summarize_alone(self, data_file):
+        """Summarize one file in a worker process of its own"""
+        with ProcessPoolExecutor(1) as pool:
+            try:
+                return pool.submit(summarize_profile, data_file, self.history_days).result()
+            except BrokenProcessPool:
+                return {"data_file": data_file, "error": "worker crashed"}
+            except Exception as exc:
+                return {"data_file": data_file, "error": f"{type(exc).__name__}: {exc}"}
+
+    def add_summary(self, summary):
+        if "error" in summary:
+            self.errors[summary["data_file"]] = summary["error"]
+            return
+        profile = ProfileStats.from_summary(summary, self.history_days)
+        self.profiles[profile.name] = profile
+        self.team.add(summary)
+        self.team.add_profile(profile)
+
+    def profile(self, data_file):
+        """Drill down into one user's statistics"""
+        return self.profiles[data_file]
+
+    def get_totals(self):
+        return self.team.get_totals()
+
+    def get_daily_stats(self, days=7):
+        return self.team.get_daily_stats(days)
+
+    def get_activity_breakdown(self):
+        return self.team.get_activity_breakdown()
+
+    def get_type_breakdown(self):
+        return self.team.get_type_breakdown()
+
+    def get_productivity_score(self):
+        return self.team.get_productivity_score()
+
+    def compute_metrics(self, metrics=METRICS, days=7):
+        return self.team.compute_metrics(metrics, days)
+
+    @property
+    def data(self):
+        return self.team.data
+
+    def leaderboard(self):
+        """Per-user totals and scores, most tracked time first"""
+        rows = [{"data_file": name, "score": profile.get_productivity_score(), **profile.get_totals()}
+                for name, profile in self.profiles.items()]
+        return sorted(rows, key=lambda row: row["total_time"], reverse=True)
+
+
+def main(argv=None):
+    from report import iter_data_files
+
+    parser = argparse.ArgumentParser(description="Team statistics across many data files")
+    parser.add_argument("data_files", nargs="+",
+                        help="data files (.json, .db, .parts or .bin); '-' reads paths from stdin")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--days", type=int, default=7, help="days of daily stats (default 7)")
+    parser.add_argument("--history", type=int, default=365,
+                        help="days of daily stats kept per user (default 365)")
+    parser.add_argument("--user", help="report on this data file instead of the team")
+    args = parser.parse_args(argv)
+    if args.days > args.history:
+        parser.error("--days cannot exceed --history")
+
+    team = TeamStatsManager(iter_data_files(args.data_files), args.workers, args.history)
+    for data_file, error in team.errors.items():
+        print(f"{data_file}: {error}", file=sys.stderr)
+
+    if args.user:
+        if args.user not in team.profiles:
+            parser.error(f"{args.user} was not aggregated")
+        stats = team.profile(args.user)
+    else:
+        stats = team
+    metrics = stats.compute_metrics(METRICS, args.days)
+    report = {
+        "profiles": len(team.profiles),
+        "totals": metrics.get_totals(),
+        "productivity_score": metrics.get_productivity_score(),
+        "daily_stats": metrics.get_daily_stats(args.days),
+        "activity_breakdown": metrics.get_activity_breakdown(),
+        "type_breakdown": metrics.get_type_breakdown(),
+        "insights": calculate_insights(metrics)
+    }
+    if not args.user:
+        report["leaderboard"] = team.leaderboard()
+    json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+    sys.stdout.write("\n")
+    return 1 if team.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+import json
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [REPO_DIR, os.path.join(REPO_DIR, "benchmarks")]
+
+from synthetic import generate_sessions
+
+# Sessions the typed records cannot hold as-is
+ODD_SESSIONS = [
+    {"activity": "Work", "duration": 60, "start_time": "2024-05-01T10:00:00+02:00",
+     "end_time": "2024-05-01T10:01:00+02:00", "type": "manual", "note": "offset"},
+    {"activity": "Ünïcode", "duration": 12.5, "start_time": "2024-05-01T11:00:00",
+     "end_time": "2024-05-01T11:00:12.500000"},
+    {"activity": "Work", "duration": 90.0, "start_time": "2024-05-02T09:00:00",
+     "end_time": "2024-05-02T09:01:30", "type": "pomodoro", "tags": ["a", "b"]}
+]
+
+
+@pytest.fixture
+def document():
+    """A data document with a few hundred sessions, some of them odd"""
+    return {
+        "sessions": generate_sessions(400, seed=7, years=1) + [dict(s) for s in ODD_SESSIONS],
+        "comfort_choices": 3,
+        "total_pomodoros": 12
+    }
+
+
+@pytest.fixture
+def data_file(tmp_path, document):
+    path = tmp_path / "productivity_data.json"
+    path.write_text(json.dumps(document))
+    return str(path)
@@ -0,0 +1,21 @@
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import charts
+from stats_manager import ProductivityStatsManager
+from timeseries import VIEWS
+
+
+def test_dashboard_redraws_only_changed_panels(data_file):
+    manager = ProductivityStatsManager(data_file)
+    cache = charts.DashboardCache(VIEWS["7d"])
+    try:
+        assert cache.update(manager) == list(cache.PANELS)
+        assert cache.update(manager) == []
+        manager.store.increment("comfort_choices", 50)
+        # More comfort choices lower the score; the gauge is redrawn, the dates stay
+        assert cache.update(manager) == ["score"]
+        cache.set_days(VIEWS["30d"])
+        assert "trend" in cache.update(manager)
+        FigureCanvasAgg(cache.fig).draw()
+    finally:
+        manager.store.close()
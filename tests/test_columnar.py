@@ -0,0 +1,53 @@
+import numpy as np
+
+from columnar import SessionColumns, parse_timestamps
+from stats_manager import ProductivityStatsManager
+from storage import migrate_data
+
+
+def test_parse_timestamps_keeps_wall_clock_time():
+    seconds = parse_timestamps(["2024-01-01T09:00:00+02:00", "2024-01-01T09:00:00",
+                                "2024-01-01T09:00:00Z", "2024-01-01T09:00:00.500000-0530"])
+    assert seconds.tolist() == [1704099600] * 4
+
+
+def test_columns_from_sessions_with_mixed_offsets(document):
+    columns = SessionColumns.from_sessions(document["sessions"])
+    assert columns.size == len(document["sessions"])
+    assert parse_timestamps(["2024-05-01T10:00:00"])[0] in columns.view("start")
+
+
+def heatmap_session(start, end, duration, type="manual"):
+    return {"activity": "A", "duration": duration, "start_time": start, "end_time": end, "type": type}
+
+
+def test_focus_heatmap_spreads_sessions_over_clock_hours():
+    # 2024-01-01 was a Monday
+    heatmap = SessionColumns.from_sessions([
+        heatmap_session("2024-01-01T09:40:00", "2024-01-01T10:20:00", 2400),
+        heatmap_session("2024-01-02T23:30:00", "2024-01-03T00:30:00", 3600, "pomodoro"),
+        heatmap_session("2024-01-07T12:00:00", "2024-01-07T12:30:00", 1800, "break"),
+        heatmap_session("2024-01-07T13:00:00", "2024-01-07T13:00:00", 0, "pomodoro")
+    ]).focus_heatmap()
+
+    minutes = np.zeros((7, 24))
+    minutes[0, 9] = minutes[0, 10] = 20
+    minutes[1, 23] = minutes[2, 0] = 30
+    pomodoros = np.zeros((7, 24), dtype=int)
+    pomodoros[1, 23] = pomodoros[6, 13] = 1
+    assert np.allclose(heatmap["minutes"], minutes)
+    assert np.array_equal(heatmap["pomodoros"], pomodoros)
+
+
+def test_focus_heatmap_is_the_same_on_every_backend(tmp_path, data_file, document):
+    expected = SessionColumns.from_sessions(document["sessions"]).focus_heatmap()
+    for extension in (".json", ".db", ".bin"):
+        target = str(tmp_path / ("copy" + extension))
+        migrate_data(data_file, target)
+        manager = ProductivityStatsManager(target)
+        try:
+            heatmap = manager.get_focus_heatmap()
+        finally:
+            manager.store.close()
+        assert np.allclose(heatmap["minutes"], expected["minutes"])
+        assert np.array_equal(heatmap["pomodoros"], expected["pomodoros"])
@@ -0,0 +1,57 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+
+from daemon import DaemonClient, DaemonError, IngestionDaemon, RemoteStore
+from storage import SessionStore
+
+
+@pytest.fixture
+def daemon_address(tmp_path, data_file):
+    """A daemon serving the data file on a Unix socket, run on its own thread"""
+    address = str(tmp_path / "daemon.sock")
+    daemon = IngestionDaemon(SessionStore(data_file))
+    started = threading.Event()
+    loops = []
+
+    async def run():
+        loops.append(asyncio.get_running_loop())
+        await daemon.start(address)
+        started.set()
+        await daemon.stopping.wait()
+        await daemon.stop()
+
+    thread = threading.Thread(target=asyncio.run, args=(run(),))
+    thread.start()
+    started.wait(5)
+    yield address
+    loops[0].call_soon_threadsafe(daemon.stopping.set)
+    thread.join(5)
+
+
+def test_increment_only_touches_counters(daemon_address):
+    store = RemoteStore(daemon_address)
+    try:
+        store.increment("comfort_choices")
+        assert store.data["comfort_choices"] == 4
+        for key in ("snapshot_id", "journal_seq", "sessions", ["comfort_choices"]):
+            with pytest.raises(DaemonError, match="key must be one of"):
+                store.increment(key)
+    finally:
+        store.close()
+
+
+def test_request_timeout_is_a_daemon_error(tmp_path):
+    address = str(tmp_path / "silent.sock")
+    silent = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    silent.bind(address)
+    silent.listen()
+    client = DaemonClient(address, timeout=0.1)
+    try:
+        with pytest.raises(DaemonError, match="did not answer"):
+            client.request("status")
+    finally:
+        client.close()
+        silent.close()
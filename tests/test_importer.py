@@ -0,0 +1,108 @@
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from export import SessionExporter
+from importer import DedupIndex, SessionImporter, normalize
+from storage import SessionStore
+
+
+def test_normalize_derives_missing_fields():
+    record = normalize({"activity": " Work ", "start_time": "2024-01-01T09:00:00", "duration": "25"}, 60)
+    assert record.to_dict() == {"activity": "Work", "duration": 1500, "start_time": "2024-01-01T09:00:00",
+                                "end_time": "2024-01-01T09:25:00", "type": "manual"}
+
+    record = normalize({"activity": "Read", "start_time": "2024-01-01T09:00:00",
+                        "end_time": "2024-01-01T09:00:30", "type": "Pomodoro"})
+    assert record.duration == 30 and record.type == "pomodoro"
+
+
+def test_normalize_takes_rounded_minutes_as_the_clock_span():
+    # Exported minutes have two decimals; 0.33 minutes of a 20 s session is not 19.8 s
+    record = normalize({"activity": "A", "start_time": "2024-01-01T09:00:00",
+                        "end_time": "2024-01-01T09:00:20", "duration": "0.33"}, 60)
+    assert record.duration == 20
+
+
+@pytest.mark.parametrize("row, message", [
+    ({"activity": "A"}, "missing start time"),
+    ({"start_time": "2024-01-01T09:00:00", "duration": 1}, "missing activity"),
+    ({"activity": "A", "start_time": "yesterday", "duration": 1}, "invalid timestamp"),
+    ({"activity": "A", "start_time": "2024-01-01T09:00:00", "duration": "-3"}, "invalid duration"),
+    ({"activity": "A", "start_time": "2024-01-01T09:00:00"}, "missing end time and duration"),
+    ({"activity": "A", "start_time": "2024-01-01T09:00:00", "end_time": "2024-01-01T08:00:00"},
+     "ends before it starts"),
+    (["not", "a", "dict"], "not a session object")
+])
+def test_normalize_rejects_invalid_rows(row, message):
+    with pytest.raises(ValueError, match=message):
+        normalize(row)
+
+
+def test_dedup_index_matches_a_set():
+    rng = np.random.default_rng(3)
+    values = rng.integers(0, 2 ** 63, 5000, dtype=np.uint64)
+    index = DedupIndex(values[:1000])
+    seen = set(values[:1000].tolist())
+    chunks = np.concatenate([values, values[2000:3000]])
+    for start in range(0, len(chunks), 700):
+        chunk = chunks[start:start + 700]
+        expected = []
+        for value in chunk.tolist():
+            expected.append(value not in seen)
+            seen.add(value)
+        assert index.add(chunk).tolist() == expected
+        if start % 2100 == 0:
+            index.merge()
+    index.merge()
+    assert len(index) == len(seen)
+    assert index.hashes.tolist() == sorted(seen)
+
+
+def test_import_skips_duplicates_and_reports_bad_rows(tmp_path, data_file, document):
+    csv_file = tmp_path / "export.csv"
+    store = SessionStore(data_file)
+    SessionExporter().export(str(csv_file), store.query_sessions(), "csv")
+
+    # Re-importing an export finds every session
+    result = SessionImporter(chunk_size=64).import_files(store, [str(csv_file)])
+    assert (result.imported, result.duplicates, result.rejected) == (0, len(document["sessions"]), 0)
+
+    jsonl_file = tmp_path / "more.jsonl"
+    new = {"activity": "New", "start_time": "2031-01-01T09:00:00", "duration": 60}
+    jsonl_file.write_text("\n".join([json.dumps(new), "{broken", json.dumps(new),
+                                     json.dumps({"activity": "New"})]) + "\n")
+    result = SessionImporter().import_files(store, [str(jsonl_file)])
+    assert (result.read, result.imported, result.duplicates, result.rejected) == (4, 1, 1, 2)
+    assert [error[0] for error in result.errors] == [f"{jsonl_file}:2", f"{jsonl_file}:4"]
+    store.close()
+
+    store = SessionStore(data_file)
+    assert store.session_count() == len(document["sessions"]) + 1
+    assert store.session_page(0, 1)[0].to_dict() == {
+        "activity": "New", "duration": 60, "start_time": "2031-01-01T09:00:00",
+        "end_time": "2031-01-01T09:01:00", "type": "manual"}
+    store.close()
+
+
+def test_progress_counts_bytes(tmp_path, data_file):
+    # Three bytes per character, so a count of characters would lag far behind
+    path = tmp_path / "unicode.jsonl"
+    start = datetime(2031, 1, 1)
+    rows = [{"activity": "✓" * 40, "start_time": (start + timedelta(minutes=i)).isoformat(),
+             "duration": 30} for i in range(4000)]
+    path.write_text("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows), encoding="utf-8")
+    reports = []
+    importer = SessionImporter(chunk_size=100, progress=lambda done, total: reports.append((done, total)))
+    store = SessionStore(data_file)
+    importer.import_files(store, [str(path)])
+    store.close()
+
+    total = path.stat().st_size
+    assert all(reported_total == total for _, reported_total in reports)
+    done = [reported for reported, _ in reports]
+    assert done == sorted(done) and done[-1] == total
+    # Halfway through the rows is about halfway through the bytes
+    assert abs(done[len(done) // 2] / total - 0.5) < 0.05
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A fresh interpreter, so no other test has imported the analytics stack
+WARN_WITHOUT_ANALYTICS = """
+import sys
+import main
+
+assert "productivity_stats" not in sys.modules
+
+class Activity:
+    def get(self):
+        return ""
+
+warnings = []
+main.messagebox.showwarning = lambda *args, **kwargs: warnings.append(args)
+timer = main.ProductivityTimer.__new__(main.ProductivityTimer)
+timer.activity_var = Activity()
+timer.start_timer()
+timer.start_pomodoro()
+assert "productivity_stats" not in sys.modules
+assert len(warnings) == 2, warnings
+"""
+
+
+def test_warns_without_the_analytics_stack():
+    result = subprocess.run([sys.executable, "-c", WARN_WITHOUT_ANALYTICS], cwd=REPO_DIR,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
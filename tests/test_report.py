@@ -0,0 +1,37 @@
+import json
+import os
+
+import report
+
+
+def test_same_named_files_get_their_own_reports(tmp_path, data_file):
+    for directory in ("a", "b"):
+        os.makedirs(tmp_path / directory)
+        with open(data_file) as source, open(tmp_path / directory / "alice.json", 'w') as copy:
+            copy.write(source.read())
+    output = tmp_path / "reports"
+    assert report.main([str(tmp_path / "a" / "alice.json"), str(tmp_path / "b" / "alice.json"),
+                        "--output", str(output)]) == 0
+
+    assert sorted(os.listdir(output)) == ["alice_json.json", "alice_json_2.json"]
+    with open(output / "alice_json_2.json") as f:
+        assert json.load(f)["data_file"] == str(tmp_path / "b" / "alice.json")
+
+
+def test_a_failing_file_does_not_stop_the_batch(tmp_path, data_file, monkeypatch, capsys):
+    build_report = report.build_report
+
+    def failing(manager, days=7):
+        if manager.data_file == data_file:
+            raise KeyError("broken")
+        return build_report(manager, days)
+
+    other = str(tmp_path / "other.json")
+    with open(data_file) as source, open(other, 'w') as copy:
+        copy.write(source.read())
+    monkeypatch.setattr(report, "build_report", failing)
+    output = tmp_path / "reports"
+    assert report.main([data_file, other, "--output", str(output)]) == 1
+
+    assert os.listdir(output) == ["other_json.json"]
+    assert f"{data_file}: KeyError: 'broken'" in capsys.readouterr().err
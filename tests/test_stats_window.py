@@ -0,0 +1,113 @@
+import queue
+import threading
+import time
+
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import charts
+from productivity_stats import ProductivityStatsWindow
+from stats_manager import ProductivityStatsManager
+from timeseries import VIEWS
+
+
+class Toplevel:
+    """Just enough of a Tk window for the worker protocol; callbacks run when pumped"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, delay, callback):
+        self.callbacks.append(callback)
+
+    def winfo_exists(self):
+        return True
+
+    def report_callback_exception(self, kind, value, traceback):
+        raise value
+
+    def pump(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+@pytest.fixture
+def window(data_file):
+    """A statistics window past its first load, with the Tk widgets left out"""
+    window = ProductivityStatsWindow.__new__(ProductivityStatsWindow)
+    window.stats_manager = ProductivityStatsManager(data_file)
+    window.chart_cache = charts.DashboardCache(VIEWS["7d"])
+    window.window = Toplevel()
+    window.results = queue.Queue()
+    window.polling = False
+    window.pending_tabs = {}
+    window.metrics_requests = queue.Queue()
+    window.metrics_busy = False
+    window.metrics_stale = False
+    window.insights = None
+    window.shown_insights = []
+    window.show_insights = window.shown_insights.append
+    window.compute_stats()
+    window.results = queue.Queue()
+    window.canvas = FigureCanvasAgg(window.chart_cache.fig)
+    worker = threading.Thread(target=window.serve_metrics)
+    worker.start()
+    yield window
+    window.metrics_requests.put(None)
+    worker.join(5)
+    window.stats_manager.store.close()
+
+
+def settle(window):
+    """Run the Tk side until no request is with the worker"""
+    deadline = time.monotonic() + 5
+    while window.metrics_busy and time.monotonic() < deadline:
+        time.sleep(0.01)
+        window.window.pump()
+    assert not window.metrics_busy
+
+
+def test_store_changes_are_computed_off_the_tk_thread(window, monkeypatch):
+    threads = []
+    compute_metrics = window.stats_manager.compute_metrics
+
+    def recording(*args):
+        threads.append(threading.get_ident())
+        return compute_metrics(*args)
+
+    monkeypatch.setattr(window.stats_manager, "compute_metrics", recording)
+    store = window.stats_manager.store
+    for minute in range(3):
+        store.append_session({"activity": "New", "duration": 60, "type": "manual",
+                              "start_time": f"2030-01-01T10:0{minute}:00",
+                              "end_time": f"2030-01-01T10:0{minute}:01"})
+        window.on_store_change("session_appended", None, store.revision)
+    settle(window)
+
+    # One request for the first change, one follow-up for the two that came meanwhile
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
+    assert window.chart_cache.version[0] == store.revision
+
+
+def test_switching_views_shows_the_last_one_chosen(window, monkeypatch):
+    threads = []
+    compute_metrics = window.stats_manager.compute_metrics
+
+    def recording(metrics, days):
+        threads.append((threading.get_ident(), days.name))
+        return compute_metrics(metrics, days)
+
+    monkeypatch.setattr(window.stats_manager, "compute_metrics", recording)
+    window.show_view(VIEWS["365d"])
+    window.show_view(VIEWS["30d"])
+    window.show_view(VIEWS["all"])
+    settle(window)
+
+    # The 30-day view was superseded before it was ever sent
+    assert [name for _, name in threads] == ["365d", "all"]
+    assert threading.get_ident() not in [thread for thread, _ in threads]
+    assert window.chart_cache.days is VIEWS["all"]
+    expected = window.calculate_insights(compute_metrics(window.VIEW_METRICS, VIEWS["all"]))
+    assert window.shown_insights == [expected]
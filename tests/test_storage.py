@@ -0,0 +1,229 @@
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+import writebehind
+from binstore import HEADER, RECORD, BinaryStorage
+from records import SessionRecord
+from stats_manager import ProductivityStatsManager
+from storage import JournalStorage, SessionStore, migrate_data
+
+BACKENDS = [".json", ".db", ".parts", ".bin"]
+
+
+def rounded(value):
+    """Round the floats of nested stats so sums taken in another order compare equal"""
+    if isinstance(value, dict):
+        return {key: rounded(item) for key, item in value.items()}
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+def stored_sessions(path):
+    store = SessionStore(path)
+    try:
+        return [session.to_dict() for session in store.iter_sessions()], dict(store.data)
+    finally:
+        store.close()
+
+
+def session(minute, **fields):
+    return dict({"activity": "Test", "duration": 60, "start_time": f"2030-01-01T10:{minute:02d}:00",
+                 "end_time": f"2030-01-01T10:{minute:02d}:30", "type": "manual"}, **fields)
+
+
+def test_journal_replays_after_crash(data_file, document):
+    store = JournalStorage(data_file)
+    store.load()
+    store.append_session(session(1))
+    store.increment("total_pomodoros", 2)
+    # No close: the snapshot is never rewritten, only the journal reaches the disk
+    store.flush()
+
+    sessions, data = stored_sessions(data_file)
+    assert sessions[-1] == session(1)
+    assert len(sessions) == len(document["sessions"]) + 1
+    assert data["total_pomodoros"] == 14
+
+
+def test_journal_skips_records_already_in_the_snapshot(data_file, document):
+    store = JournalStorage(data_file)
+    store.load()
+    store.append_session(session(1))
+    store.flush()
+    with open(store.journal_file, 'rb') as f:
+        journal = f.read()
+    store.close()
+    # A crash between the snapshot rename and the journal removal
+    with open(store.journal_file, 'wb') as f:
+        f.write(journal)
+
+    sessions, _ = stored_sessions(data_file)
+    assert len(sessions) == len(document["sessions"]) + 1
+
+
+def test_journal_drops_torn_last_line(data_file, document):
+    store = JournalStorage(data_file)
+    store.load()
+    store.append_session(session(1))
+    store.flush()
+    with open(store.journal_file, 'ab') as f:
+        f.write(b'{"op": "session", "ses')
+
+    reopened = JournalStorage(data_file)
+    reopened.load()
+    reopened.append_session(session(2))
+    reopened.flush()
+    sessions, _ = stored_sessions(data_file)
+    assert sessions[-2:] == [session(1), session(2)]
+    assert len(sessions) == len(document["sessions"]) + 2
+
+
+@pytest.mark.parametrize("extension", BACKENDS)
+def test_round_trip(tmp_path, data_file, document, extension):
+    target = str(tmp_path / ("copy" + extension))
+    back = str(tmp_path / "back.json")
+    assert migrate_data(data_file, target) == len(document["sessions"])
+    assert migrate_data(target, back) == len(document["sessions"])
+
+    sessions, data = stored_sessions(back)
+    if extension == ".parts":
+        # Partitions hand sessions back month by month
+        order = lambda s: json.dumps(s, sort_keys=True)
+        assert sorted(sessions, key=order) == sorted(document["sessions"], key=order)
+    else:
+        # As text, so a duration of 60 coming back as 60.0 fails too
+        assert json.dumps(sessions) == json.dumps(document["sessions"])
+    assert data["comfort_choices"] == 3 and data["total_pomodoros"] == 12
+
+
+@pytest.mark.parametrize("extension", BACKENDS[1:])
+def test_backends_answer_like_json(tmp_path, data_file, extension):
+    target = str(tmp_path / ("copy" + extension))
+    migrate_data(data_file, target)
+    expected = ProductivityStatsManager(data_file)
+    actual = ProductivityStatsManager(target)
+    try:
+        for days in (7, 30, 365):
+            assert rounded(actual.get_daily_stats(days)) == rounded(expected.get_daily_stats(days))
+        assert rounded(actual.get_activity_breakdown()) == rounded(expected.get_activity_breakdown())
+        assert rounded(actual.get_type_breakdown()) == rounded(expected.get_type_breakdown())
+        assert rounded(actual.get_totals()) == rounded(expected.get_totals())
+    finally:
+        expected.store.close()
+        actual.store.close()
+
+
+@pytest.mark.parametrize("extension", BACKENDS)
+def test_appends_survive_reopen(tmp_path, data_file, document, extension):
+    target = str(tmp_path / ("copy" + extension))
+    migrate_data(data_file, target)
+    store = SessionStore(target)
+    store.append_session(session(1))
+    store.append_sessions([session(2), session(3, note="x")])
+    store.increment("comfort_choices")
+    assert store.session_count() == len(document["sessions"]) + 3
+    store.close()
+
+    sessions, data = stored_sessions(target)
+    assert sessions[-3:] == [session(1), session(2), session(3, note="x")]
+    assert data["comfort_choices"] == 4
+
+
+def test_sqlite_upgrades_old_schema(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE sessions (id INTEGER PRIMARY KEY, activity TEXT NOT NULL, duration REAL NOT NULL,
+                               start_time TEXT NOT NULL, end_time TEXT NOT NULL,
+                               type TEXT NOT NULL DEFAULT 'manual');
+        INSERT INTO sessions (activity, duration, start_time, end_time, type)
+        VALUES ('A', 60, '2024-01-01T09:00:00', '2024-01-01T09:01:00', 'manual'),
+               ('A', 1.5, '2024-01-01T10:00:00', '2024-01-01T10:00:01.500000', 'manual');
+    """)
+    conn.commit()
+    conn.close()
+
+    sessions, _ = stored_sessions(path)
+    assert [s["duration"] for s in sessions] == [60, 1.5]
+    assert isinstance(sessions[0]["duration"], int)
+
+
+def test_missing_type_is_not_written_back():
+    record = SessionRecord.from_dict({"activity": "A", "duration": 1, "start_time": "2024-01-01T00:00:00",
+                                      "end_time": "2024-01-01T00:00:01"})
+    assert record.type == "manual"
+    assert "type" not in record
+    assert "type" not in record.to_dict()
+
+
+def test_journal_keeps_sessions_of_every_writer(data_file, document):
+    first, second = SessionStore(data_file), SessionStore(data_file)
+    first.append_session(session(1))
+    second.append_session(session(2))
+    first.close()
+    second.append_session(session(3))
+    second.close()
+
+    sessions, _ = stored_sessions(data_file)
+    assert len(sessions) == len(document["sessions"]) + 3
+    assert {s["start_time"] for s in sessions[-3:]} == {session(m)["start_time"] for m in (1, 2, 3)}
+
+
+def test_binary_store_drops_torn_record(tmp_path, data_file, document):
+    path = str(tmp_path / "copy.bin")
+    migrate_data(data_file, path)
+    with open(path, 'ab') as f:
+        f.write(b"\x01" * (RECORD.itemsize // 2))
+
+    store = SessionStore(path)
+    assert store.session_count() == len(document["sessions"])
+    store.append_session(session(1, note="after"))
+    store.close()
+
+    sessions, _ = stored_sessions(path)
+    assert sessions[-1] == session(1, note="after")
+    with open(path, 'rb') as f:
+        assert (len(f.read()) - len(HEADER)) % RECORD.itemsize == 0
+
+
+def test_binary_store_reads_queued_records_without_waiting(tmp_path):
+    persister = writebehind.WriteBehind(delay=10)
+    store = BinaryStorage(str(tmp_path / "queued.bin"), persister=persister)
+    store.load()
+    store.append_session(session(1))
+    store.append_session(session(2, note="x"))
+    # The writer thread is still waiting out its delay
+    assert persister.completed < persister.submitted
+    assert len(store.records()) == 2
+    assert [s.to_dict() for s in store.session_page(0, 2)] == [session(2, note="x"), session(1)]
+    assert store.totals() == {"total_time": 120.0, "sessions": 2}
+    persister.close()
+
+    reopened = BinaryStorage(str(tmp_path / "queued.bin"))
+    reopened.load()
+    assert [s.to_dict() for s in reopened.iter_sessions()] == [session(1), session(2, note="x")]
+    assert np.array_equal(reopened.records(), store.records())
+
+
+def test_binary_store_reads_after_appends_share_one_buffer(tmp_path, data_file):
+    path = str(tmp_path / "copy.bin")
+    migrate_data(data_file, path)
+    store = SessionStore(path)
+    store.append_session(session(1))
+    first = store.storage.records()
+    store.append_session(session(2))
+    second = store.storage.records()
+    # No copy of the older records per read
+    assert np.shares_memory(first, second)
+    assert np.array_equal(second[:len(first)], first)
+    assert not second.flags.writeable
+    store.flush()
+    assert len(store.storage.records()) == len(second)
+    store.close()
+
+    sessions, _ = stored_sessions(path)
+    assert sessions[-2:] == [session(1), session(2)]
@@ -0,0 +1,19 @@
+import os
+
+from stats_manager import ProductivityStatsManager
+from team import TeamStatsManager
+
+
+def test_a_file_given_twice_counts_once(tmp_path, data_file, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    team = TeamStatsManager([data_file, os.path.basename(data_file), data_file], workers=1)
+    manager = ProductivityStatsManager(data_file)
+    try:
+        expected = manager.get_totals()
+    finally:
+        manager.store.close()
+
+    assert list(team.profiles) == [data_file]
+    assert team.get_totals()["sessions"] == expected["sessions"]
+    assert team.get_totals()["total_time"] == expected["total_time"]
+    assert team.leaderboard()[0]["total_time"] == team.get_totals()["total_time"]
@@ -0,0 +1,78 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from columnar import SessionColumns
+from timeseries import VIEWS, TimeSeries, view_window
+
+TODAY = date(2030, 1, 1)
+
+
+def wall_clock(timestamp):
+    return datetime.fromisoformat(timestamp).replace(tzinfo=None)
+
+
+def naive_totals(sessions, start, end):
+    """Totals of the sessions starting in [start, end), one session at a time"""
+    totals = {"total_time": 0.0, "sessions": 0}
+    activities = {}
+    for s in sessions:
+        moment = wall_clock(s["start_time"])
+        if (start is None or moment >= start) and (end is None or moment < end):
+            totals["total_time"] += s["duration"]
+            totals["sessions"] += 1
+            entry = activities.setdefault(s["activity"], {"time": 0.0, "sessions": 0})
+            entry["time"] += s["duration"]
+            entry["sessions"] += 1
+    return totals, activities
+
+
+def test_view_windows_end_at_midnight():
+    assert view_window(VIEWS["7d"], TODAY) == (datetime(2029, 12, 25), datetime(2030, 1, 1))
+    assert view_window(VIEWS["365d"], TODAY) == (datetime(2029, 1, 1), datetime(2030, 1, 1))
+    assert view_window(VIEWS["all"], TODAY) == (None, None)
+
+
+@pytest.mark.parametrize("view", list(VIEWS))
+def test_view_totals_match_a_plain_filter(document, view):
+    sessions = document["sessions"]
+    series = TimeSeries(SessionColumns.from_sessions(sessions))
+    today = max(wall_clock(s["start_time"]) for s in sessions).date()
+    start, end = view_window(VIEWS[view], today)
+
+    totals, activities = naive_totals(sessions, start, end)
+    assert series.totals(start, end) == pytest.approx(totals)
+    actual = series.activity_totals(start, end)
+    assert actual.keys() == activities.keys()
+    for name, entry in activities.items():
+        assert actual[name] == pytest.approx(entry)
+
+    buckets = series.series(VIEWS[view].granularity, start, end)
+    assert sum(b["sessions"] for b in buckets.values()) == totals["sessions"]
+    assert sum(b["total_time"] for b in buckets.values()) == pytest.approx(totals["total_time"])
+
+
+def test_many_activities_over_a_long_span_stay_small():
+    # Thousands of free-text activities and one row from 1970, as an import can bring
+    sessions = [{"activity": f"task {i % 3000}", "duration": 60 + i % 7, "type": "manual",
+                 "start_time": (datetime(2020, 1, 1) + timedelta(hours=7 * i)).isoformat(),
+                 "end_time": (datetime(2020, 1, 1) + timedelta(hours=7 * i, minutes=1)).isoformat()}
+                for i in range(20000)]
+    sessions.append({"activity": "task 0", "duration": 60, "type": "manual",
+                     "start_time": "1970-01-02T00:00:00", "end_time": "1970-01-02T00:01:00"})
+    series = TimeSeries(SessionColumns.from_sessions(sessions))
+
+    arrays = [value for value in vars(series).values() if isinstance(value, np.ndarray)]
+    arrays += [array for index in (series.activity_index, series.type_index) for array in index]
+    assert sum(array.nbytes for array in arrays) < 64 * len(sessions)
+
+    start, end = datetime(2021, 3, 1), datetime(2021, 4, 1)
+    totals, activities = naive_totals(sessions, start, end)
+    assert series.totals(start, end) == pytest.approx(totals)
+    assert series.activity_totals(start, end) == {name: pytest.approx(entry)
+                                                  for name, entry in activities.items()}
+    assert series.activity_totals()["task 0"]["sessions"] == 8
+    months = series.series("month")
+    assert next(iter(months)) == "1970-01"
+    assert sum(month["sessions"] for month in months.values()) == len(sessions)
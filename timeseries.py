@@ -0,0 +1,198 @@
+# timeseries.py - Cumulative per-hour sums for range and bucketed queries
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from columnar import SECONDS_PER_HOUR, parse_timestamps
+
+HOURS_PER_DAY = 24
+GRANULARITIES = ("hour", "day", "week", "month")
+EPOCH = datetime(1970, 1, 1)
+
+# A dashboard window: the last ``days`` days (None for all time), bucketed by ``granularity``
+View = namedtuple("View", "name days granularity")
+
+VIEWS = {view.name: view for view in (
+    View("7d", 7, "day"),
+    View("30d", 30, "day"),
+    View("365d", 365, "week"),
+    View("all", None, "month")
+)}
+
+
+def to_seconds(moment):
+    """Wall-clock seconds since 1970-01-01 of a datetime, date or ISO-8601 string"""
+    if isinstance(moment, (int, np.integer)):
+        return int(moment)
+    if isinstance(moment, str):
+        return int(parse_timestamps([moment])[0])
+    if not isinstance(moment, datetime):
+        moment = datetime.combine(moment, datetime.min.time())
+    # Wall-clock time, like parse_timestamps: an offset is dropped, not applied
+    return (moment.replace(tzinfo=None) - EPOCH) // timedelta(seconds=1)
+
+
+def view_window(view, today=None):
+    """Start and end of a view, matching the days of ``get_daily_stats``.
+
+    Like the daily stats, the last N days end at midnight today. Both
+    ends are None for the all-time view.
+    """
+    if view.days is None:
+        return None, None
+    today = today or date.today()
+    end = datetime.combine(today, datetime.min.time())
+    return end - timedelta(days=view.days), end
+
+
+class TimeSeries:
+    """Prefix sums of session totals, ordered by start hour.
+
+    Sessions are sorted by the hour they start in, with running totals
+    alongside, so the total between two hour boundaries is two binary
+    searches and one subtraction, and a series of N buckets is N + 1
+    searches, however many sessions fall in them. Per activity and per type
+    the same is kept over the sessions sorted by category, then hour.
+    Memory is a few entries per session, however many hours the sessions
+    span or however many activities there are. Sessions count towards the
+    hour they start in, like the daily stats, and range ends are rounded
+    down to the hour.
+    """
+
+    def __init__(self, columns):
+        hour = columns.view("start") // SECONDS_PER_HOUR
+        self.first = int(hour.min()) if len(hour) else 0
+        self.last = int(hour.max()) + 1 if len(hour) else 0
+        self.activities = list(columns.activities)
+        self.types = list(columns.types)
+
+        order = np.argsort(hour, kind="stable")
+        duration = columns.view("duration")[order]
+        is_pomodoro = columns.view("type")[order] == (columns.types.index("pomodoro")
+                                                      if "pomodoro" in columns.types else -1)
+        self.hours = hour[order]
+        self.time = self._cumulative(duration)
+        self.pomodoros = self._cumulative(is_pomodoro).astype(np.int64)
+        self.activity_index = self._by_category(self.hours, columns.view("activity")[order], duration)
+        self.type_index = self._by_category(self.hours, columns.view("type")[order], duration)
+
+    @staticmethod
+    def _cumulative(values):
+        return np.concatenate(([0], np.cumsum(values)))
+
+    def _by_category(self, hours, codes, duration):
+        """Keys ``code * stride + hour offset`` in order, and the running time over them"""
+        # The sessions are in hour order already, so a stable sort by code
+        # suffices; NumPy radix-sorts 16-bit codes
+        small = codes.astype(np.uint16) if len(codes) and codes.max() < 1 << 16 else codes
+        order = np.argsort(small, kind="stable")
+        keys = codes[order].astype(np.int64) * self.stride + (hours[order] - self.first)
+        return keys, self._cumulative(duration[order])
+
+    @property
+    def stride(self):
+        # One more than the largest hour offset, so a range end past the
+        # last session still sorts before the next category
+        return self.last - self.first + 1
+
+    def bounds(self, start=None, end=None):
+        """Hour numbers of a range; None means the first or last session"""
+        first = self.first if start is None else to_seconds(start) // SECONDS_PER_HOUR
+        last = self.last if end is None else to_seconds(end) // SECONDS_PER_HOUR
+        return first, max(first, last)
+
+    def positions(self, hours):
+        """Number of sessions starting before each of some absolute hour numbers"""
+        return np.searchsorted(self.hours, np.asarray(hours, dtype=np.int64))
+
+    def category_positions(self, index, size, hours):
+        """Per category (columns), the index position of each hour number (rows)"""
+        offsets = np.clip(np.asarray(hours, dtype=np.int64) - self.first, 0, self.stride - 1)
+        keys = offsets[:, None] + np.arange(size, dtype=np.int64) * self.stride
+        return np.searchsorted(index[0], keys)
+
+    def totals(self, start=None, end=None):
+        """Total tracked time and number of sessions in a range"""
+        a, b = self.positions(self.bounds(start, end))
+        return {"total_time": float(self.time[b] - self.time[a]), "sessions": int(b - a)}
+
+    def pomodoro_count(self, start=None, end=None):
+        a, b = self.positions(self.bounds(start, end))
+        return int(self.pomodoros[b] - self.pomodoros[a])
+
+    def _breakdown(self, names, index, start, end):
+        a, b = self.category_positions(index, len(names), self.bounds(start, end))
+        time = index[1][b] - index[1][a]
+        count = b - a
+        return {name: {"time": float(time[i]), "sessions": int(count[i])}
+                for i, name in enumerate(names) if count[i]}
+
+    def activity_totals(self, start=None, end=None):
+        """Time and session count per activity in a range"""
+        return self._breakdown(self.activities, self.activity_index, start, end)
+
+    def type_totals(self, start=None, end=None):
+        """Time and session count per session type in a range"""
+        return self._breakdown(self.types, self.type_index, start, end)
+
+    @staticmethod
+    def bucket_starts(granularity, first, last):
+        """Hour numbers where the calendar buckets overlapping [first, last) begin"""
+        if granularity == "hour":
+            return np.arange(first, last, dtype=np.int64)
+        first_day = first // HOURS_PER_DAY
+        last_day = (last - 1) // HOURS_PER_DAY
+        if granularity == "day":
+            days = np.arange(first_day, last_day + 1, dtype=np.int64)
+        elif granularity == "week":
+            # Weeks start on Monday; 1970-01-01 was a Thursday
+            monday = first_day - (first_day + 3) % 7
+            days = np.arange(monday, last_day + 1, 7, dtype=np.int64)
+        elif granularity == "month":
+            months = np.arange(np.datetime64(int(first_day), "D").astype("datetime64[M]"),
+                               np.datetime64(int(last_day), "D").astype("datetime64[M]") + 1)
+            days = months.astype("datetime64[D]").astype(np.int64)
+        else:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        return days * HOURS_PER_DAY
+
+    @staticmethod
+    def bucket_labels(granularity, starts):
+        moments = (starts * SECONDS_PER_HOUR).astype("datetime64[s]")
+        if granularity == "hour":
+            return [label.replace("T", " ") for label in
+                    np.datetime_as_string(moments, unit="m").tolist()]
+        unit = "M" if granularity == "month" else "D"
+        return np.datetime_as_string(moments.astype(f"datetime64[{unit}]"), unit=unit).tolist()
+
+    def series(self, granularity="day", start=None, end=None):
+        """Per-bucket stats between two times, in the layout of ``get_daily_stats``.
+
+        Buckets are calendar hours, days, Monday-based weeks or months,
+        labelled by where they begin; the first and last bucket only
+        count the part inside the range.
+        """
+        first, last = self.bounds(start, end)
+        if first == last:
+            return {}
+        starts = self.bucket_starts(granularity, first, last)
+        edges = np.concatenate(([first], starts[1:], [last]))
+        positions = self.positions(edges)
+        time = np.diff(self.time[positions])
+        sessions = np.diff(positions)
+        pomodoros = np.diff(self.pomodoros[positions])
+        activity_positions = self.category_positions(self.activity_index, len(self.activities), edges)
+        activity_time = np.diff(self.activity_index[1][activity_positions], axis=0)
+        activity_sessions = np.diff(activity_positions, axis=0)
+
+        series = {}
+        for i, label in enumerate(self.bucket_labels(granularity, starts)):
+            series[label] = {
+                "total_time": float(time[i]),
+                "sessions": int(sessions[i]),
+                "pomodoros": int(pomodoros[i]),
+                "activities": {self.activities[a]: float(activity_time[i, a])
+                               for a in np.flatnonzero(activity_sessions[i])}
+            }
+        return series
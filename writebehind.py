@@ -0,0 +1,283 @@
+# writebehind.py - Background thread that performs queued file writes
+import atexit
+import os
+import threading
+import time
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+class WriteBehind:
+    """Performs file writes queued by the storage backends on one thread.
+
+    Callers queue ``append``, ``truncate``, ``replace`` and ``remove``
+    operations and return at once; the thread applies them in order. It
+    waits ``delay`` seconds after the first operation of a burst so
+    that back-to-back events are written together. Within a batch,
+    operations made redundant by a later ``replace`` or ``remove`` of the
+    same path are dropped, and consecutive appends to a file become one
+    write.
+
+    ``replace`` is atomic: contents go to ``path + ".tmp"`` and then
+    ``os.replace``. The fsync policy decides durability:
+
+    - ``"always"``: fsync every file written, before the batch counts as done
+    - ``"interval"``: fsync replaced files before the rename; appended
+      files at most every ``fsync_interval`` seconds
+    - ``"never"``: leave it to the operating system
+
+    An error on the writer thread is raised from the next ``flush``,
+    ``close`` or queued operation.
+    """
+
+    def __init__(self, fsync="interval", fsync_interval=1.0, delay=0.02):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.delay = delay
+        self.cond = threading.Condition()
+        self.queue = []
+        self.submitted = 0
+        self.completed = 0
+        self.flush_requested = False
+        self.closing = False
+        self.error = None
+        self.thread = None
+
+        # Owned by the writer thread
+        self.handles = {}
+        self.unsynced = set()
+        self.last_fsync = time.monotonic()
+
+        # Instrumentation: operations queued versus batches and writes issued
+        self.batches = 0
+        self.writes = 0
+
+    # -- caller side ------------------------------------------------------
+
+    def append(self, path, data):
+        """Append bytes to a file"""
+        self.submit(("append", path, data))
+
+    def truncate(self, path, size):
+        """Cut a file back to ``size`` bytes, e.g. to drop a torn last record"""
+        self.submit(("truncate", path, size))
+
+    def replace(self, path, contents):
+        """Atomically replace a file with a string, bytes or what ``contents(f)`` writes"""
+        self.submit(("replace", path, contents))
+
+    def remove(self, path):
+        """Delete a file if it exists"""
+        self.submit(("remove", path))
+
+    def submit(self, operation):
+        with self.cond:
+            self.raise_error()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="write-behind", daemon=True)
+                self.thread.start()
+            self.queue.append(operation)
+            self.submitted += 1
+            self.cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is written; return False on timeout"""
+        with self.cond:
+            target = self.submitted
+            if self.completed < target:
+                self.flush_requested = True
+                self.cond.notify_all()
+                if not self.cond.wait_for(lambda: self.completed >= target or self.error,
+                                          timeout):
+                    return False
+            self.raise_error()
+            return True
+
+    def close(self):
+        """Write everything queued, fsync per policy and stop the thread"""
+        with self.cond:
+            thread = self.thread
+            self.closing = True
+            self.cond.notify_all()
+        if thread is not None:
+            thread.join()
+        with self.cond:
+            self.thread = None
+            self.closing = False
+            self.raise_error()
+
+    def raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    # -- writer thread ----------------------------------------------------
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.queue and not self.closing:
+                    if self.unsynced and self.fsync == "interval":
+                        remaining = self.last_fsync + self.fsync_interval - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self.cond.wait(remaining)
+                    else:
+                        self.cond.wait()
+                # Give a burst of events time to arrive unless someone is waiting
+                deadline = time.monotonic() + self.delay
+                while self.queue and not (self.flush_requested or self.closing):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                batch, self.queue = self.queue, []
+                self.flush_requested = False
+                closing = self.closing and not batch
+
+            try:
+                if batch:
+                    self.write_batch(self.coalesce(batch))
+                self.sync(force=closing)
+                if closing:
+                    self.close_handles()
+            except Exception as exc:
+                with self.cond:
+                    self.error = exc
+            with self.cond:
+                self.completed += len(batch)
+                self.cond.notify_all()
+            if closing:
+                return
+
+    @staticmethod
+    def coalesce(batch):
+        """Drop operations superseded later in the batch and join adjacent appends"""
+        superseded = set()
+        kept = []
+        for operation in reversed(batch):
+            kind, path = operation[0], operation[1]
+            if path in superseded:
+                continue
+            if kind in ("replace", "remove"):
+                superseded.add(path)
+            kept.append(operation)
+        kept.reverse()
+
+        merged = []
+        for operation in kept:
+            if (operation[0] == "append" and merged and merged[-1][0] == "append"
+                    and merged[-1][1] == operation[1]):
+                merged[-1][2].append(operation[2])
+            elif operation[0] == "append":
+                merged.append(("append", operation[1], [operation[2]]))
+            else:
+                merged.append(operation)
+        return [("append", operation[1], b"".join(operation[2])) if operation[0] == "append"
+                else operation for operation in merged]
+
+    def handle(self, path):
+        f = self.handles.get(path)
+        if f is None:
+            f = self.handles[path] = open(path, 'ab')
+        return f
+
+    def write_batch(self, operations):
+        self.batches += 1
+        appended = set()
+        for operation in operations:
+            kind, path = operation[0], operation[1]
+            self.writes += 1
+            if kind == "append":
+                self.handle(path).write(operation[2])
+                appended.add(path)
+            elif kind == "truncate":
+                f = self.handle(path)
+                f.flush()
+                f.truncate(operation[2])
+            elif kind == "replace":
+                self.close_handle(path)
+                self.replace_file(path, operation[2])
+            elif kind == "remove":
+                self.unsynced.discard(path)
+                self.close_handle(path)
+                if os.path.exists(path):
+                    os.remove(path)
+
+        for path in appended:
+            if path in self.handles:
+                self.handles[path].flush()
+                self.unsynced.add(path)
+        if self.fsync == "always":
+            self.sync(force=True)
+
+    def replace_file(self, path, contents):
+        tmp_file = path + ".tmp"
+        with open(tmp_file, 'wb' if isinstance(contents, bytes) else 'w') as f:
+            if callable(contents):
+                contents(f)
+            else:
+                f.write(contents)
+            if self.fsync != "never":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+        if self.fsync != "never":
+            self.fsync_directory(path)
+
+    @staticmethod
+    def fsync_directory(path):
+        """Make a rename durable; not every platform can open a directory"""
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def sync(self, force=False):
+        """fsync appended files when the policy says they are due"""
+        if self.fsync == "never" or not self.unsynced:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_fsync < self.fsync_interval:
+            return
+        for path in self.unsynced:
+            f = self.handles.get(path)
+            if f is not None:
+                os.fsync(f.fileno())
+        self.unsynced.clear()
+        self.last_fsync = now
+
+    def close_handle(self, path):
+        f = self.handles.pop(path, None)
+        if f is not None:
+            if path in self.unsynced and self.fsync != "never":
+                f.flush()
+                os.fsync(f.fileno())
+                self.unsynced.discard(path)
+            f.close()
+
+    def close_handles(self):
+        for path in list(self.handles):
+            self.close_handle(path)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared():
+    """The process-wide WriteBehind, flushed and stopped at interpreter exit"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = WriteBehind()
+            atexit.register(_shared.close)
+        return _shared